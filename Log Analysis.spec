@@ -76,6 +76,18 @@ a = Analysis(
         # Custom modules - include all Custom_Widgets submodules
         'assets.py.home',
         'assets.py.log',
+        'assets.py.log_patterns',
+        'assets.py.log_io',
+        'assets.py.log_model',
+        'assets.py.log_workers',
+        'assets.py.log_index',
+        'assets.py.log_query',
+        'assets.py.log_upload',
+        'assets.py.log_storage',
+        'assets.py.log_cache',
+        'assets.py.log_results',
+        'assets.py.log_records',
+        'assets.py.log_columns',
         'assets.py.system_analysis',
         'Custom_Widgets',
         'Custom_Widgets.QCustomQStackedWidget',
@@ -2,6 +2,17 @@ let backend = null;
 let openFiles = new Set(); // Track currently open files
 let searchTimeout = null;
 const DEBOUNCE_DELAY = 300; // milliseconds
+let pendingJobs = {}; // Background analysis jobs by job id -> folder
+let shownResults = { anomaly: null, analysis: null }; // Latest results of each analysis, for switching between them
+let currentSearch = null; // Streaming search in progress: { id, term, totalMatches }
+const SEARCH_FILE_LIMIT = 1000; // Matches shown per file before the search stops on it
+const logViewers = new Map(); // Virtual log viewer state by card id
+const LOG_LINE_HEIGHT = 24; // Fixed pixel height of a line in the log viewer
+const LOG_BLOCK_LINES = 200; // Lines fetched from the backend per request
+const LOG_CACHED_BLOCKS = 50; // Fetched blocks kept per open file
+const LOG_OVERSCAN_LINES = 30; // Lines rendered above and below the visible ones
+const UPLOAD_CHUNK_SIZE = 1024 * 1024; // Bytes sent per upload call
+const UPLOAD_RETRIES = 3; // Attempts to resume an upload after a failure
 
 // Connect to the Python backend when page loads
 document.addEventListener("DOMContentLoaded", () => {
@@ -10,6 +21,15 @@ document.addEventListener("DOMContentLoaded", () => {
         backend = channel.objects.backend;
         console.log("Backend connected successfully");
         
+        // Results of background analysis jobs arrive through this signal
+        if (typeof backend.analysisResultSignal !== 'undefined') {
+            backend.analysisResultSignal.connect(handleAnalysisResult);
+        }
+        
+        // Search results stream in through this signal
+        if (typeof backend.searchResultSignal !== 'undefined') {
+            backend.searchResultSignal.connect(handleSearchResult);
+        }
     });
 
     // UI Elements
@@ -76,7 +96,10 @@ document.addEventListener("DOMContentLoaded", () => {
 
 // Search input handler with debounce
 searchInput.addEventListener("input", (e) => {
-    const searchTerm = e.target.value.toLowerCase().trim();
+    // Terms and regex queries are case-sensitive in places (OR, \S)
+    const searchTerm = getSearchMode() === "text" ? e.target.value.toLowerCase().trim() : e.target.value.trim();
+    searchInput.classList.remove("search-error");
+    searchInput.title = "";
     
     // Clear previous timeout
     if (searchTimeout) {
@@ -87,6 +110,11 @@ searchInput.addEventListener("input", (e) => {
     
     // Skip search if term is too short or empty
     if (searchTerm.length < 2) {
+        // Stop a search still streaming results for the old term
+        if (currentSearch && backend) {
+            backend.cancel_search(currentSearch.id);
+        }
+        currentSearch = null;
         resetHighlighting();
         showSearchLoading(false); // Ensure loading indicator is hidden
         return;
@@ -97,111 +125,7 @@ searchInput.addEventListener("input", (e) => {
     
     // Use debouncing to prevent UI freezing
     searchTimeout = setTimeout(() => {
-        // Create a Web Worker for the search operation
-        const searchWorker = createSearchWorker();
-        
-        // Collect data from all open files
-        const openFileCards = document.querySelectorAll('.log-card');
-        const fileData = [];
-        
-        openFileCards.forEach(card => {
-            const logLines = card.querySelectorAll('.log-line');
-            const lines = Array.from(logLines).map(line => 
-                line.querySelector('.line-content').textContent
-            );
-            
-            fileData.push({
-                cardId: card.id,
-                lines: lines
-            });
-        });
-        
-        // Set up worker response handler
-        searchWorker.onmessage = function(e) {
-            const results = e.data;
-            let totalMatches = 0;
-            
-            // Reset all highlighting first
-            resetHighlighting();
-            
-            // Process results for each file
-            results.forEach(fileResult => {
-                const card = document.getElementById(fileResult.cardId);
-                if (!card) return;
-                
-                const logLines = card.querySelectorAll('.log-line');
-                
-                // Hide all lines initially
-                logLines.forEach(line => {
-                    line.style.display = 'none';
-                });
-                
-                // Update card header
-                const cardHeader = card.querySelector('.log-card-header h4');
-                const originalTitle = cardHeader.textContent.split(' (')[0];
-                
-                if (fileResult.matches.length === 0) {
-                    // No matches in this file
-                    cardHeader.textContent = originalTitle;
-                    
-                    // Show "No results found" message
-                    let noResultsMsg = card.querySelector('.no-results-message');
-                    if (!noResultsMsg) {
-                        noResultsMsg = document.createElement('div');
-                        noResultsMsg.className = 'no-results-message';
-                        const content = card.querySelector('.log-card-content');
-                        content.appendChild(noResultsMsg);
-                    }
-                    noResultsMsg.textContent = `No results found for "${searchTerm}"`;
-                    noResultsMsg.style.display = 'block';
-                } else {
-                    // Update header with match count
-                    cardHeader.innerHTML = `${originalTitle} <span class="match-count">(${fileResult.matches.length} matches)</span>`;
-                    totalMatches += fileResult.matches.length;
-                    
-                    // Hide any "No results" message
-                    const noResultsMsg = card.querySelector('.no-results-message');
-                    if (noResultsMsg) {
-                        noResultsMsg.style.display = 'none';
-                    }
-                    
-                    // Highlight and show matching lines
-                    fileResult.matches.forEach(match => {
-                        if (match.lineIndex >= 0 && match.lineIndex < logLines.length) {
-                            const lineElement = logLines[match.lineIndex];
-                            const lineContent = lineElement.querySelector('.line-content');
-                            const regex = new RegExp(`(${searchTerm.replace(/[.*+?^${}()|[\]\\]/g, '\\$&')})`, 'gi');
-                            lineContent.innerHTML = match.text.replace(
-                                regex,
-                                '<span class="highlight">$1</span>'
-                            );
-                            lineElement.style.display = 'flex'; // Show this line
-                        }
-                    });
-                }
-            });
-            
-            // Update notification if available
-            if (typeof showNotification === 'function') {
-                if (searchTerm && totalMatches > 0) {
-                    showNotification(`Found ${totalMatches} matches for "${searchTerm}"`, "success");
-                } else if (searchTerm) {
-                    showNotification(`No matches found for "${searchTerm}"`, "info");
-                }
-            }
-            
-            // Hide loading indicator
-            showSearchLoading(false);
-            
-            // Terminate the worker after use
-            searchWorker.terminate();
-        };
-        
-        // Send search data to worker
-        searchWorker.postMessage({
-            searchTerm: searchTerm,
-            fileData: fileData
-        });
+        startSearch(searchTerm);
     }, DEBOUNCE_DELAY);
 });
 
@@ -214,10 +138,7 @@ searchInput.addEventListener("input", (e) => {
         }
         
         // Get all opened files
-        const openedFiles = Array.from(openFiles).map(path => {
-            const parts = path.split('/');
-            return parts[parts.length - 1];
-        });
+        const openedFiles = Array.from(openFiles).map(fileKey => splitFileKey(fileKey).file);
         
         if (openedFiles.length === 0) {
             showNotification("Please open files to analyze", "error");
@@ -240,6 +161,7 @@ searchInput.addEventListener("input", (e) => {
                     if (response.status === "started") {
                         // Process has started in background
                         // Progress updates will come via progressSignal
+                        pendingJobs[response.job_id] = currentFolder;
                         showNotification("Anomaly scan started in background", "info");
                     } else if (response.success) {
                         // If we got immediate results (should not happen with threaded implementation)
@@ -278,10 +200,7 @@ searchInput.addEventListener("input", (e) => {
         }
         
         // Get all opened files
-        const openedFiles = Array.from(openFiles).map(path => {
-            const parts = path.split('/');
-            return parts[parts.length - 1];
-        });
+        const openedFiles = Array.from(openFiles).map(fileKey => splitFileKey(fileKey).file);
         
         if (openedFiles.length === 0) {
             showNotification("Please open files to analyze", "error");
@@ -304,6 +223,7 @@ searchInput.addEventListener("input", (e) => {
                     if (response.status === "started") {
                         // Process has started in background
                         // Progress updates will come via progressSignal
+                        pendingJobs[response.job_id] = currentFolder;
                         showNotification("Deep analysis started in background", "info");
                     } else if (response.success) {
                         // If we got immediate results (should not happen with threaded implementation)
@@ -331,51 +251,268 @@ searchInput.addEventListener("input", (e) => {
                 document.getElementById("analysisBtn").disabled = false;
             });
     };
+    
+    // Statistics button handler
+    document.getElementById("statsBtn").onclick = () => {
+        const statsBtn = document.getElementById("statsBtn");
+        const currentFolder = getCurrentFolder() || statsBtn.dataset.currentFolder;
+        if (!currentFolder) {
+            showNotification("Please select a folder first", "error");
+            return;
+        }
+        
+        statsBtn.disabled = true;
+        
+        // Counted right away when the folder's records were parsed before,
+        // otherwise they're parsed in a background job
+        backend.get_log_statistics(currentFolder, "", "", "")
+            .then(responseJson => {
+                try {
+                    const response = JSON.parse(responseJson);
+                    
+                    if (response.status === "started") {
+                        pendingJobs[response.job_id] = currentFolder;
+                        showLoadingOverlay("Parsing log records");
+                    } else if (response.success) {
+                        statsBtn.disabled = false;
+                        displayLogStatistics(response, currentFolder);
+                    } else {
+                        statsBtn.disabled = false;
+                        showNotification(`Statistics failed: ${response.message}`, "error");
+                    }
+                } catch (e) {
+                    statsBtn.disabled = false;
+                    showNotification(`Error parsing response: ${e.message}`, "error");
+                }
+            })
+            .catch(err => {
+                statsBtn.disabled = false;
+                showNotification(`Error computing statistics: ${err}`, "error");
+            });
+    };
 
 });
 
 
 
+// Display the result of a background analysis job
+function handleAnalysisResult(jobId, jobType, responseJson) {
+    if (!(jobId in pendingJobs)) return;
+    const folderPath = pendingJobs[jobId];
+    delete pendingJobs[jobId];
+    
+    hideLoadingOverlay();
+    if (jobType === "statistics") {
+        document.getElementById("statsBtn").disabled = false;
+    } else {
+        document.getElementById("anomalyScanBtn").disabled = false;
+        document.getElementById("analysisBtn").disabled = false;
+    }
+    
+    try {
+        const response = JSON.parse(responseJson);
+        const labels = { anomaly: "Anomaly scan", statistics: "Statistics" };
+        const label = labels[jobType] || "Deep analysis";
+        
+        if (!response.success) {
+            showNotification(`${label} failed: ${response.message}`, "error");
+        } else if (jobType === "anomaly") {
+            displayAnomalyResults(response, folderPath);
+        } else if (jobType === "statistics") {
+            displayLogStatistics(response, folderPath);
+        } else {
+            displayAnalysisResults(response, folderPath);
+        }
+    } catch (e) {
+        showNotification(`Error parsing response: ${e.message}`, "error");
+    }
+}
+
+// Split an openFiles key into its folder and file name; folders never
+// contain '/', archive members like "bundle.zip!/var/log/syslog" do
+function splitFileKey(fileKey) {
+    const separator = fileKey.indexOf('/');
+    return { folder: fileKey.substring(0, separator), file: fileKey.substring(separator + 1) };
+}
+
 // Helper function to get current folder from opened files
 function getCurrentFolder() {
     if (openFiles.size === 0) return null;
     
-    // Get first item in the set
-    const firstItem = Array.from(openFiles)[0];
-    // Get the folder part (before the last slash)
-    return firstItem.substring(0, firstItem.lastIndexOf('/'));
+    // Get the folder of the first item in the set
+    return splitFileKey(Array.from(openFiles)[0]).folder;
 }
 
-// Create a Web Worker for search operations
-function createSearchWorker() {
-    const workerBlob = new Blob([`
-        self.onmessage = function(e) {
-            const { searchTerm, fileData } = e.data;
-            const results = [];
-            
-            fileData.forEach(file => {
-                const matches = [];
-                
-                file.lines.forEach((line, lineIndex) => {
-                    if (line.toLowerCase().includes(searchTerm.toLowerCase())) {
-                        matches.push({
-                            lineIndex: lineIndex,
-                            text: line
-                        });
-                    }
-                });
-                
-                results.push({
-                    cardId: file.cardId,
-                    matches: matches
-                });
-            });
-            
-            self.postMessage(results);
-        };
-    `], { type: 'application/javascript' });
+// Placeholder of the search box for each search mode
+const SEARCH_MODE_PLACEHOLDERS = {
+    text: "Search logs...",
+    terms: 'Words, "phrases", OR, level:error source:sshd',
+    regex: "Regular expression..."
+};
+
+function getSearchMode() {
+    const modeSelect = document.getElementById("searchModeSelect");
+    return modeSelect ? modeSelect.value : "text";
+}
+
+// Switching modes searches again with the new one
+const searchModeSelect = document.getElementById("searchModeSelect");
+if (searchModeSelect) {
+    searchModeSelect.addEventListener("change", () => {
+        const searchInput = document.getElementById("searchInput");
+        searchInput.placeholder = SEARCH_MODE_PLACEHOLDERS[getSearchMode()];
+        searchInput.dispatchEvent(new Event("input"));
+    });
+}
+
+// Build the regex that highlights the matches of a query, null if there's nothing to highlight
+function getSearchHighlightRegex(searchTerm, mode) {
+    const escape = text => text.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+    if (mode === "regex") {
+        try {
+            return new RegExp(searchTerm, 'gi');
+        } catch (e) {
+            // Python syntax JavaScript doesn't know, e.g. (?P<name>...)
+            return null;
+        }
+    }
+    if (mode === "terms") {
+        // Words and phrases of the query, leaving out field filters and operators
+        const terms = [];
+        const token = /(?:level|source|event_id|protocol|ip|port):(?:"[^"]*"|\S+)|"([^"]*)"|(\S+)/gi;
+        for (const match of searchTerm.matchAll(token)) {
+            const term = match[1] !== undefined ? match[1] : match[2];
+            if (term && term !== "OR" && term !== "AND") {
+                terms.push(escape(term));
+            }
+        }
+        return terms.length ? new RegExp(terms.join('|'), 'gi') : null;
+    }
+    return new RegExp(escape(searchTerm), 'gi');
+}
+
+// Escape a line for display, wrapping the matches of a highlight regex
+function highlightMatches(content, regex) {
+    if (!regex) return escapeHtml(content);
+    let html = '';
+    let position = 0;
+    regex.lastIndex = 0;
+    for (let match = regex.exec(content); match; match = regex.exec(content)) {
+        if (match[0] === '') {
+            // Step over empty matches so the loop ends
+            regex.lastIndex++;
+            continue;
+        }
+        html += escapeHtml(content.slice(position, match.index)) +
+            `<span class="highlight">${escapeHtml(match[0])}</span>`;
+        position = match.index + match[0].length;
+    }
+    return html + escapeHtml(content.slice(position));
+}
+
+// Start a backend search over the open files; matches arrive via handleSearchResult
+function startSearch(searchTerm) {
+    const currentFolder = getCurrentFolder();
+    if (!backend || !currentFolder) {
+        showSearchLoading(false);
+        return;
+    }
+    
+    const fileNames = Array.from(openFiles)
+        .filter(fileKey => fileKey.startsWith(currentFolder + '/'))
+        .map(fileKey => fileKey.substring(currentFolder.length + 1));
+    
+    // The id is chosen here so events that arrive before the call returns
+    // are already recognised
+    const mode = getSearchMode();
+    currentSearch = {
+        id: `search-${Date.now()}-${Math.random().toString(36).slice(2)}`,
+        term: searchTerm,
+        mode: mode,
+        highlight: getSearchHighlightRegex(searchTerm, mode),
+        totalMatches: 0
+    };
+    
+    // Show an empty result list in every card until matches arrive
+    resetHighlighting();
+    document.querySelectorAll('.log-card').forEach(card => showSearchView(card));
+    
+    backend.start_search(currentSearch.id, currentFolder, searchTerm, mode, JSON.stringify(fileNames), SEARCH_FILE_LIMIT).catch(err => {
+        showSearchLoading(false);
+        showNotification(`Search failed: ${err}`, "error");
+    });
+}
+
+// Find the open card showing a file of the current folder
+function getLogCard(fileName) {
+    const fileKey = `${getCurrentFolder()}/${fileName}`;
+    return document.getElementById(`log-card-${fileKey.replace(/[/\\?%*:|"<>]/g, '-')}`);
+}
+
+// Apply one streamed search event to the open log cards
+function handleSearchResult(searchId, eventJson) {
+    // Ignore events of superseded searches
+    if (!currentSearch || currentSearch.id !== searchId) return;
+    
+    const searchTerm = currentSearch.term;
+    const event = JSON.parse(eventJson);
     
-    return new Worker(URL.createObjectURL(workerBlob));
+    if (event.type === "matches") {
+        const card = getLogCard(event.file_name);
+        if (!card) return;
+        
+        const results = card.querySelector('.log-search-results');
+        if (!results) return;
+        const fragment = document.createDocumentFragment();
+        event.matches.forEach(match => {
+            const lineElement = createLogLine(match.line_number, match.content);
+            lineElement.dataset.line = match.line_number;
+            lineElement.querySelector('.line-content').innerHTML = highlightMatches(match.content, currentSearch.highlight);
+            fragment.appendChild(lineElement);
+        });
+        results.appendChild(fragment);
+        currentSearch.totalMatches += event.matches.length;
+    } else if (event.type === "file_done") {
+        const card = getLogCard(event.file_name);
+        if (!card) return;
+        
+        const cardHeader = card.querySelector('.log-card-header h4');
+        const originalTitle = cardHeader.textContent.split(' (')[0];
+        
+        if (event.match_count === 0) {
+            // No matches in this file
+            cardHeader.textContent = originalTitle;
+            
+            // Show "No results found" message
+            let noResultsMsg = card.querySelector('.no-results-message');
+            if (!noResultsMsg) {
+                noResultsMsg = document.createElement('div');
+                noResultsMsg.className = 'no-results-message';
+                const content = card.querySelector('.log-card-content');
+                content.appendChild(noResultsMsg);
+            }
+            noResultsMsg.textContent = `No results found for "${searchTerm}"`;
+            noResultsMsg.style.display = 'block';
+        } else {
+            // Update header with match count
+            const count = event.truncated ? `${event.match_count}+` : event.match_count;
+            cardHeader.innerHTML = `${originalTitle} <span class="match-count">(${count} matches)</span>`;
+        }
+    } else if (event.type === "done") {
+        if (currentSearch.totalMatches > 0) {
+            showNotification(`Found ${currentSearch.totalMatches} matches for "${searchTerm}"`, "success");
+        } else {
+            showNotification(`No matches found for "${searchTerm}"`, "info");
+        }
+        showSearchLoading(false);
+    } else if (event.type === "error") {
+        // E.g. an invalid regex; mark the query until it's edited
+        const searchInput = document.getElementById('searchInput');
+        searchInput.classList.add('search-error');
+        searchInput.title = event.message;
+        showNotification(event.message, "error");
+        showSearchLoading(false);
+    }
 }
 
 // Helper function to show loading indicator
@@ -433,14 +570,20 @@ function resetHighlighting() {
     const openFileCards = document.querySelectorAll('.log-card');
     
     openFileCards.forEach(card => {
-        const logLines = card.querySelectorAll('.log-line');
-        
-        // Reset all highlights and show all lines
-        logLines.forEach(line => {
-            const lineContent = line.querySelector('.line-content');
-            lineContent.innerHTML = lineContent.textContent; // Remove highlights
-            line.style.display = 'flex'; // Show all lines
-        });
+        // Go back from search results to the file's own lines
+        const results = card.querySelector('.log-search-results');
+        if (results) {
+            results.remove();
+        }
+        const viewport = card.querySelector('.log-viewport');
+        if (viewport) {
+            viewport.style.display = '';
+        }
+        const viewer = logViewers.get(card.id);
+        if (viewer) {
+            viewer.searching = false;
+            renderLogWindow(viewer);
+        }
         
         // Reset card header
         const cardHeader = card.querySelector('.log-card-header h4');
@@ -554,8 +697,9 @@ function displayAnomalyResults(results, folderPath) {
     // Create or get output container
     const outputContainer = getOrCreateOutputContainer();
     
-    // Store the results data for potential download
-    outputContainer.dataset.anomalyResults = JSON.stringify(results);
+    // Downloads only need the result's id, the backend keeps the result
+    shownResults.anomaly = results;
+    outputContainer.dataset.anomalyResultId = results.result_id || '';
     outputContainer.dataset.folderPath = folderPath;
     
     // Set container mode to anomaly
@@ -583,6 +727,7 @@ function displayAnomalyResults(results, folderPath) {
             <div class="summary-item danger-levels">
                 <span class="summary-label">Danger Levels:</span>
                 <div class="danger-counts">
+                  &nbsp;  ${stats.danger_levels.Critical > 0 ? `<span class="risk-critical">Critical: ${stats.danger_levels.Critical}</span>` : ''}
                   &nbsp;  ${stats.danger_levels.High > 0 ? `<span class="danger-high">High: ${stats.danger_levels.High}</span>` : ''}
                   &nbsp;  ${stats.danger_levels.Medium > 0 ? `<span class="danger-medium">Medium: ${stats.danger_levels.Medium}</span>` : ''}
                   &nbsp;  ${stats.danger_levels.Low > 0 ? `<span class="danger-low">Low: ${stats.danger_levels.Low}</span>` : ''}
@@ -595,7 +740,7 @@ function displayAnomalyResults(results, folderPath) {
     content.innerHTML = summaryHtml;
     // Show notification for anomaly results
     showNotification(
-        `Total Anomalies Found: ${stats.total_anomalies} (${stats.danger_levels.High} High, ${stats.danger_levels.Medium} Medium, ${stats.danger_levels.Low} Low)`,
+        `Total Anomalies Found: ${stats.total_anomalies} (${stats.danger_levels.Critical || 0} Critical, ${stats.danger_levels.High} High, ${stats.danger_levels.Medium} Medium, ${stats.danger_levels.Low} Low)`,
         "warning",
         stats.total_anomalies > 0 ? "high" : "low" // Assuming that if anomalies exist, it will be high risk, else low
     );
@@ -670,8 +815,9 @@ function displayAnalysisResults(results, folderPath) {
     // Create or get output container
     const outputContainer = getOrCreateOutputContainer();
     
-    // Store the results data for potential download
-    outputContainer.dataset.analysisResults = JSON.stringify(results);
+    // Downloads only need the result's id, the backend keeps the result
+    shownResults.analysis = results;
+    outputContainer.dataset.analysisResultId = results.result_id || '';
     outputContainer.dataset.folderPath = folderPath;
     
     // Set container mode to analysis
@@ -837,6 +983,84 @@ function displayAnalysisResults(results, folderPath) {
     outputContainer.style.display = 'flex';
 }
 
+// Show the line counts of get_log_statistics
+function displayLogStatistics(results, folderPath) {
+    const outputContainer = getOrCreateOutputContainer();
+    outputContainer.dataset.folderPath = folderPath;
+    outputContainer.dataset.mode = 'statistics';
+    
+    // Statistics aren't an analysis result, so there's nothing to download
+    const header = createOutputHeader('Log Statistics', folderPath, false, false);
+    
+    const content = document.createElement('div');
+    content.className = 'output-content';
+    
+    const levels = Object.entries(results.levels)
+        .map(([level, count]) => `<span>${escapeHtml(level)}: ${count}</span>`)
+        .join('');
+    content.innerHTML = `
+        <div class="results-summary">
+            <div class="summary-item">
+                <span class="summary-label">Total Files:</span>
+                <span class="summary-value">${results.files}</span>
+            </div>
+            <div class="summary-item">
+                <span class="summary-label">Total Lines:</span>
+                <span class="summary-value">${results.total_lines}</span>
+            </div>
+            <div class="summary-item">
+                <span class="summary-label">Sources:</span>
+                <span class="summary-value">${results.distinct_sources}</span>
+            </div>
+            <div class="summary-item">
+                <span class="summary-label">Time Range:</span>
+                <span class="summary-value">${results.first_timestamp ? `${results.first_timestamp} – ${results.last_timestamp}` : 'No timestamps'}</span>
+            </div>
+            <div class="summary-item">
+                <span class="summary-label">Levels:</span>
+                <div class="danger-counts">${levels || '<span class="no-danger">No levels found</span>'}</div>
+            </div>
+        </div>
+    `;
+    
+    // Most frequent sources
+    if (results.sources.length > 0) {
+        const tableContainer = document.createElement('div');
+        tableContainer.className = 'table-container';
+        
+        const table = document.createElement('table');
+        table.className = 'results-table';
+        table.innerHTML = `
+            <thead>
+                <tr>
+                    <th>Source</th>
+                    <th>Lines</th>
+                </tr>
+            </thead>
+        `;
+        
+        const tbody = document.createElement('tbody');
+        results.sources.forEach(source => {
+            const tr = document.createElement('tr');
+            tr.innerHTML = `
+                <td>${escapeHtml(source.source)}</td>
+                <td>${source.count}</td>
+            `;
+            tbody.appendChild(tr);
+        });
+        
+        table.appendChild(tbody);
+        tableContainer.appendChild(table);
+        content.appendChild(tableContainer);
+    }
+    
+    outputContainer.innerHTML = '';
+    outputContainer.appendChild(header);
+    outputContainer.appendChild(content);
+    updateAfterDisplaying();
+    outputContainer.style.display = 'flex';
+}
+
 function getOrCreateOutputContainer() {
     let outputContainer = document.getElementById('analysisOutputContainer');
     
@@ -878,7 +1102,7 @@ function updateAfterDisplaying() {
     }, 50);
 }
 
-function createOutputHeader(title, folderPath, showAnomalyButton) {
+function createOutputHeader(title, folderPath, showAnomalyButton, showDownload = true) {
     const header = document.createElement('div');
     header.className = 'output-header';
     
@@ -890,7 +1114,7 @@ function createOutputHeader(title, folderPath, showAnomalyButton) {
     
     // Check if we have both results available to show analysis button
     const outputContainer = document.getElementById('analysisOutputContainer');
-    if (outputContainer && outputContainer.dataset.anomalyResults && !showAnomalyButton) {
+    if (shownResults.anomaly && !showAnomalyButton) {
         modeSwitcher = `<button id="switchToAnalysisBtn" class="mode-switch-btn">Switch to Deep Analysis</button>`;
     }
     
@@ -900,7 +1124,14 @@ function createOutputHeader(title, folderPath, showAnomalyButton) {
             <h3>&nbsp;${title}</h3>
         </div>
         <div class="output-controls">
-            <button id="downloadResultsBtn" class="download-btn">Download Results</button>
+            ${showDownload ? `
+            <select id="downloadFormatSelect" class="download-format-select" title="Export format">
+                <option value="csv">CSV</option>
+                <option value="parquet">Parquet</option>
+                <option value="arrow">Arrow</option>
+                <option value="ndjson">NDJSON (gzip)</option>
+            </select>
+            <button id="downloadResultsBtn" class="download-btn">Download Results</button>` : ''}
             <button id="closeOutputBtn" class="close-btn">✖</button>
         </div>
     `;
@@ -911,8 +1142,8 @@ function createOutputHeader(title, folderPath, showAnomalyButton) {
         const switchToAnomalyBtn = document.getElementById('switchToAnomalyBtn');
         if (switchToAnomalyBtn) {
             switchToAnomalyBtn.addEventListener('click', () => {
-                if (outputContainer && outputContainer.dataset.anomalyResults) {
-                    displayAnomalyResults(JSON.parse(outputContainer.dataset.anomalyResults), folderPath);
+                if (shownResults.anomaly) {
+                    displayAnomalyResults(shownResults.anomaly, folderPath);
                 } else {
                     showNotification("No anomaly scan results available", "info");
                 }
@@ -922,8 +1153,8 @@ function createOutputHeader(title, folderPath, showAnomalyButton) {
         const switchToAnalysisBtn = document.getElementById('switchToAnalysisBtn');
         if (switchToAnalysisBtn) {
             switchToAnalysisBtn.addEventListener('click', () => {
-                if (outputContainer && outputContainer.dataset.analysisResults) {
-                    displayAnalysisResults(JSON.parse(outputContainer.dataset.analysisResults), folderPath);
+                if (shownResults.analysis) {
+                    displayAnalysisResults(shownResults.analysis, folderPath);
                 } else {
                     showNotification("No analysis results available", "info");
                 }
@@ -934,7 +1165,7 @@ function createOutputHeader(title, folderPath, showAnomalyButton) {
         const downloadBtn = document.getElementById('downloadResultsBtn');
         if (downloadBtn) {
             downloadBtn.addEventListener('click', () => {
-                downloadResults(folderPath);
+                downloadResults();
             });
         }
         
@@ -967,33 +1198,35 @@ function closeOutputContainer() {
     }
 }
 
-function downloadResults(folderPath) {
+function downloadResults() {
     const outputContainer = document.getElementById('analysisOutputContainer');
     if (!outputContainer) return;
     
     const mode = outputContainer.dataset.mode;
-    let data = null;
-    let analysisType = null;
-    
-    if (mode === 'anomaly' && outputContainer.dataset.anomalyResults) {
-        data = outputContainer.dataset.anomalyResults;
-        analysisType = 'anomaly';  // This matches the backend's expectation
-    } else if (mode === 'analysis' && outputContainer.dataset.analysisResults) {
-        data = outputContainer.dataset.analysisResults;
-        analysisType = 'deep_analysis';  // Change this to match what the backend expects
-    } else {
+    const formatSelect = document.getElementById('downloadFormatSelect');
+    const exportFormat = formatSelect ? formatSelect.value : 'csv';
+    let resultId = null;
+    
+    if (mode === 'anomaly') {
+        resultId = outputContainer.dataset.anomalyResultId;
+    } else if (mode === 'analysis') {
+        resultId = outputContainer.dataset.analysisResultId;
+    }
+    if (!resultId) {
         showNotification("No data available for download", "error");
         return;
     }
     
-    // Call backend export function with the correct analysis type
-    backend.export_analysis_to_csv(analysisType, folderPath, data)
+    // The backend keeps recent results, so only their id is sent
+    backend.export_analysis_result(resultId, exportFormat)
         .then(responseJson => {
             try {
                 const response = JSON.parse(responseJson);
                 
                 if (response.success) {
                     showNotification(response.message, "success");
+                } else if (response.expired) {
+                    showNotification("These results are no longer kept, run the analysis again to download them", "warning");
                 } else {
                     showNotification(`Export failed: ${response.message}`, "error");
                 }
@@ -1013,27 +1246,48 @@ function highlightLineInFile(fileName, lineNumber) {
     for (const card of fileCards) {
         const cardHeader = card.querySelector('.log-card-header h4');
         if (cardHeader && cardHeader.textContent.includes(fileName)) {
-            // Found the card, now find the line
-            const lineElement = card.querySelector(`.log-line:nth-child(${lineNumber})`);
+            const viewer = logViewers.get(card.id);
+            if (!viewer) continue;
             
-            if (lineElement) {
-                // Scroll to line
-                lineElement.scrollIntoView({ behavior: 'smooth', block: 'center' });
-                
-                // Highlight line
-                lineElement.classList.add('highlight-line');
+            // Found the card; a search result list may show the line,
+            // otherwise go back to the file's lines
+            const resultLine = viewer.searching &&
+                card.querySelector(`.log-search-results .log-line[data-line="${lineNumber}"]`);
+            if (viewer.searching && !resultLine) {
+                resetHighlighting();
+            }
+            
+            if (resultLine) {
+                resultLine.scrollIntoView({ behavior: 'smooth', block: 'center' });
+                resultLine.classList.add('highlight-line');
                 setTimeout(() => {
-                    lineElement.classList.remove('highlight-line');
+                    resultLine.classList.remove('highlight-line');
                 }, 3000);
+            } else {
+                // Scroll the line to the middle of the card; the viewer
+                // renders and highlights it once it is in view
+                const content = card.querySelector('.log-card-content');
+                const viewport = card.querySelector('.log-viewport');
+                content.scrollTop = viewport.offsetTop + (lineNumber - 1) * LOG_LINE_HEIGHT - content.clientHeight / 2;
+                card.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
                 
-                // Focus the card
-                card.classList.add('highlight-card');
+                viewer.highlightLine = lineNumber;
+                renderLogWindow(viewer);
                 setTimeout(() => {
-                    card.classList.remove('highlight-card');
-                }, 1000);
-                
-                break;
+                    if (viewer.highlightLine === lineNumber) {
+                        viewer.highlightLine = null;
+                        renderLogWindow(viewer);
+                    }
+                }, 3000);
             }
+            
+            // Focus the card
+            card.classList.add('highlight-card');
+            setTimeout(() => {
+                card.classList.remove('highlight-card');
+            }, 1000);
+            
+            break;
         }
     }
 }
@@ -1054,31 +1308,114 @@ function handleFileUpload(files) {
     showNotification(`Processing ${total} files...`, "info");
 
     for (let i = 0; i < total; i++) {
-        const file = files[i];
-        const reader = new FileReader();
-
-        reader.onload = function () {
-            const base64Data = reader.result.split(',')[1];
-            // Send file name + content to backend
-            backend.save_log_file(file.name, base64Data).then(result => {
-                processed++;
-                if (processed === total) {
-                    showNotification(`Successfully uploaded ${total} files!`, "success");
-                }
-            }).catch(err => {
-                showNotification(`Error uploading ${file.name}: ${err}`, "error");
-            });
-        };
-
-        reader.readAsDataURL(file);
-        fileNames.push(file.name);
+        fileNames.push(files[i].name);
     }
 
     fileUploadStatus.innerHTML = `
         ✅ Uploading <strong>${total}</strong> file(s): <br>
-        ${fileNames.map((f) => `<code>${f}</code>`).join("<br>")}
+        ${fileNames.map((f, index) => `<code>${f}</code> <span id="uploadProgress${index}">0%</span>`).join("<br>")}
         <p>Files will be stored in today's date folder</p>
     `;
+
+    // Upload one file at a time, each in chunks
+    (async () => {
+        for (let i = 0; i < total; i++) {
+            const file = files[i];
+            const progress = document.getElementById(`uploadProgress${i}`);
+            try {
+                await uploadFileInChunks(file, sent => {
+                    if (progress) {
+                        progress.textContent = `${file.size ? Math.floor(sent / file.size * 100) : 100}%`;
+                    }
+                });
+                processed++;
+                if (progress) progress.textContent = "✅";
+            } catch (err) {
+                if (progress) progress.textContent = "❌";
+                showNotification(`Error uploading ${file.name}: ${err.message || err}`, "error");
+            }
+        }
+        if (processed === total) {
+            showNotification(`Successfully uploaded ${total} files!`, "success");
+        }
+    })();
+}
+
+// Upload a file in chunks, resuming where an earlier attempt stopped
+async function uploadFileInChunks(file, onProgress) {
+    const chunkCount = Math.ceil(file.size / UPLOAD_CHUNK_SIZE);
+    const digests = new Array(chunkCount);
+    let uploadId = null;
+    let index = 0;
+    let failures = 0;
+    
+    const readChunk = (chunkIndex) => {
+        const start = chunkIndex * UPLOAD_CHUNK_SIZE;
+        return file.slice(start, start + UPLOAD_CHUNK_SIZE).arrayBuffer();
+    };
+    
+    while (true) {
+        try {
+            if (uploadId === null) {
+                // Beginning again tells how much the backend already has
+                const begin = JSON.parse(await backend.begin_upload(file.name, file.size, UPLOAD_CHUNK_SIZE, String(file.lastModified)));
+                if (!begin.success) throw new Error(begin.message);
+                uploadId = begin.upload_id;
+                index = Math.floor(begin.received / UPLOAD_CHUNK_SIZE);
+                onProgress(begin.received);
+            }
+            
+            for (; index < chunkCount; index++) {
+                const buffer = await readChunk(index);
+                digests[index] = await sha256Hex(buffer);
+                const response = JSON.parse(await backend.append_upload_chunk(
+                    uploadId, index * UPLOAD_CHUNK_SIZE, arrayBufferToBase64(buffer), digests[index]));
+                if (!response.success) throw new Error(response.message);
+                onProgress(response.received);
+            }
+            
+            // Chunks sent before a resume still count towards the checksum
+            for (let i = 0; i < chunkCount; i++) {
+                if (digests[i] === undefined) {
+                    digests[i] = await sha256Hex(await readChunk(i));
+                }
+            }
+            const checksum = digests.every(digest => digest) ? await sha256Hex(hexToBytes(digests.join(''))) : "";
+            const commit = JSON.parse(await backend.commit_upload(uploadId, checksum));
+            if (!commit.success) throw new Error(commit.message);
+            return commit;
+        } catch (err) {
+            if (++failures > UPLOAD_RETRIES) throw err;
+            console.warn(`Upload of ${file.name} failed, resuming:`, err);
+            uploadId = null;
+        }
+    }
+}
+
+// Hex SHA-256 of some bytes, or "" where Web Crypto isn't available
+async function sha256Hex(buffer) {
+    if (!window.crypto || !crypto.subtle) return "";
+    const digest = new Uint8Array(await crypto.subtle.digest('SHA-256', buffer));
+    return Array.from(digest, byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+function hexToBytes(hex) {
+    const bytes = new Uint8Array(hex.length / 2);
+    for (let i = 0; i < bytes.length; i++) {
+        bytes[i] = parseInt(hex.substr(i * 2, 2), 16);
+    }
+    return bytes;
+}
+
+// Base64 without building a data URL of the whole file
+function arrayBufferToBase64(buffer) {
+    const bytes = new Uint8Array(buffer);
+    let binary = '';
+    // Convert in slices to stay under the argument count limit
+    for (let i = 0; i < bytes.length; i += 0x8000) {
+        binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+    }
+    return btoa(binary);
 }
 
 function loadFolderList() {
@@ -1145,9 +1482,17 @@ function toggleAnalysisButtons(show) {
     if (analysisBtn) {
         analysisBtn.style.display = show ? "inline-block" : "none";
     }
+    const statsBtn = document.getElementById("statsBtn");
+    if (statsBtn) {
+        statsBtn.style.display = show ? "inline-block" : "none";
+    }
     if (searchInput) {
         searchInput.style.display = show ? "inline-block" : "none";
     }
+    const searchModeSelect = document.getElementById("searchModeSelect");
+    if (searchModeSelect) {
+        searchModeSelect.style.display = show ? "inline-block" : "none";
+    }
 }
 
 
@@ -1174,6 +1519,7 @@ function loadFilesInFolder(folderName) {
     // Store current folder in button data attributes for later use
     anomalyScanBtn.dataset.currentFolder = folderName;
     analysisBtn.dataset.currentFolder = folderName;
+    document.getElementById("statsBtn").dataset.currentFolder = folderName;
     
     logGrid.innerHTML = '<p>Loading files...</p>';
     openFiles.clear(); // Clear tracked open files
@@ -1265,6 +1611,7 @@ function openAllFiles(folderName, files) {
     
     // Clear any currently open files
     openFiles.clear();
+    logViewers.clear();
     
     // Create or clear log files container
     let logFilesContainer = document.getElementById('logFilesContainer');
@@ -1505,8 +1852,8 @@ function viewLogFile(folderName, filename, isBatch = false) {
         });
     }
     
-    // Load actual file content
-    backend.read_log_file(folderName, filename).then((responseJson) => {
+    // Load the first lines; the rest are fetched as the card is scrolled
+    backend.read_log_lines(folderName, filename, 1, LOG_BLOCK_LINES).then((responseJson) => {
         try {
             const response = JSON.parse(responseJson);
             
@@ -1515,26 +1862,49 @@ function viewLogFile(folderName, filename, isBatch = false) {
                     // Use the file creation timestamp from the response
                     const timestamp = response.created_at || "Unknown date";
                     
-                    // Format the content with line numbers
-                    const contentLines = response.content.split('\n');
-                    const formattedContent = contentLines.map((line, index) => {
-                        return `<div class="log-line">
-                                    <span class="line-number">${index + 1}</span>
-                                    <span class="line-content">${line}</span>
-                                </div>`;
-                    }).join('');
-                    
-                    // Update the card content
+                    // Update the card content with an empty viewport sized
+                    // for every line of the file
                     newCard.innerHTML = `
                         <div class="log-card-header">
                             <h4>📄 ${filename}</h4>
                             <button class="close-btn" onclick="closeLogFile('${cardId}', '${fileKey}', '${folderName}')">✖</button>
                         </div>
-                        <div class="log-card-content">${formattedContent}</div>
+                        <div class="log-card-content virtual-log">
+                            <div class="log-viewport"><div class="log-window"></div></div>
+                        </div>
                         <div class="log-card-footer">
-                            <span>File created: ${timestamp}</span>
+                            <span>${response.total_lines} lines · File created: ${timestamp}</span>
                         </div>
                     `;
+                    
+                    const viewer = {
+                        cardId: cardId,
+                        folder: folderName,
+                        file: filename,
+                        totalLines: response.total_lines,
+                        blocks: new Map([[0, response.lines]]),
+                        loading: new Set(),
+                        searching: false,
+                        highlightLine: null,
+                        frame: null
+                    };
+                    logViewers.set(cardId, viewer);
+                    
+                    newCard.querySelector('.log-card-content').addEventListener('scroll', () => {
+                        // Render at most once per frame while scrolling
+                        if (viewer.frame) return;
+                        viewer.frame = requestAnimationFrame(() => {
+                            viewer.frame = null;
+                            renderLogWindow(viewer);
+                        });
+                    });
+                    
+                    // A search may have started while the file was loading
+                    if (currentSearch) {
+                        showSearchView(newCard);
+                    } else {
+                        renderLogWindow(viewer);
+                    }
             }else {
                 newCard.innerHTML = `
                     <div class="log-card-header">
@@ -1575,12 +1945,125 @@ function viewLogFile(folderName, filename, isBatch = false) {
 }
 
 
+// Render the lines of a log card that are in view, fetching missing blocks
+function renderLogWindow(viewer) {
+    const card = document.getElementById(viewer.cardId);
+    if (!card || viewer.searching) return;
+    
+    const content = card.querySelector('.log-card-content');
+    const viewport = card.querySelector('.log-viewport');
+    const windowElement = card.querySelector('.log-window');
+    if (!content || !viewport || !windowElement) return;
+    
+    viewport.style.height = `${viewer.totalLines * LOG_LINE_HEIGHT}px`;
+    
+    // Lines [first, last) are in view or within the overscan
+    const scrollTop = content.scrollTop - viewport.offsetTop;
+    const first = Math.max(0, Math.floor(scrollTop / LOG_LINE_HEIGHT) - LOG_OVERSCAN_LINES);
+    const last = Math.min(viewer.totalLines,
+        Math.ceil((scrollTop + content.clientHeight) / LOG_LINE_HEIGHT) + LOG_OVERSCAN_LINES);
+    
+    const fragment = document.createDocumentFragment();
+    for (let index = first; index < last; index++) {
+        const blockIndex = Math.floor(index / LOG_BLOCK_LINES);
+        const block = viewer.blocks.get(blockIndex);
+        if (block) {
+            // Mark the block as recently used
+            viewer.blocks.delete(blockIndex);
+            viewer.blocks.set(blockIndex, block);
+        } else {
+            requestLogBlock(viewer, blockIndex);
+        }
+        
+        const lineElement = createLogLine(index + 1, block ? (block[index % LOG_BLOCK_LINES] ?? '') : '');
+        if (index + 1 === viewer.highlightLine) {
+            lineElement.classList.add('highlight-line');
+        }
+        fragment.appendChild(lineElement);
+    }
+    
+    windowElement.style.transform = `translateY(${first * LOG_LINE_HEIGHT}px)`;
+    windowElement.replaceChildren(fragment);
+}
+
+// Fetch one block of lines for a virtual log viewer
+function requestLogBlock(viewer, blockIndex) {
+    if (viewer.loading.has(blockIndex)) return;
+    viewer.loading.add(blockIndex);
+    
+    backend.read_log_lines(viewer.folder, viewer.file, blockIndex * LOG_BLOCK_LINES + 1, LOG_BLOCK_LINES).then(responseJson => {
+        viewer.loading.delete(blockIndex);
+        const response = JSON.parse(responseJson);
+        if (!response.success) {
+            showNotification(response.message, "error");
+            return;
+        }
+        
+        viewer.blocks.set(blockIndex, response.lines);
+        // The file may have grown since it was opened
+        viewer.totalLines = response.total_lines;
+        // Drop the least recently used blocks
+        while (viewer.blocks.size > LOG_CACHED_BLOCKS) {
+            viewer.blocks.delete(viewer.blocks.keys().next().value);
+        }
+        renderLogWindow(viewer);
+    }).catch(err => {
+        viewer.loading.delete(blockIndex);
+        console.error("Error reading log lines:", err);
+    });
+}
+
+// Build a numbered log line element
+function createLogLine(lineNumber, content) {
+    const lineElement = document.createElement('div');
+    lineElement.className = 'log-line';
+    
+    const numberElement = document.createElement('span');
+    numberElement.className = 'line-number';
+    numberElement.textContent = lineNumber;
+    
+    const contentElement = document.createElement('span');
+    contentElement.className = 'line-content';
+    contentElement.textContent = content;
+    contentElement.title = content;
+    
+    lineElement.append(numberElement, contentElement);
+    return lineElement;
+}
+
+// Replace a card's lines with an empty list for search results
+function showSearchView(card) {
+    const content = card.querySelector('.log-card-content');
+    const viewport = card.querySelector('.log-viewport');
+    const viewer = logViewers.get(card.id);
+    if (!content || !viewport || !viewer) return;
+    
+    viewer.searching = true;
+    viewport.style.display = 'none';
+    
+    let results = card.querySelector('.log-search-results');
+    if (!results) {
+        results = document.createElement('div');
+        results.className = 'log-search-results';
+        content.appendChild(results);
+    }
+    results.innerHTML = '';
+    content.scrollTop = 0;
+}
+
+// Escape text for use in innerHTML
+function escapeHtml(text) {
+    return text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+}
+
+
 // Improved closeLogFile function
 
 // Modified closeLogFile to handle UI updates
 function closeLogFile(cardId, fileKey, folderName) {
     // Remove from tracking set
     openFiles.delete(fileKey);
+    logViewers.delete(cardId);
     
     // Remove the card
     const card = document.getElementById(cardId);
@@ -1631,6 +2114,7 @@ function backToFilesList(folderName) {
     
     // Clear open files tracking
     openFiles.clear();
+    logViewers.clear();
     
     // Reload the files in this folder
     loadFilesInFolder(folderName);
@@ -1,7 +1,9 @@
+import io
 import os
 import base64
+import time
+import hashlib
 import json
-import re
 import numpy as np
 from datetime import datetime
 from PySide6.QtCore import QObject, Slot, Signal, Property
@@ -11,8 +13,53 @@ from sklearn.pipeline import Pipeline
 from sklearn.model_selection import train_test_split
 import joblib
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 import sys
+import threading
+import itertools
+import queue
+import uuid
+from assets.py.log_patterns import AnomalyPatternEngine, classify_risk_type
+from assets.py.log_io import split_file_ranges, find_text_lines
+from assets.py.log_index import get_folder_index, get_line_index, index_path_for, update_folder_index
+from assets.py.log_query import LogQuery
+from assets.py.log_upload import UploadStore
+from assets.py.log_storage import (STORAGE_CODECS, compress_log_file, is_plain_log, list_log_files, log_file_exists,
+                                   log_file_size, log_file_stat, open_log_binary)
+from assets.py.log_model import ModelCache, analyze_line_range, drop_lines_after, new_file_results
+from assets.py.log_cache import AnalysisCache
+from assets.py.log_columns import get_record_columns, load_record_columns
+from assets.py.log_records import parse_timestamp
+from assets.py.log_results import EXPORT_FORMATS, EXPORT_TABLES, ResultStore, check_export_format, write_export
+from assets.py.log_workers import init_worker, scan_anomaly_range, deep_analysis_range
+
+# Number of worker processes used for anomaly detection and deep analysis
+ANALYSIS_WORKERS = os.cpu_count() or 1
+
+# Inputs smaller than this are analyzed in-process, where starting the
+# worker processes would cost more than it saves
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+# Bounds for the line-aligned byte ranges files are split into
+MIN_CHUNK_BYTES = 1024 * 1024
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Matches per page of search_logs_page and per event of a streaming search
+SEARCH_PAGE_SIZE = 500
+SEARCH_STREAM_BATCH = 100
+
+# Most lines read_log_lines returns per call
+MAX_WINDOW_LINES = 5000
+
+# Files modified more recently than this, in seconds, are still being
+# written and are left uncompressed by compress_logs
+FINISHED_LOG_AGE = 15 * 60
+
+# Sources get_log_statistics lists, most frequent first
+TOP_SOURCES = 20
+
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
     base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -21,6 +68,10 @@ def resource_path(relative_path):
 class BackendClass_log(QObject):
     # Add progress signal for frontend updates
     progressSignal = Signal(int, str)
+    # Background job finished: job id, job type, result JSON
+    analysisResultSignal = Signal(str, str, str)
+    # Streaming search results: search id, event JSON
+    searchResultSignal = Signal(str, str)
     
     def __init__(self):
         super().__init__()
@@ -28,9 +79,234 @@ class BackendClass_log(QObject):
         # Create base folders if they don't exist
         os.makedirs(self.base_folder, exist_ok=True)
         self.setup_anomaly_patterns()
+        self.setup_job_worker()
+        # Worker processes are only started by the first large analysis
+        self.process_pool = None
+        # Only the latest streaming search keeps running
+        self.current_search_id = None
+        # Chunked uploads are assembled here before moving to a date folder
+        self.upload_store = UploadStore(os.path.join(os.path.dirname(self.base_folder), 'upload_partial'))
+        # Per-file analysis results, reused while files and patterns/model don't change
+        self.analysis_cache = AnalysisCache(os.path.join(os.path.dirname(self.base_folder), 'result_cache'))
+        # Latest results, so exports don't need them sent back from the frontend
+        self.result_store = ResultStore()
+        # Load the model in the background now and whenever the file changes
+        self.model_path = os.path.abspath('./models/log_analysis_model.joblib')
+        self.model_cache = ModelCache(self.model_path)
+        self.model_cache.watch()
+        
+    def setup_job_worker(self):
+        """Start the background worker that runs analysis jobs off the GUI thread"""
+        self.jobs = {}
+        self.jobs_lock = threading.Lock()
+        self.job_queue = queue.Queue()
+        # A single worker runs jobs one at a time so they don't compete for
+        # the model and the progress overlay
+        self.job_thread = threading.Thread(target=self._job_worker, daemon=True)
+        self.job_thread.start()
+
+    def start_job(self, job_type, target, *args):
+        """
+        Queue a job for the background worker
+        
+        Args:
+            job_type: Name reported back with the result, e.g. 'anomaly'
+            target: Callable returning a JSON string
+            args: Arguments for target
         
+        Returns:
+            JSON string with the job id, returned to the frontend immediately
+        """
+        job_id = uuid.uuid4().hex
+        with self.jobs_lock:
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "type": job_type,
+                "status": "queued",
+                "submitted_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+        self.job_queue.put((job_id, job_type, target, args))
+        print(f"🧵 Queued {job_type} job {job_id}")
+        return json.dumps({
+            "status": "started",
+            "job_id": job_id,
+            "job_type": job_type,
+            "message": f"{job_type} job started in background"
+        })
+
+    def _job_worker(self):
+        """Run queued jobs and publish their results through analysisResultSignal"""
+        while True:
+            job_id, job_type, target, args = self.job_queue.get()
+            self._update_job(job_id, status="running")
+            try:
+                result = target(*args)
+                success = json.loads(result).get("success", False)
+                self._update_job(job_id, status="completed" if success else "failed")
+            except Exception as e:
+                print(f"❌ Error in {job_type} job {job_id}: {e}")
+                result = json.dumps({"success": False, "message": f"Error in {job_type} job: {str(e)}"})
+                self._update_job(job_id, status="failed")
+            
+            self.analysisResultSignal.emit(job_id, job_type, result)
+            self.job_queue.task_done()
+
+    def _update_job(self, job_id, **fields):
+        with self.jobs_lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    @Slot(str, result=str)
+    def get_job_status(self, job_id):
+        """Get the status of a background job"""
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return json.dumps({"success": False, "message": f"Unknown job: {job_id}"})
+            return json.dumps({"success": True, **job})
 
     
+    def get_process_pool(self):
+        """Get the analysis process pool, starting it on first use"""
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=ANALYSIS_WORKERS,
+                initializer=init_worker,
+                initargs=(self.anomaly_patterns,)
+            )
+        return self.process_pool
+
+    def map_file_ranges(self, file_paths, pool_task, local_task, progress_from, progress_to, message, starts=None):
+        """
+        Run a task over line-aligned byte ranges of every file
+        
+        Large inputs are fanned out to the process pool; small ones, or a run
+        where the pool breaks, are handled in this process.
+        
+        Args:
+            file_paths: List of log file paths
+            pool_task: Picklable function called as pool_task(file_path, start, end)
+                in a worker process, or None to stay in this process
+            local_task: In-process equivalent of pool_task
+            progress_from: Progress value when the first range starts
+            progress_to: Progress value when the last range is done
+            message: Progress message shown while ranges complete
+            starts: Byte offset (a line start) to begin each file at, for
+                only analysing what was appended; None for whole files
+        
+        Returns:
+            For each file, the list of its range results in file order
+        """
+        starts = starts or [0] * len(file_paths)
+        total_bytes = sum(max(log_file_size(file_path) - start, 0) for file_path, start in zip(file_paths, starts))
+        chunk_bytes = min(max(total_bytes // (ANALYSIS_WORKERS * 4), MIN_CHUNK_BYTES), MAX_CHUNK_BYTES)
+        file_ranges = [split_file_ranges(file_path, chunk_bytes, start) for file_path, start in zip(file_paths, starts)]
+        total_ranges = sum(len(ranges) for ranges in file_ranges)
+        results = [[None] * len(ranges) for ranges in file_ranges]
+
+        def report(done):
+            progress = progress_from + int((done / total_ranges) * (progress_to - progress_from))
+            self.progressSignal.emit(progress, f"{message} ({done} of {total_ranges} parts done)")
+
+        if pool_task is not None and ANALYSIS_WORKERS > 1 and total_bytes >= PARALLEL_MIN_BYTES:
+            print(f"⚙️ Splitting {total_bytes} bytes into {total_ranges} parts for {ANALYSIS_WORKERS} workers")
+            try:
+                pool = self.get_process_pool()
+                futures = {}
+                for file_idx, (file_path, ranges) in enumerate(zip(file_paths, file_ranges)):
+                    for range_idx, (start, end) in enumerate(ranges):
+                        future = pool.submit(pool_task, file_path, start, end)
+                        futures[future] = (file_idx, range_idx)
+
+                for done, future in enumerate(as_completed(futures), 1):
+                    file_idx, range_idx = futures[future]
+                    results[file_idx][range_idx] = future.result()
+                    report(done)
+                return results
+            except BrokenProcessPool as e:
+                print(f"⚠️ Process pool failed, analyzing in this process instead: {e}")
+                self.process_pool = None
+
+        done = 0
+        for file_idx, (file_path, ranges) in enumerate(zip(file_paths, file_ranges)):
+            for range_idx, (start, end) in enumerate(ranges):
+                results[file_idx][range_idx] = local_task(file_path, start, end)
+                done += 1
+                report(done)
+        return results
+
+    def scan_text_files(self, file_paths, text, limit=0, is_cancelled=None):
+        """
+        Search files for text without the search index
+        
+        Each file's line-aligned ranges are searched on the raw bytes (see
+        find_text_lines); large inputs are spread over the process pool with
+        every range submitted up front, so later files are searched while
+        earlier ones are reported. Closing the generator cancels the ranges
+        that have not started yet.
+        
+        Args:
+            file_paths: List of log file paths
+            text: Text to look for, case-insensitively
+            limit: Stop searching a file after this many matches (no limit
+                if not positive)
+            is_cancelled: Optional function checked between ranges; the
+                search stops when it returns True
+        
+        Yields:
+            (file_path, matches, truncated) in file order, where matches is a
+            list of (line_number, line) and truncated tells whether the file
+            has more matches than the limit
+        """
+        total_bytes = sum(log_file_size(file_path) for file_path in file_paths)
+        chunk_bytes = min(max(total_bytes // (ANALYSIS_WORKERS * 4), MIN_CHUNK_BYTES), MAX_CHUNK_BYTES)
+        file_ranges = [split_file_ranges(file_path, chunk_bytes) for file_path in file_paths]
+        # One extra match tells whether the file was cut short
+        range_limit = limit + 1 if limit > 0 else 0
+        
+        futures = None
+        if ANALYSIS_WORKERS > 1 and total_bytes >= PARALLEL_MIN_BYTES:
+            try:
+                pool = self.get_process_pool()
+                futures = [[pool.submit(find_text_lines, file_path, text, start, end, range_limit)
+                            for start, end in ranges]
+                           for file_path, ranges in zip(file_paths, file_ranges)]
+            except BrokenProcessPool as e:
+                print(f"⚠️ Process pool failed, searching in this process instead: {e}")
+                self.process_pool = None
+        
+        try:
+            for file_idx, (file_path, ranges) in enumerate(zip(file_paths, file_ranges)):
+                matches = []
+                line_offset = 0
+                for range_idx, (start, end) in enumerate(ranges):
+                    if is_cancelled and is_cancelled():
+                        return
+                    result = None
+                    if futures:
+                        try:
+                            result = futures[file_idx][range_idx].result()
+                        except BrokenProcessPool as e:
+                            print(f"⚠️ Process pool failed, searching in this process instead: {e}")
+                            self.process_pool = None
+                            futures = None
+                    if result is None:
+                        result = find_text_lines(file_path, text, start, end, range_limit)
+                    
+                    line_count, hits = result
+                    matches.extend((line_offset + line_number, line) for line_number, line in hits)
+                    line_offset += line_count
+                    if 0 < range_limit <= len(matches):
+                        break
+                
+                truncated = 0 < limit < len(matches)
+                yield file_path, matches[:limit] if truncated else matches, truncated
+        finally:
+            if futures:
+                for file_futures in futures:
+                    for future in file_futures:
+                        future.cancel()
+
     @Slot(str, str, result=str)
     def save_log_file(self, filename, base64_data):
         try:
@@ -56,6 +332,8 @@ class BackendClass_log(QObject):
             }
             
             print(f"✅ File saved: {file_path}")
+            # Index the new file in the background so searches stay fast
+            threading.Thread(target=update_folder_index, args=(date_folder,), daemon=True).start()
             return json.dumps(result)
 
         except Exception as e:
@@ -63,6 +341,163 @@ class BackendClass_log(QObject):
             print(f"❌ {error_msg}")
             return json.dumps({"success": False, "message": error_msg})
 
+    @Slot(str, float, int, str, result=str)
+    def begin_upload(self, filename, total_size, chunk_size, fingerprint):
+        """
+        Start a chunked upload, or resume an interrupted one
+        
+        Args:
+            filename: Name of the file
+            total_size: Size of the file in bytes
+            chunk_size: Size of every chunk but the last
+            fingerprint: Identifies this version of the file, e.g. its
+                modification time; the same arguments resume the same upload
+        
+        Returns:
+            JSON with the upload_id and the bytes already received, from
+            which the next chunk should start
+        """
+        try:
+            upload_id, received = self.upload_store.begin(filename, int(total_size), chunk_size, fingerprint)
+            if received:
+                print(f"📤 Resuming upload of {filename} at {received} of {int(total_size)} bytes")
+            return json.dumps({"success": True, "upload_id": upload_id, "received": received})
+        except Exception as e:
+            error_msg = f"Error starting upload: {str(e)}"
+            print(f"❌ {error_msg}")
+            return json.dumps({"success": False, "message": error_msg})
+
+    @Slot(str, float, str, str, result=str)
+    def append_upload_chunk(self, upload_id, offset, base64_chunk, chunk_sha256):
+        """
+        Write the next chunk of an upload to disk
+        
+        Args:
+            upload_id: Id from begin_upload
+            offset: Byte offset of the chunk in the file
+            base64_chunk: The chunk, base64-encoded
+            chunk_sha256: Hex SHA-256 of the chunk, checked if not empty
+        
+        Returns:
+            JSON with the bytes received so far
+        """
+        try:
+            received = self.upload_store.append(upload_id, int(offset), base64.b64decode(base64_chunk), chunk_sha256)
+            return json.dumps({"success": True, "received": received})
+        except Exception as e:
+            error_msg = f"Error uploading chunk: {str(e)}"
+            print(f"❌ {error_msg}")
+            return json.dumps({"success": False, "message": error_msg})
+
+    @Slot(str, str, result=str)
+    def commit_upload(self, upload_id, checksum):
+        """
+        Finish an upload and store the file in today's date folder
+        
+        Args:
+            upload_id: Id from begin_upload
+            checksum: SHA-256 of the chunks' concatenated SHA-256 digests,
+                checked if not empty
+        
+        Returns:
+            JSON in the format of save_log_file
+        """
+        try:
+            today = datetime.now().strftime('%Y-%m-%d')
+            date_folder = os.path.join(self.base_folder, today)
+            file_path = self.upload_store.commit(upload_id, checksum, date_folder)
+            
+            print(f"✅ File saved: {file_path}")
+            # Index the new file in the background so searches stay fast
+            threading.Thread(target=update_folder_index, args=(date_folder,), daemon=True).start()
+            return json.dumps({
+                "success": True,
+                "message": f"File saved successfully",
+                "path": file_path,
+                "folder": today
+            })
+        except Exception as e:
+            error_msg = f"Error saving file: {str(e)}"
+            print(f"❌ {error_msg}")
+            return json.dumps({"success": False, "message": error_msg})
+
+    @Slot(str, result=str)
+    def abort_upload(self, upload_id):
+        """Discard an unfinished upload"""
+        try:
+            self.upload_store.abort(upload_id)
+            return json.dumps({"success": True})
+        except Exception as e:
+            error_msg = f"Error cancelling upload: {str(e)}"
+            print(f"❌ {error_msg}")
+            return json.dumps({"success": False, "message": error_msg})
+
+    @Slot(str, str, result=str)
+    def compress_logs(self, folder_name, codec):
+        """
+        Start compressing the finished log files of a folder in the background
+        
+        Files are stored in a seekable format that every reader decompresses
+        on the fly (see log_storage), so they stay searchable and viewable.
+        The result arrives through analysisResultSignal with job type
+        'compress'.
+        
+        Args:
+            folder_name: Folder inside the upload folder
+            codec: 'gzip' or 'zstd' (needs the zstandard package)
+        """
+        return self.start_job("compress", self.run_compress_logs, folder_name, codec or "gzip")
+
+    def run_compress_logs(self, folder_name, codec):
+        """Compress the files of a folder not modified in the last FINISHED_LOG_AGE seconds"""
+        try:
+            if codec not in STORAGE_CODECS:
+                return json.dumps({"success": False, "message": f"Unknown storage codec: {codec}"})
+            folder_path = os.path.join(self.base_folder, folder_name)
+            if not os.path.isdir(folder_path):
+                return json.dumps({"success": False, "message": f"Folder not found: {folder_path}"})
+            
+            cutoff = time.time() - FINISHED_LOG_AGE
+            file_names = [file_name for file_name in sorted(os.listdir(folder_path))
+                          if os.path.isfile(os.path.join(folder_path, file_name))
+                          and os.path.getmtime(os.path.join(folder_path, file_name)) < cutoff
+                          and is_plain_log(os.path.join(folder_path, file_name))]
+            
+            compressed = []
+            bytes_before = 0
+            bytes_after = 0
+            for i, file_name in enumerate(file_names):
+                self.progressSignal.emit(int(i / len(file_names) * 100), f"Compressing {file_name}...")
+                file_path = os.path.join(folder_path, file_name)
+                size = os.path.getsize(file_path)
+                try:
+                    # Written beside the folder so it never shows up as a log
+                    compressed_path = compress_log_file(file_path, codec, index_path_for(folder_path, '.compress.tmp'))
+                except (ValueError, OSError) as e:
+                    print(f"⚠️ Skipping {file_path}: {e}")
+                    continue
+                bytes_before += size
+                bytes_after += os.path.getsize(compressed_path)
+                compressed.append(os.path.basename(compressed_path))
+                print(f"🗜️ Compressed {file_path} ({size} -> {os.path.getsize(compressed_path)} bytes)")
+            
+            self.progressSignal.emit(100, "Compression complete")
+            if compressed:
+                # Re-index under the new names
+                threading.Thread(target=update_folder_index, args=(folder_path,), daemon=True).start()
+            return json.dumps({
+                "success": True,
+                "folder": folder_name,
+                "codec": codec,
+                "files": compressed,
+                "bytes_before": bytes_before,
+                "bytes_after": bytes_after
+            })
+        except Exception as e:
+            error_msg = f"Error compressing logs: {str(e)}"
+            print(f"❌ {error_msg}")
+            return json.dumps({"success": False, "message": error_msg})
+
     @Slot(result=str)
     def list_folders(self):
         try:
@@ -90,14 +525,9 @@ class BackendClass_log(QObject):
             files = []
             
             if os.path.exists(folder_path):
-                # List only files (not directories)
-                for item in os.listdir(folder_path):
-                    item_path = os.path.join(folder_path, item)
-                    if os.path.isfile(item_path):
-                        files.append(item)
-            
-            # Sort files alphabetically
-            files.sort()
+                # Files, sorted, with the members of zip and tar archives
+                # listed as files of their own
+                files = list_log_files(folder_path)
             
             return json.dumps({
                 "success": True,
@@ -115,7 +545,7 @@ class BackendClass_log(QObject):
         try:
             file_path = os.path.join(self.base_folder, folder_name, file_name)
             
-            if not os.path.exists(file_path):
+            if not log_file_exists(file_path):
                 return json.dumps({
                     "success": False,
                     "message": f"File not found: {file_path}"
@@ -123,11 +553,11 @@ class BackendClass_log(QObject):
             
             # Get file creation time
             import datetime
-            file_stats = os.stat(file_path)
+            file_stats = log_file_stat(file_path)
             creation_time = file_stats.st_ctime
             creation_time_str = datetime.datetime.fromtimestamp(creation_time).strftime('%Y-%m-%d %H:%M:%S')
             
-            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            with io.TextIOWrapper(open_log_binary(file_path), encoding='utf-8', errors='replace') as f:
                 content = f.read()
             
             return json.dumps({
@@ -142,9 +572,166 @@ class BackendClass_log(QObject):
             print(f"❌ {error_msg}")
             return json.dumps({"success": False, "message": error_msg})
 
+    @Slot(str, str, int, int, result=str)
+    def read_log_lines(self, folder_name, file_name, start_line, line_count):
+        """
+        Read a range of lines of a log file
+        
+        Uses the folder's persistent line-offset index to jump straight to
+        the range, so the viewer can page through files of any size.
+        
+        Args:
+            folder_name: Folder inside the upload folder
+            file_name: Log file in the folder
+            start_line: 1-based number of the first line
+            line_count: Number of lines (at most MAX_WINDOW_LINES)
+        
+        Returns:
+            JSON with the lines, start_line and total_lines of the file
+        """
+        try:
+            folder_path = os.path.join(self.base_folder, folder_name)
+            file_path = os.path.join(folder_path, file_name)
+            
+            if not log_file_exists(file_path):
+                return json.dumps({
+                    "success": False,
+                    "message": f"File not found: {file_path}"
+                })
+            
+            start_line = max(start_line, 1)
+            line_count = min(max(line_count, 0), MAX_WINDOW_LINES)
+            lines, total_lines = get_line_index(folder_path).read_lines(file_name, start_line, line_count)
+            created_at = datetime.fromtimestamp(log_file_stat(file_path).st_ctime).strftime('%Y-%m-%d %H:%M:%S')
+            
+            return json.dumps({
+                "success": True,
+                "folder": folder_name,
+                "file": file_name,
+                "start_line": start_line,
+                "lines": lines,
+                "total_lines": total_lines,
+                "created_at": created_at
+            })
+        except Exception as e:
+            error_msg = f"Error reading file: {str(e)}"
+            print(f"❌ {error_msg}")
+            return json.dumps({"success": False, "message": error_msg})
+
+    @Slot(str, str, str, str, result=str)
+    def get_log_statistics(self, folder_name, file_name, start_time, end_time):
+        """
+        Count the lines of each level and source of log files
+        
+        Works on the files' record columns (see log_columns), so the counts
+        over millions of lines are array operations. Columns already saved
+        beside the search index are counted right away; otherwise they're
+        parsed in the background and the statistics arrive through
+        analysisResultSignal with job type 'statistics'.
+        
+        Args:
+            folder_name: Folder inside the upload folder
+            file_name: Log file in the folder, empty for all of them
+            start_time: Only count lines from this time on (ISO 8601), or empty
+            end_time: Only count lines before this time (ISO 8601), or empty
+        
+        Returns:
+            JSON with the statistics (see run_log_statistics), or with the job
+            id when the columns have to be built first
+        """
+        try:
+            folder_path = os.path.join(self.base_folder, folder_name)
+            if not os.path.isdir(folder_path):
+                return json.dumps({"success": False, "message": f"Folder not found: {folder_path}"})
+            file_names = [file_name] if file_name else list_log_files(folder_path)
+            for name in file_names:
+                if not log_file_exists(os.path.join(folder_path, name)):
+                    return json.dumps({"success": False, "message": f"File not found: {name}"})
+            
+            bounds = []
+            for text in (start_time, end_time):
+                timestamp = parse_timestamp(text) if text else None
+                if text and timestamp is None:
+                    return json.dumps({"success": False, "message": f"Invalid time: {text}"})
+                bounds.append(timestamp)
+            
+            if all(load_record_columns(folder_path, name) is not None for name in file_names):
+                return self.run_log_statistics(folder_name, file_names, bounds)
+            return self.start_job("statistics", self.run_log_statistics, folder_name, file_names, bounds)
+        except Exception as e:
+            error_msg = f"Error computing log statistics: {str(e)}"
+            print(f"❌ {error_msg}")
+            return json.dumps({"success": False, "message": error_msg})
+
+    def run_log_statistics(self, folder_name, file_names, bounds):
+        """
+        Count the lines of log files from their record columns, building those missing
+        
+        Returns:
+            JSON with the number of lines and of lines counted, level counts,
+            the TOP_SOURCES most frequent sources and the first and last
+            timestamp of the counted lines
+        """
+        try:
+            folder_path = os.path.join(self.base_folder, folder_name)
+            time_filter = bounds != [None, None]
+            
+            total_lines = 0
+            counted_lines = 0
+            levels = {}
+            sources = {}
+            first = last = None
+            for i, name in enumerate(file_names):
+                columns = load_record_columns(folder_path, name)
+                if columns is None:
+                    self.progressSignal.emit(int(i / len(file_names) * 100), f"Parsing {name}...")
+                    columns = get_record_columns(folder_path, name)
+                mask = columns.time_mask(*bounds) if time_filter else None
+                total_lines += len(columns.timestamps)
+                counted_lines += len(columns.timestamps) if mask is None else int(mask.sum())
+                for level, count in columns.level_counts(mask).items():
+                    levels[level] = levels.get(level, 0) + count
+                for source, count in columns.source_counts(mask).items():
+                    sources[source] = sources.get(source, 0) + count
+                time_bounds = columns.time_bounds(mask)
+                if time_bounds:
+                    first = time_bounds[0] if first is None else min(first, time_bounds[0])
+                    last = time_bounds[1] if last is None else max(last, time_bounds[1])
+            
+            top_sources = sorted(sources.items(), key=lambda item: (-item[1], item[0]))[:TOP_SOURCES]
+            return json.dumps({
+                "success": True,
+                "folder": folder_name,
+                "files": len(file_names),
+                "total_lines": total_lines,
+                "counted_lines": counted_lines,
+                "levels": dict(sorted(levels.items(), key=lambda item: -item[1])),
+                "sources": [{"source": source, "count": count} for source, count in top_sources],
+                "distinct_sources": len(sources),
+                "first_timestamp": datetime.fromtimestamp(first).isoformat() if first is not None else None,
+                "last_timestamp": datetime.fromtimestamp(last).isoformat() if last is not None else None
+            })
+        except Exception as e:
+            error_msg = f"Error computing log statistics: {str(e)}"
+            print(f"❌ {error_msg}")
+            return json.dumps({"success": False, "message": error_msg})
+
     @Slot(str, str, result=str)
     def search_in_logs(self, folder_name, search_term):
         """Search for a term in all log files in a folder"""
+        return self.search_logs(folder_name, search_term, "text")
+
+    @Slot(str, str, str, result=str)
+    def search_logs(self, folder_name, query, mode):
+        """
+        Search all log files in a folder with a query
+        
+        Args:
+            folder_name: Folder inside the upload folder
+            query: Search text, regex or terms query depending on mode
+            mode: 'text' (substring), 'regex' or 'terms' (AND/OR of words
+                and phrases with level:/source: filters), see LogQuery
+        """
         try:
             folder_path = os.path.join(self.base_folder, folder_name)
             results = []
@@ -155,23 +742,28 @@ class BackendClass_log(QObject):
                     "message": f"Folder not found: {folder_path}"
                 })
             
+            # Compile the query once for the whole search
+            try:
+                log_query = LogQuery(query, mode or "text")
+            except ValueError as e:
+                return json.dumps({"success": False, "message": str(e)})
+            
+            # Index new or changed files, then answer from the index
+            index = get_folder_index(folder_path)
+            index.refresh()
+            
             # Search in each file
-            for file_name in os.listdir(folder_path):
+            for file_name in list_log_files(folder_path):
                 file_path = os.path.join(folder_path, file_name)
-                if os.path.isfile(file_path):
+                if log_file_exists(file_path):
                     try:
-                        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                            content = f.read()
-                            
                         # Find all occurrences
                         matches = []
-                        lines = content.split('\n')
-                        for line_number, line in enumerate(lines, 1):
-                            if search_term.lower() in line.lower():
-                                matches.append({
-                                    "line_number": line_number,
-                                    "content": line
-                                })
+                        for line_number, line in index.search_file_query(file_name, log_query):
+                            matches.append({
+                                "line_number": line_number,
+                                "content": line
+                            })
                         
                         if matches:
                             results.append({
@@ -185,7 +777,8 @@ class BackendClass_log(QObject):
             return json.dumps({
                 "success": True,
                 "folder": folder_name,
-                "search_term": search_term,
+                "search_term": query,
+                "mode": log_query.mode,
                 "results": results,
                 "total_files_with_matches": len(results)
             })
@@ -193,7 +786,265 @@ class BackendClass_log(QObject):
             error_msg = f"Error searching logs: {str(e)}"
             print(f"❌ {error_msg}")
             return json.dumps({"success": False, "message": error_msg})
+
+    @Slot(str, str, int, result=str)
+    def search_logs_parallel(self, folder_name, search_term, limit):
+        """
+        Search all log files in a folder for text without the search index
+        
+        Files are searched in parallel on their raw bytes, which needs no
+        indexing first, and the search stops once limit matches are found.
+        
+        Args:
+            folder_name: Folder inside the upload folder
+            search_term: Text to look for, case-insensitively
+            limit: Maximum number of matches (no limit if not positive)
+        
+        Returns:
+            JSON in the format of search_logs, with 'truncated' set when the
+            limit cut the results short
+        """
+        try:
+            folder_path = os.path.join(self.base_folder, folder_name)
+            if not os.path.isdir(folder_path):
+                return json.dumps({
+                    "success": False,
+                    "message": f"Folder not found: {folder_path}"
+                })
+            
+            # Archive members have a / in their names, so keep the names
+            file_names = {os.path.join(folder_path, file_name): file_name for file_name in list_log_files(folder_path)}
+            
+            results = []
+            truncated = False
+            remaining = limit
+            scan = self.scan_text_files(list(file_names), search_term, limit)
+            try:
+                for file_path, matches, file_truncated in scan:
+                    if limit > 0 and len(matches) > remaining:
+                        matches = matches[:remaining]
+                        file_truncated = True
+                    if matches:
+                        results.append({
+                            "file_name": file_names[file_path],
+                            "matches": [{"line_number": line_number, "content": line} for line_number, line in matches],
+                            "match_count": len(matches)
+                        })
+                        remaining -= len(matches)
+                    if file_truncated:
+                        # Stop at the limit; closing the scan cancels the rest
+                        truncated = True
+                        break
+            finally:
+                scan.close()
+            
+            return json.dumps({
+                "success": True,
+                "folder": folder_name,
+                "search_term": search_term,
+                "mode": "text",
+                "results": results,
+                "total_files_with_matches": len(results),
+                "truncated": truncated
+            })
+        except Exception as e:
+            error_msg = f"Error searching logs: {str(e)}"
+            print(f"❌ {error_msg}")
+            return json.dumps({"success": False, "message": error_msg})
+
+    def prepare_search(self, folder_name, query, mode, refresh=True):
+        """
+        Compile a query and bring the folder's search index up to date
+        
+        Args:
+            refresh: False to use the index as it is, without indexing new
+                or changed files first
+        
+        Returns:
+            (index, log_query, file_names) with the folder's files sorted
+        
+        Raises:
+            ValueError: for a missing folder or an invalid query
+        """
+        folder_path = os.path.join(self.base_folder, folder_name)
+        if not os.path.isdir(folder_path):
+            raise ValueError(f"Folder not found: {folder_path}")
+        
+        log_query = LogQuery(query, mode or "text")
+        index = get_folder_index(folder_path)
+        if refresh:
+            index.refresh()
+        file_names = list_log_files(folder_path)
+        return index, log_query, file_names
+
+    @Slot(str, str, str, str, int, result=str)
+    def search_logs_page(self, folder_name, query, mode, cursor, limit):
+        """
+        Get one page of search results
+        
+        Args:
+            folder_name: Folder inside the upload folder
+            query: Search query, see search_logs
+            mode: Query mode, see search_logs
+            cursor: next_cursor of the previous page, empty for the first page
+            limit: Maximum matches on this page (SEARCH_PAGE_SIZE if not positive)
+        
+        Returns:
+            JSON with the page's results per file and next_cursor, which is
+            null after the last page
+        """
+        try:
+            index, log_query, file_names = self.prepare_search(folder_name, query, mode)
+            limit = limit if limit > 0 else SEARCH_PAGE_SIZE
+            
+            # The cursor names the file and line the previous page stopped at
+            position = json.loads(cursor) if cursor else {"file": "", "line": 0}
+            results = []
+            next_cursor = None
+            remaining = limit
+            
+            for file_name in file_names:
+                if file_name < position["file"]:
+                    continue
+                after_line = position["line"] if file_name == position["file"] else 0
+                
+                matches = []
+                for line_number, line in index.iter_file_query(file_name, log_query, after_line):
+                    if remaining == 0:
+                        # One more match exists, so there is a next page
+                        next_cursor = json.dumps({"file": file_name, "line": matches[-1]["line_number"] if matches else after_line})
+                        break
+                    matches.append({"line_number": line_number, "content": line})
+                    remaining -= 1
+                
+                if matches:
+                    results.append({
+                        "file_name": file_name,
+                        "matches": matches,
+                        "match_count": len(matches)
+                    })
+                if next_cursor:
+                    break
+            
+            return json.dumps({
+                "success": True,
+                "folder": folder_name,
+                "search_term": query,
+                "mode": log_query.mode,
+                "results": results,
+                "next_cursor": next_cursor
+            })
+        except Exception as e:
+            error_msg = f"Error searching logs: {str(e)}"
+            print(f"❌ {error_msg}")
+            return json.dumps({"success": False, "message": error_msg})
+
+    @Slot(str, str, str, str, str, int, result=str)
+    def start_search(self, search_id, folder_name, query, mode, file_names, per_file_limit):
+        """
+        Start a search that streams its results through searchResultSignal
+        
+        Starting a search supersedes the previous one, which stops at its
+        next match. Events are JSON objects with a 'type' of 'matches'
+        (a batch of matches of one file), 'file_done', 'done' or 'error'.
+        
+        Text searches don't wait for new or changed files to be indexed:
+        those are searched in parallel on their raw bytes while the index
+        catches up in the background.
+        
+        Args:
+            search_id: Id chosen by the caller, so it can recognise events
+                sent before this call returns; generated if empty
+            folder_name: Folder inside the upload folder
+            query: Search query, see search_logs
+            mode: Query mode, see search_logs
+            file_names: JSON array of files to search, empty for all files
+            per_file_limit: Stop searching a file after this many matches
+                (no limit if not positive)
+        
+        Returns:
+            JSON with the search id used in the signal
+        """
+        search_id = search_id or str(uuid.uuid4())
+        self.current_search_id = search_id
+        threading.Thread(
+            target=self._run_search,
+            args=(search_id, folder_name, query, mode, file_names, per_file_limit),
+            daemon=True
+        ).start()
+        return json.dumps({"status": "started", "search_id": search_id})
+
+    @Slot(str)
+    def cancel_search(self, search_id):
+        """Stop a streaming search if it is still the current one"""
+        if self.current_search_id == search_id:
+            self.current_search_id = None
+
+    def _run_search(self, search_id, folder_name, query, mode, file_names, per_file_limit):
+        """Run a streaming search in a background thread"""
+        def emit(event):
+            self.searchResultSignal.emit(search_id, json.dumps(event))
+        
+        def superseded():
+            return self.current_search_id != search_id
+        
+        scan = None
+        try:
+            text_mode = (mode or "text") == "text"
+            index, log_query, all_files = self.prepare_search(folder_name, query, mode, refresh=not text_mode)
+            if file_names:
+                wanted = set(json.loads(file_names))
+                all_files = [file_name for file_name in all_files if file_name in wanted]
+            
+            # Files the index doesn't cover yet are scanned directly
+            unindexed = [file_name for file_name in all_files if text_mode and not index.is_current(file_name)]
+            scanned = set(unindexed)
+            if unindexed:
+                threading.Thread(target=update_folder_index, args=(index.folder_path,), daemon=True).start()
+                scan = self.scan_text_files([os.path.join(index.folder_path, file_name) for file_name in unindexed],
+                                            query, per_file_limit, superseded)
+            
+            total_matches = 0
+            files_with_matches = 0
+            for file_name in all_files:
+                match_count = 0
+                truncated = False
+                batch = []
+                if file_name in scanned:
+                    _, matches, truncated = next(scan, (None, [], False))
+                else:
+                    matches = index.iter_file_query(file_name, log_query)
+                for line_number, line in matches:
+                    if superseded():
+                        print(f"🔍 Search {search_id} superseded")
+                        return
+                    if 0 < per_file_limit <= match_count:
+                        truncated = True
+                        break
+                    batch.append({"line_number": line_number, "content": line})
+                    match_count += 1
+                    if len(batch) >= SEARCH_STREAM_BATCH:
+                        emit({"type": "matches", "file_name": file_name, "matches": batch})
+                        batch = []
+                
+                if superseded():
+                    print(f"🔍 Search {search_id} superseded")
+                    return
+                if batch:
+                    emit({"type": "matches", "file_name": file_name, "matches": batch})
+                emit({"type": "file_done", "file_name": file_name, "match_count": match_count, "truncated": truncated})
+                total_matches += match_count
+                files_with_matches += 1 if match_count else 0
             
+            emit({"type": "done", "total_matches": total_matches, "total_files_with_matches": files_with_matches})
+        except Exception as e:
+            error_msg = f"Error searching logs: {str(e)}"
+            print(f"❌ {error_msg}")
+            emit({"type": "error", "message": error_msg})
+        finally:
+            if scan is not None:
+                scan.close()
+
     def setup_anomaly_patterns(self):
         """Setup patterns for detecting anomalies in logs"""
         self.anomaly_patterns = {
@@ -345,10 +1196,25 @@ class BackendClass_log(QObject):
                 "danger_level": "High"
             }
         }
+
+        # Compile the table once instead of on every re.search call
+        self.anomaly_engine = AnomalyPatternEngine(self.anomaly_patterns)
+        # Cached anomaly results are only valid for this exact table
+        self.anomaly_patterns_version = hashlib.sha256(
+            json.dumps(self.anomaly_patterns, sort_keys=True).encode('utf-8')).hexdigest()
         
     
     @Slot(str, str, result=str)
     def detect_anomalies(self, folder_path, file_names):
+        """
+        Start anomaly detection in the background
+        
+        Returns a job id straight away; the result arrives through
+        analysisResultSignal with job type 'anomaly'.
+        """
+        return self.start_job("anomaly", self.run_anomaly_detection, folder_path, file_names)
+
+    def run_anomaly_detection(self, folder_path, file_names):
         """
         Detect anomalies in specified log files
         """
@@ -374,63 +1240,77 @@ class BackendClass_log(QObject):
             anomaly_stats = {
                 "total_files": total_files,
                 "total_anomalies": 0,
-                "danger_levels": {"High": 0, "Medium": 0, "Low": 0}
+                "danger_levels": {"Critical": 0, "High": 0, "Medium": 0, "Low": 0}
             }
             
-            for idx, filename in enumerate(files):
+            # Skip missing files up front so only real files are split
+            file_paths = {}
+            for filename in files:
                 file_path = os.path.join(folder_path, filename)
-                print(f"\n📄 Processing file {idx + 1}/{total_files}: {filename}")
-
-                # Signal progress - use a formula that leaves 5% at start and ends at 95%
-                # to allow for preparation and finalization steps
-                progress = 5 + int(((idx) / total_files) * 90)
-                self.progressSignal.emit(progress, f"Processing file {idx + 1} of {total_files}")
-                
-                if not os.path.exists(file_path) or not os.path.isfile(file_path):
+                if not log_file_exists(file_path):
                     print(f"⚠️ File not found or invalid: {file_path}")
                     continue
+                file_paths[filename] = file_path
 
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    content = f.read()
-                    lines = content.split('\n')
-                    print(f"📝 Total lines in file: {len(lines)}")
-                    
-                    # Optionally, update progress for large files
-                    if len(lines) > 10000:
-                        self.progressSignal.emit(progress, f"Processing large file: {filename} ({len(lines)} lines)")
-
-                    for line_number, line in enumerate(lines, 1):
-                        for anomaly_name, anomaly_data in self.anomaly_patterns.items():
-                            patterns = anomaly_data["patterns"]
-                            danger_level = anomaly_data["danger_level"]
-                            
-                            for pattern in patterns:
-                                match = re.search(pattern, line, re.IGNORECASE)
-                                if match:
-                                    anomaly_stats["total_anomalies"] += 1
-                                    anomaly_stats["danger_levels"][danger_level] += 1
-                                    
-                                    highlighted_log = line.replace(match.group(0), f"<span class='highlight'>{match.group(0)}</span>")
-                                    
-                                    anomaly_result = {
-                                        "anomaly_name": anomaly_name,
-                                        "danger_level": danger_level,
-                                        "file_name": filename,
-                                        "line_number": line_number,
-                                        "log_content": highlighted_log,
-                                        "raw_content": line
-                                    }
-                                    results.append(anomaly_result)
-
-                                    print(f"🚨 Anomaly detected: [{danger_level}] {anomaly_name} at line {line_number}")
-                                    # Break after first match
-                                    break
+            # Unchanged files get their stored results; files that were
+            # appended to are only scanned from their old last line on
+            lookups = {filename: self.analysis_cache.lookup("anomaly", self.anomaly_patterns_version, file_path)
+                       for filename, file_path in file_paths.items()}
+            pending = [filename for filename in file_paths if lookups[filename].result is None]
+            print(f"♻️ Reusing stored results for {len(file_paths) - len(pending)} of {len(file_paths)} files")
+
+            # Scan the files in line-aligned parts, in worker processes for
+            # large inputs, then stitch the parts back together in order
+            file_parts = self.map_file_ranges(
+                [file_paths[filename] for filename in pending],
+                scan_anomaly_range,
+                partial(scan_anomaly_range, engine=self.anomaly_engine),
+                5, 90, "Scanning log files",
+                starts=[lookups[filename].tail_start for filename in pending]
+            )
+
+            for filename, parts in zip(pending, file_parts):
+                lookup = lookups[filename]
+                line_offset = 0
+                file_hits = []
+                if lookup.base is not None:
+                    print(f"➕ {filename} grew, scanning from line {lookup.kept_lines + 1}")
+                    line_offset = lookup.kept_lines
+                    file_hits = [hit for hit in lookup.base["hits"] if hit[0] <= line_offset]
+                for line_count, hits in parts:
+                    file_hits.extend((line_number + line_offset, *hit) for line_number, *hit in hits)
+                    line_offset += line_count
+                lookup.result = {"line_count": line_offset, "hits": file_hits}
+                self.analysis_cache.store(lookup, lookup.result, line_offset)
+
+            for filename in file_paths:
+                print(f"\n📄 Collecting results for {filename}")
+                file_result = lookups[filename].result
+                for line_number, anomaly_name, danger_level, matched_text, line in file_result["hits"]:
+                    anomaly_stats["total_anomalies"] += 1
+                    anomaly_stats["danger_levels"][danger_level] += 1
+
+                    highlighted_log = line.replace(matched_text, f"<span class='highlight'>{matched_text}</span>")
+
+                    anomaly_result = {
+                        "anomaly_name": anomaly_name,
+                        "danger_level": danger_level,
+                        "file_name": filename,
+                        "line_number": line_number,
+                        "log_content": highlighted_log,
+                        "raw_content": line
+                    }
+                    results.append(anomaly_result)
+
+                    print(f"🚨 Anomaly detected: [{danger_level}] {anomaly_name} at line {line_number}")
+
+                print(f"📝 Total lines in file: {file_result['line_count']}")
 
             # Sort results - update progress to show sorting step
             self.progressSignal.emit(95, "Sorting and finalizing results...")
             print("\n🔃 Sorting results by danger level...")
-            danger_level_order = {"High": 0, "Medium": 1, "Low": 2}
-            results.sort(key=lambda x: danger_level_order.get(x["danger_level"], 3))
+            danger_level_order = {"Critical": 0, "High": 1, "Medium": 2, "Low": 3}
+            results.sort(key=lambda x: danger_level_order.get(x["danger_level"], 4))
 
             # Final progress update - complete
             self.progressSignal.emit(100, "Analysis complete")
@@ -441,6 +1321,8 @@ class BackendClass_log(QObject):
                 "stats": anomaly_stats,
                 "results": results
             }
+            # Kept for export_analysis_result
+            response["result_id"] = self.result_store.put("anomaly", folder_path, response)
 
             # Final output
             # print("\n📊 Final Analysis Response:")
@@ -691,11 +1573,21 @@ class BackendClass_log(QObject):
             model_path = os.path.join(model_dir, 'log_analysis_model.joblib')
             joblib.dump(self.model, model_path)
             print(f"Model saved successfully to {model_path}")
+            self.model_cache.store(self.model)
         except Exception as e:
             print(f"⚠️ Could not save model: {e}")
 
     @Slot(str, str, result=str)
     def perform_deep_analysis(self, folder_path, file_names):
+        """
+        Start deep analysis in the background
+        
+        Returns a job id straight away; the result arrives through
+        analysisResultSignal with job type 'deep_analysis'.
+        """
+        return self.start_job("deep_analysis", self.run_deep_analysis, folder_path, file_names)
+
+    def run_deep_analysis(self, folder_path, file_names):
         """
         Perform deep analysis using Random Forest on log files
         
@@ -729,19 +1621,17 @@ class BackendClass_log(QObject):
             # Load the trained model if it exists, otherwise create a new one
             self.progressSignal.emit(10, "Loading analysis model...")
             
-            model_path = os.path.abspath('./models/log_analysis_model.joblib')
+            model_path = self.model_path
             print(f"🔍 Looking for model at: {model_path}")
-            if os.path.exists(model_path):
-                try:
-                    print("📊 Loading existing model from disk...")
-                    self.model = joblib.load(model_path)
-                    print("✅ Loaded existing model from disk")
-                except Exception as e:
-                    print(f"⚠️ Could not load model, training new one: {e}")
-                    self.progressSignal.emit(15, "Training new model...")
-                    self.train_initial_model()
-            else:
-                print("🔄 Model file not found, training new model")
+            try:
+                # Cached between analyses, only read from disk when the file changed
+                self.model = self.model_cache.get()
+            except Exception as e:
+                print(f"⚠️ Could not load model, training new one: {e}")
+                self.model = None
+            
+            if self.model is None:
+                print("🔄 No usable model, training new model")
                 self.progressSignal.emit(15, "Training new model...")
                 self.train_initial_model()
             
@@ -751,137 +1641,72 @@ class BackendClass_log(QObject):
             total_files = len(files)
             analysis_results = []
             
-            # Process files with progress updates
-            for idx, filename in enumerate(files):
+            file_paths = {}
+            for filename in files:
                 file_path = os.path.join(folder_path, filename)
-                # Signal progress - allocate 20% to 90% of progress for file processing
-                progress = 20 + int((idx / total_files) * 70)
-                progress_msg = f"Analyzing file {idx+1} of {total_files}: {filename}"
-                print(f"📊 Progress: {progress}% - {progress_msg}")
-                self.progressSignal.emit(progress, progress_msg)
-                
-                if not os.path.exists(file_path) or not os.path.isfile(file_path):
+                if not log_file_exists(file_path):
                     print(f"⚠️ File does not exist or is not a file: {file_path}")
                     continue
+                file_paths[filename] = file_path
+
+            # Results are stored per model; one that isn't saved has no
+            # digest and isn't cached
+            model_version = self.model_cache.digest if self.model is self.model_cache.model else None
+            lookups = {filename: self.analysis_cache.lookup("deep_analysis", model_version, file_path)
+                       for filename, file_path in file_paths.items()}
+            pending = [filename for filename in file_paths if lookups[filename].result is None]
+            print(f"♻️ Reusing stored results for {len(file_paths) - len(pending)} of {len(file_paths)} files")
+
+            # Worker processes load the model from disk; if it could not be
+            # saved, everything runs on the model held here
+            pool_task = partial(deep_analysis_range, model_path) if os.path.exists(model_path) else None
+            file_parts = self.map_file_ranges(
+                [file_paths[filename] for filename in pending],
+                pool_task,
+                lambda file_path, start, end: analyze_line_range(
+                    self.model, file_path, os.path.basename(file_path), start, end),
+                20, 90, "Analyzing log files",
+                starts=[lookups[filename].tail_start for filename in pending]
+            )
+
+            for filename, parts in zip(pending, file_parts):
+                lookup = lookups[filename]
+                file_results = new_file_results(filename)
+                if lookup.base is not None:
+                    # Keep the old lines' results, the old last line is redone
+                    print(f"➕ {filename} grew, analyzing from line {lookup.kept_lines + 1}")
+                    file_results = lookup.base
+                    drop_lines_after(file_results, lookup.kept_lines, lookup.old_tail)
                 
-                print(f"📄 Reading file: {file_path}")
-                # Read the file content
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    content = f.read()
-                    lines = content.split('\n')
-                    
-                    print(f"📋 File {filename} has {len(lines)} lines")
-                    
-                    # For very large files, provide additional progress updates
-                    if len(lines) > 10000:
-                        self.progressSignal.emit(progress, f"Processing large file {filename} ({len(lines)} lines)")
-                    
-                    file_results = {
-                        "file_name": filename,
-                        "total_lines": len(lines),
-                        "risk_prediction": {
-                            "Critical": 0,
-                            "High": 0,
-                            "Medium": 0,
-                            "Low": 0,
-                            "Normal": 0
-                        },
-                        "line_analysis": []
-                    }
-                    
-                    # Process non-empty lines
-                    valid_lines = [line for line in lines if line.strip()]
-                    print(f"📋 Valid non-empty lines: {len(valid_lines)}")
-                    
-                    # Batch prediction for efficiency
-                    if valid_lines:
-                        print(f"🧠 Making predictions for {len(valid_lines)} lines in {filename}...")
-                        # Use the trained model to predict risk levels
-                        predicted_risks = self.model.predict(valid_lines)
-                        
-                        # Get prediction probabilities to assess confidence
-                        prediction_probs = self.model.predict_proba(valid_lines)
-                        
-                        print(f"🔍 Vectorizing lines for feature importance analysis...")
-                        # Get feature importance for each line
-                        # We need to vectorize the text first to get the features
-                        vectorized_lines = self.model.named_steps['vectorizer'].transform(valid_lines)
-                        feature_names = self.model.named_steps['vectorizer'].get_feature_names_out()
-                        
-                        # Loop through lines and predictions
-                        print(f"📝 Processing prediction results and extracting key features...")
-                        for line_idx, (line_number, line, risk_level, probs) in enumerate(
-                                zip(range(1, len(valid_lines) + 1), valid_lines, predicted_risks, prediction_probs)):
-                            
-                            # Update risk count in file results
-                            file_results["risk_prediction"][risk_level] += 1
-                            
-                            # Skip Normal logs unless they have unusual patterns
-                            if risk_level == "Normal" and max(probs) > 0.9:
-                                continue
-                            
-                            # Get feature importance for this specific line
-                            if risk_level != "Normal":
-                                # Get the sparse vector for this line
-                                line_vector = vectorized_lines[line_idx]
-                                
-                                # Get the non-zero feature indices and their values
-                                feature_indices = line_vector.indices
-                                feature_values = line_vector.data
-                                
-                                # Get the most important features (words) for this prediction
-                                important_features = []
-                                for idx, value in zip(feature_indices, feature_values):
-                                    if idx < len(feature_names):
-                                        feature = feature_names[idx]
-                                        # Find and highlight this feature in the line
-                                        if " " in feature:  # Bigram
-                                            parts = feature.split()
-                                            # Check if both parts are in the line
-                                            if all(part.lower() in line.lower() for part in parts):
-                                                important_features.append(feature)
-                                        elif feature.lower() in line.lower():
-                                            important_features.append(feature)
-                                
-                                # Sort by importance (approximated by frequency in training data)
-                                important_features = sorted(important_features)[:5]  # Limit to top 5
-                                risk_type = self.classify_risk_type(line, important_features)
-
-                                # Create highlighted log content
-                                highlighted_log = line
-                                for feature in important_features:
-                                    # Case-insensitive replacement with HTML highlighting
-                                    pattern = re.compile(re.escape(feature), re.IGNORECASE)
-                                    highlighted_log = pattern.sub(
-                                        lambda m: f"<span class='highlight'>{m.group(0)}</span>", 
-                                        highlighted_log
-                                    )
-                                
-                                # Add line analysis
-                                line_result = {
-                                    "line_number": line_number,
-                                    "risk_level": risk_level,
-                                    "risk_type": risk_type,  # Add this line
-                                    "confidence": float(max(probs)),  # Convert numpy float to Python float
-                                    "log_content": highlighted_log,
-                                    "raw_content": line,
-                                    "indicators": important_features
-                                }
-                                file_results["line_analysis"].append(line_result)
-                    
-                    # Calculate overall risk level for file
-                    risk_hierarchy = ["Critical", "High", "Medium", "Low", "Normal"]
-                    for risk in risk_hierarchy:
-                        if file_results["risk_prediction"][risk] > 0:
-                            file_results["overall_risk"] = risk
-                            break
-                    else:
-                        file_results["overall_risk"] = "Normal"
-                    
-                    print(f"📊 File {filename} analysis complete. Overall risk: {file_results.get('overall_risk', 'Unknown')}")
-                    print(f"📊 Risk breakdown: {file_results['risk_prediction']}")
-                    
-                    analysis_results.append(file_results)
+                # Merge the parts, shifting line numbers by the lines before each
+                for part in parts:
+                    for level, count in part["risk_prediction"].items():
+                        file_results["risk_prediction"][level] += count
+                    for line_result in part["line_analysis"]:
+                        line_result["line_number"] += file_results["total_lines"]
+                        file_results["line_analysis"].append(line_result)
+                    file_results["total_lines"] += part["total_lines"]
+                lookup.result = file_results
+                self.analysis_cache.store(lookup, file_results, file_results["total_lines"])
+
+            for filename in file_paths:
+                file_results = lookups[filename].result
+                file_results["file_name"] = filename
+                print(f"📋 File {filename} has {file_results['total_lines']} lines")
+                
+                # Calculate overall risk level for file
+                risk_hierarchy = ["Critical", "High", "Medium", "Low", "Normal"]
+                for risk in risk_hierarchy:
+                    if file_results["risk_prediction"][risk] > 0:
+                        file_results["overall_risk"] = risk
+                        break
+                else:
+                    file_results["overall_risk"] = "Normal"
+                
+                print(f"📊 File {filename} analysis complete. Overall risk: {file_results.get('overall_risk', 'Unknown')}")
+                print(f"📊 Risk breakdown: {file_results['risk_prediction']}")
+                
+                analysis_results.append(file_results)
             
             # Sort analysis results by overall risk level
             self.progressSignal.emit(90, "Finalizing analysis...")
@@ -931,6 +1756,8 @@ class BackendClass_log(QObject):
                 },
                 "file_results": analysis_results
             }
+            # Kept for export_analysis_result
+            response["result_id"] = self.result_store.put("deep_analysis", folder_path, response)
             return json.dumps(response)
             
         except Exception as e:
@@ -951,128 +1778,108 @@ class BackendClass_log(QObject):
         Returns:
             String representing the risk type
         """
-        risk_type_patterns = {
-            "Authentication & Security": r'authentication failed|unauthorized|access denied|invalid credentials|brute force|login attempt|intrusion detected|malware|root access|privilege escalation|SSH failure|port scan|firewall block|DDoS|SQL injection|XSS detected|CVE-',
-            "Network & Connectivity": r'network unreachable|connection refused|host down|packet loss|latency|DNS failure|IP conflict|ARP spoofing|proxy error|SSL handshake failure|TLS error|certificate expired',
-            "System Resources": r'CPU high|memory leak|disk I/O error|swap full|temp high|fan failure|power failure|battery low|process killed|service restart|unexpected shutdown|hardware failure',
-            "Unusual TCP Activity": r'(?:SYN-?){3,}|(?:FIN|RST).*(?:(?!SYN|ACK).)+$|FLAGS:\s*$|FLAGS:\s*SYN.*DST:\s*255\.255\.255\.255',
-            "Broadcast & Multicast": r'DST:\s*(?:\d+\.){3}255|DST:\s*255\.255\.255\.255|DST:\s*224\.0\.0\.251:5353|_tcp\.local\.|_udp\.local\.',
-            "DNS Anomalies": r'(?:QUERY|RESPONSE).*(?:\.local\.|\.local$)|DNS\s+Query.*(?:_tcp|_udp)\.|(?:QUERY|DNS).*[0-9a-f]{16,}|QUERY.*(?:\.){5,}',
-            "External Traffic": r'SRC:\s*(?!10\.|192\.168\.|172\.(?:1[6-9]|2[0-9]|3[01])\.)(?:\d+\.){3}\d+.*DST:\s*(?:10\.|192\.168\.|172\.(?:1[6-9]|2[0-9]|3[01])\.)(?:\d+\.){3}\d+',
-            "System Errors": r'error|failed|failure|exception|crash|segfault|panic|abort|core dump|unreachable|timeout|corrupt|invalid|not found|permission denied|disk full|out of memory|OOM killer|assertion failed|segmentation fault',
-            "Warning Events": r'warning|critical|alert|degraded|slow response|retrying|high latency|threshold exceeded|deprecated|unavailable|locked|overload|unresponsive',
-            "Linux System": r'kernel panic|dmesg|syslog|journald|auditd|systemd failed|segfault|fsck error|mount failure|Xorg error|module failed|driver crash|SELinux denial|coredump',
-            "Database Issues": r'query timeout|deadlock|transaction aborted|disk quota exceeded|index corruption|read-only mode|backup failed|config error'
-        }
-        
-        # Check content against patterns
-        if content:
-            for risk_type, pattern in risk_type_patterns.items():
-                if re.search(pattern, content, re.IGNORECASE):
-                    return risk_type
-        
-        # Check indicators for matches if no match found in content
-        if indicators and len(indicators) > 0:
-            indicators_text = " ".join(indicators).lower()
-            for risk_type, pattern in risk_type_patterns.items():
-                # Extract key terms from pattern
-                key_terms = pattern.split('|')
-                for term in key_terms:
-                    # Clean up the term
-                    clean_term = re.sub(r'[\(\)\[\]\{\}\.\*\+\?\|\^\$\\]', '', term).strip()
-                    if clean_term and len(clean_term) > 3 and clean_term.lower() in indicators_text:
-                        return risk_type
-        
-        # Default if no specific type is identified
-        return "Unclassified"
+        return classify_risk_type(content, indicators)
     
+    def get_downloads_dir(self):
+        """Get the folder exports are written to, creating a fallback if needed"""
+        downloads_dir = os.path.expanduser("~/Downloads")
+        if not os.path.exists(downloads_dir):
+            downloads_dir = os.path.abspath("./downloads")
+            os.makedirs(downloads_dir, exist_ok=True)
+        return downloads_dir
+
+    def export_result(self, analysis_type, result, export_format="csv"):
+        """
+        Stream an analysis result into a file in the downloads folder
+        
+        Args:
+            analysis_type: Either 'anomaly' or 'deep_analysis'
+            result: The analysis result
+            export_format: Key of log_results.EXPORT_FORMATS
+        
+        Returns:
+            JSON in the format of export_analysis_to_csv
+        """
+        if analysis_type not in EXPORT_TABLES:
+            return json.dumps({
+                "success": False,
+                "message": f"Unknown analysis type: {analysis_type}"
+            })
+        try:
+            check_export_format(export_format)
+        except ValueError as e:
+            return json.dumps({"success": False, "message": str(e)})
+        
+        _, _, rows = EXPORT_TABLES[analysis_type]
+        rows = rows(result)
+        # Check for data before creating the file
+        first_row = next(rows, None)
+        if first_row is None:
+            return json.dumps({
+                "success": False,
+                "message": "No anomaly data to export" if analysis_type == "anomaly" else "No analysis data to export"
+            })
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        prefix = "anomaly_analysis" if analysis_type == "anomaly" else "deep_analysis"
+        filename = f"{prefix}_{timestamp}{EXPORT_FORMATS[export_format]}"
+        filepath = os.path.join(self.get_downloads_dir(), filename)
+        row_count = write_export(filepath, analysis_type, export_format, itertools.chain([first_row], rows))
+        print(f"📤 Exported {row_count} rows to {filepath}")
+        
+        return json.dumps({
+            "success": True,
+            "message": f"Data exported successfully to {filename}",
+            "path": filepath,
+            "filename": filename,
+            "rows": row_count
+        })
+
+    @Slot(str, str, result=str)
+    def export_analysis_result(self, result_id, export_format):
+        """
+        Export a result kept by the backend to a file
+        
+        Args:
+            result_id: result_id of a detect_anomalies or
+                perform_deep_analysis result
+            export_format: 'csv', 'parquet', 'arrow' (both need the pyarrow
+                package) or 'ndjson' (gzip-compressed)
+        
+        Returns:
+            JSON in the format of export_analysis_to_csv; 'expired' is set
+            when the result is no longer kept
+        """
+        try:
+            try:
+                entry = self.result_store.get(result_id)
+            except KeyError:
+                return json.dumps({
+                    "success": False,
+                    "expired": True,
+                    "message": "The analysis result is no longer available, run the analysis again"
+                })
+            return self.export_result(entry["type"], entry["result"], export_format or "csv")
+        except Exception as e:
+            error_msg = f"Error exporting data: {str(e)}"
+            print(f"❌ {error_msg}")
+            return json.dumps({"success": False, "message": error_msg})
+
     @Slot(str, str, str, result=str)
     def export_analysis_to_csv(self, analysis_type, folder_path, data):
         """
         Export analysis results to CSV file
         
+        Prefer export_analysis_result, which doesn't need the results sent
+        back from the frontend.
+        
         Args:
             analysis_type: Either 'anomaly' or 'deep_analysis'
             folder_path: Original folder path for reference
             data: JSON string of analysis data to export
         """
         try:
-            # Create downloads directory if it doesn't exist
-            downloads_dir = os.path.expanduser("~/Downloads")
-            if not os.path.exists(downloads_dir):
-                downloads_dir = os.path.abspath("./downloads")
-                os.makedirs(downloads_dir, exist_ok=True)
-            
-            # Parse the analysis data
-            analysis_data = json.loads(data)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            if analysis_type == "anomaly":
-                # Prepare CSV file for anomaly detection results
-                filename = f"anomaly_analysis_{timestamp}.csv"
-                filepath = os.path.join(downloads_dir, filename)
-                
-                # Create DataFrame for anomalies
-                rows = []
-                for item in analysis_data.get("results", []):
-                    rows.append({
-                        "Anomaly Type": item.get("anomaly_name", "Unknown"),
-                        "Danger Level": item.get("danger_level", "Unknown"),
-                        "File Name": item.get("file_name", "Unknown"),
-                        "Line Number": item.get("line_number", 0),
-                        "Log Content": item.get("raw_content", "")
-                    })
-                
-                if rows:
-                    df = pd.DataFrame(rows)
-                    df.to_csv(filepath, index=False)
-                else:
-                    return json.dumps({
-                        "success": False,
-                        "message": "No anomaly data to export"
-                    })
-            
-            elif analysis_type == "deep_analysis":
-                # Prepare CSV file for deep analysis results
-                filename = f"deep_analysis_{timestamp}.csv"
-                filepath = os.path.join(downloads_dir, filename)
-                
-                # Create DataFrame for deep analysis
-                rows = []
-                for file_result in analysis_data.get("file_results", []):
-                    file_name = file_result.get("file_name", "Unknown")
-                    overall_risk = file_result.get("overall_risk", "Unknown")
-                    
-                    for line_analysis in file_result.get("line_analysis", []):
-                        rows.append({
-                            "File Name": file_name,
-                            "Overall File Risk": overall_risk,
-                            "Line Number": line_analysis.get("line_number", 0),
-                            "Risk Level": line_analysis.get("risk_level", "Unknown"),
-                            "Indicators": ", ".join(line_analysis.get("indicators", [])),
-                            "Log Content": line_analysis.get("raw_content", "")
-                        })
-                
-                if rows:
-                    df = pd.DataFrame(rows)
-                    df.to_csv(filepath, index=False)
-                else:
-                    return json.dumps({
-                        "success": False,
-                        "message": "No analysis data to export"
-                    })
-            else:
-                return json.dumps({
-                    "success": False,
-                    "message": f"Unknown analysis type: {analysis_type}"
-                })
-            
-            return json.dumps({
-                "success": True,
-                "message": f"Data exported successfully to {filename}",
-                "path": filepath,
-                "filename": filename
-            })
+            return self.export_result(analysis_type, json.loads(data))
             
         except Exception as e:
             error_msg = f"Error exporting data: {str(e)}"
@@ -0,0 +1,237 @@
+import os
+import hashlib
+import pickle
+import threading
+from assets.py.log_io import NEWLINE_BYTES, last_line_start
+from assets.py.log_storage import is_plain_log, log_file_stat, open_log_binary, split_member_path
+
+# Bump when the layout of cached results changes so old ones are ignored
+RESULT_CACHE_VERSION = 1
+
+# Cached results beyond this total size are removed, least recently used first
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def content_digest(file_path, prefix_size=None):
+    """
+    Hash the (uncompressed) contents of a log file
+
+    Args:
+        file_path: Path of the log file
+        prefix_size: Also hash the first prefix_size bytes on the way
+
+    Returns:
+        (digest, prefix_digest) as hex strings; prefix_digest is None when
+        prefix_size isn't given or the file is shorter
+    """
+    digest = hashlib.sha256()
+    prefix_digest = None
+    position = 0
+    with open_log_binary(file_path) as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                break
+            if prefix_size is not None and position <= prefix_size <= position + len(block):
+                head = digest.copy()
+                head.update(block[:prefix_size - position])
+                prefix_digest = head.hexdigest()
+            digest.update(block)
+            position += len(block)
+    return digest.hexdigest(), prefix_digest
+
+
+class CacheLookup:
+    """
+    What the cache knows about one file for one analysis
+
+    Attributes:
+        result: The stored result for the file's current contents, or None
+        base: For a file that only grew since it was last analysed, the
+            result for its old contents, otherwise None
+        tail_start: Byte offset to analyse from; 0 unless base is set
+        kept_lines: Number of lines of base that are still valid; results
+            for later lines must be dropped before adding the new ones
+        old_tail: The dropped lines of the old contents, which are analysed
+            again as part of the tail
+    """
+
+    def __init__(self, kind, version, file_path, stat, digest):
+        self.kind = kind
+        self.version = version
+        self.file_path = file_path
+        self.stat = stat
+        self.digest = digest
+        self.result = None
+        self.base = None
+        self.tail_start = 0
+        self.kept_lines = 0
+        self.old_tail = []
+
+
+class AnalysisCache:
+    """
+    Analysis results stored per file contents, pattern set and model
+
+    Results are keyed by the SHA-256 of a file's contents, so a file that
+    is analysed again unchanged, or a copy of it under another name, gets
+    its stored result back. Files are only hashed when their size or
+    modification time changed since that analysis. A plain file whose
+    old contents are a prefix of its new ones (a log that was appended to)
+    is only analysed from its old last line on, which may have grown.
+    """
+
+    def __init__(self, cache_folder):
+        self.cache_folder = cache_folder
+        self.files_path = os.path.join(cache_folder, 'files.pickle')
+        self.lock = threading.Lock()
+        self.files = self.load_files()
+
+    def load_files(self):
+        try:
+            with open(self.files_path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get("version") == RESULT_CACHE_VERSION:
+                return data["files"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Could not load result cache {self.files_path}, starting over: {e}")
+        return {}
+
+    def save_files(self):
+        os.makedirs(self.cache_folder, exist_ok=True)
+        temp_path = self.files_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump({"version": RESULT_CACHE_VERSION, "files": self.files}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.files_path)
+
+    def result_path(self, kind, version, digest):
+        version_key = hashlib.sha256(f"{RESULT_CACHE_VERSION}:{version}".encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_folder, f"{kind}-{version_key}-{digest}.pickle")
+
+    def load_result(self, kind, version, digest):
+        result_path = self.result_path(kind, version, digest)
+        try:
+            with open(result_path, 'rb') as f:
+                result = pickle.load(f)
+            # Mark as recently used
+            os.utime(result_path)
+            return result
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Could not load cached result {result_path}: {e}")
+            return None
+
+    def lookup(self, kind, version, file_path):
+        """
+        Find the stored result of an analysis of a file
+
+        Args:
+            kind: Name of the analysis, e.g. 'anomaly'
+            version: Identifies everything besides the file that the result
+                depends on (pattern set, model); None disables caching
+            file_path: Path of the log file
+
+        Returns:
+            CacheLookup, to be passed to store() with the new result
+        """
+        file_path = os.path.abspath(file_path)
+        stat = log_file_stat(file_path)
+        with self.lock:
+            known = self.files.get((kind, file_path))
+
+        grew = False
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            digest = known["digest"]
+        else:
+            # Check whether the file kept its old contents and only grew
+            prefix_size = None
+            if known and known["tail_start"] is not None and stat.st_size > known["size"] and is_plain_log(file_path):
+                prefix_size = known["size"]
+            digest, prefix_digest = content_digest(file_path, prefix_size)
+            grew = prefix_digest is not None and prefix_digest == known["digest"]
+
+        lookup = CacheLookup(kind, version, file_path, stat, digest)
+        if version is None:
+            return lookup
+
+        lookup.result = self.load_result(kind, version, digest)
+        if lookup.result is None and grew:
+            lookup.base = self.load_result(kind, version, known["digest"])
+            if lookup.base is not None:
+                lookup.tail_start = known["tail_start"]
+                with open_log_binary(file_path) as f:
+                    f.seek(lookup.tail_start)
+                    data = f.read(known["size"] - lookup.tail_start)
+                lookup.old_tail = [line.decode('utf-8', errors='replace') for line in NEWLINE_BYTES.split(data)]
+                lookup.kept_lines = known["line_count"] - len(lookup.old_tail)
+        return lookup
+
+    def store(self, lookup, result, line_count):
+        """
+        Store the result of analysing the file of a lookup
+
+        Nothing is stored if the file changed since the lookup, as the
+        result may then not match the hashed contents.
+
+        Args:
+            lookup: CacheLookup from lookup()
+            result: Picklable result for the whole file
+            line_count: Number of lines in the file
+        """
+        if lookup.version is None:
+            return
+        try:
+            stat = log_file_stat(lookup.file_path)
+            if (stat.st_size, stat.st_mtime_ns) != (lookup.stat.st_size, lookup.stat.st_mtime_ns):
+                print(f"⚠️ {lookup.file_path} changed during analysis, not caching its result")
+                return
+
+            os.makedirs(self.cache_folder, exist_ok=True)
+            result_path = self.result_path(lookup.kind, lookup.version, lookup.digest)
+            temp_path = result_path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, result_path)
+
+            with self.lock:
+                self.files[(lookup.kind, lookup.file_path)] = {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "digest": lookup.digest,
+                    "line_count": line_count,
+                    # Only plain files are analysed incrementally
+                    "tail_start": last_line_start(lookup.file_path, stat.st_size) if is_plain_log(lookup.file_path) else None
+                }
+                # Forget files that are gone while saving anyway
+                for key in [key for key in self.files if not os.path.exists(split_member_path(key[1])[0])]:
+                    del self.files[key]
+                self.save_files()
+            self.remove_old_results()
+        except OSError as e:
+            print(f"⚠️ Could not cache result for {lookup.file_path}: {e}")
+
+    def remove_old_results(self):
+        """Delete the least recently used results beyond RESULT_CACHE_MAX_BYTES"""
+        entries = []
+        for name in os.listdir(self.cache_folder):
+            if name == os.path.basename(self.files_path) or not name.endswith('.pickle'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_folder, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= RESULT_CACHE_MAX_BYTES:
+                break
+            print(f"🧹 Removing cached result {name}")
+            try:
+                os.remove(os.path.join(self.cache_folder, name))
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,294 @@
+import os
+import json
+import threading
+from array import array
+from collections import OrderedDict
+import numpy as np
+from assets.py.log_io import iter_line_offsets
+from assets.py.log_records import parse_line
+from assets.py.log_storage import index_path_for, log_file_stat
+
+# Bump when the layout of the sidecar files changes so they are rebuilt
+COLUMNS_VERSION = 2
+
+# Loaded columns kept in memory, least recently used dropped first
+CACHED_COLUMNS = 16
+
+# Timestamp of lines without one
+MISSING_TIMESTAMP = np.iinfo(np.int64).min
+
+# LogRecord formats by code; lines without a record have code -1
+RECORD_FORMATS = ("text", "network", "windows_event", "syslog")
+
+# LogRecord.fields kept as columns for the search's field filters; their
+# values are coded as text, which is how the filters compare them
+RECORD_FIELDS = ("event_id", "protocol", "src_ip", "dst_ip", "src_port", "dst_port")
+
+_cached_columns = OrderedDict()
+_cached_columns_lock = threading.Lock()
+
+
+def columns_path_for(folder_path, file_name):
+    """Get where the record columns of a log file are stored"""
+    # Beside the folder's search index, so they never show up as logs
+    return os.path.join(index_path_for(folder_path, '.columns'), file_name + '.npz')
+
+
+def to_microseconds(timestamp):
+    """Convert seconds since the epoch to the int64 microseconds the columns store"""
+    return int(round(timestamp * 1_000_000))
+
+
+class RecordColumns:
+    """
+    The LogRecords of a log file as NumPy columns, one row per line
+
+    Attributes:
+        timestamps: int64 microseconds since the epoch, MISSING_TIMESTAMP
+            for lines without one
+        formats: int8 codes into RECORD_FORMATS, -1 for lines without a record
+        levels: int16 codes into level_names, -1 for lines without a level
+        level_names: List of the file's levels
+        sources: int32 codes into source_names, -1 for lines without a source
+        source_names: List of the file's sources
+        line_offsets: int64 byte offset of each line in the (uncompressed)
+            file, where its message can be read back from
+        fields: Dict of RECORD_FIELDS to int32 codes into field_names, -1
+            for lines without the field
+        field_names: Dict of RECORD_FIELDS to lists of the file's values
+    """
+
+    def __init__(self, timestamps, formats, levels, level_names, sources, source_names, line_offsets,
+                 fields, field_names):
+        self.timestamps = timestamps
+        self.formats = formats
+        self.levels = levels
+        self.level_names = level_names
+        self.sources = sources
+        self.source_names = source_names
+        self.line_offsets = line_offsets
+        self.fields = fields
+        self.field_names = field_names
+
+    @classmethod
+    def build(cls, file_path):
+        """Parse a log file into columns"""
+        timestamps = array('q')
+        formats = array('b')
+        levels = array('h')
+        sources = array('i')
+        line_offsets = array('q')
+        fields = {field: array('i') for field in RECORD_FIELDS}
+        format_codes = {name: code for code, name in enumerate(RECORD_FORMATS)}
+        level_codes = {}
+        source_codes = {}
+        field_codes = {field: {} for field in RECORD_FIELDS}
+
+        for _, offset, line in iter_line_offsets(file_path):
+            line_offsets.append(offset)
+            record = parse_line(line)
+            if record is None:
+                timestamps.append(MISSING_TIMESTAMP)
+                formats.append(-1)
+                levels.append(-1)
+                sources.append(-1)
+                for field in RECORD_FIELDS:
+                    fields[field].append(-1)
+                continue
+            timestamps.append(MISSING_TIMESTAMP if record.timestamp is None else to_microseconds(record.timestamp))
+            formats.append(format_codes[record.format])
+            levels.append(-1 if record.level is None else level_codes.setdefault(record.level, len(level_codes)))
+            sources.append(-1 if record.source is None else source_codes.setdefault(record.source, len(source_codes)))
+            values = record.fields or {}
+            for field in RECORD_FIELDS:
+                value = values.get(field)
+                codes = field_codes[field]
+                fields[field].append(-1 if value is None else codes.setdefault(str(value), len(codes)))
+
+        return cls(np.frombuffer(timestamps, dtype=np.int64), np.frombuffer(formats, dtype=np.int8),
+                   np.frombuffer(levels, dtype=np.int16), list(level_codes),
+                   np.frombuffer(sources, dtype=np.int32), list(source_codes),
+                   np.frombuffer(line_offsets, dtype=np.int64),
+                   {field: np.frombuffer(codes, dtype=np.int32) for field, codes in fields.items()},
+                   {field: list(codes) for field, codes in field_codes.items()})
+
+    def save(self, columns_path, stat):
+        """Write the columns to a sidecar file, tagged with the log file's stat"""
+        os.makedirs(os.path.dirname(columns_path), exist_ok=True)
+        meta = {"version": COLUMNS_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        temp_path = columns_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), timestamps=self.timestamps, formats=self.formats,
+                     levels=self.levels, level_names=np.array(self.level_names, dtype=str),
+                     sources=self.sources, source_names=np.array(self.source_names, dtype=str),
+                     line_offsets=self.line_offsets,
+                     **{f"field_{field}": self.fields[field] for field in RECORD_FIELDS},
+                     **{f"field_{field}_names": np.array(self.field_names[field], dtype=str) for field in RECORD_FIELDS})
+        os.replace(temp_path, columns_path)
+
+    @classmethod
+    def load(cls, columns_path, stat):
+        """
+        Read columns from a sidecar file
+
+        Returns:
+            RecordColumns, or None if the file is missing, unreadable or was
+            written for another version of the log file
+        """
+        try:
+            with np.load(columns_path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta != {"version": COLUMNS_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}:
+                    return None
+                return cls(data["timestamps"], data["formats"], data["levels"], data["level_names"].tolist(),
+                           data["sources"], data["source_names"].tolist(), data["line_offsets"],
+                           {field: data[f"field_{field}"] for field in RECORD_FIELDS},
+                           {field: data[f"field_{field}_names"].tolist() for field in RECORD_FIELDS})
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Could not load record columns {columns_path}, rebuilding: {e}")
+            return None
+
+    def time_mask(self, start=None, end=None):
+        """
+        Select the lines with a timestamp in [start, end)
+
+        Args:
+            start: Seconds since the epoch, None for no lower bound
+            end: Seconds since the epoch, None for no upper bound
+
+        Returns:
+            Boolean array over the lines; with neither bound, every line
+            with a timestamp
+        """
+        mask = self.timestamps != MISSING_TIMESTAMP
+        if start is not None:
+            mask &= self.timestamps >= to_microseconds(start)
+        if end is not None:
+            mask &= self.timestamps < to_microseconds(end)
+        return mask
+
+    def level_counts(self, mask=None):
+        """Count the lines of each level, optionally only those in a mask"""
+        levels = self.levels if mask is None else self.levels[mask]
+        counts = np.bincount(levels[levels >= 0], minlength=len(self.level_names))
+        return {name: int(count) for name, count in zip(self.level_names, counts) if count}
+
+    def source_counts(self, mask=None):
+        """Count the lines of each source, optionally only those in a mask"""
+        sources = self.sources if mask is None else self.sources[mask]
+        counts = np.bincount(sources[sources >= 0], minlength=len(self.source_names))
+        return {name: int(count) for name, count in zip(self.source_names, counts) if count}
+
+    def time_bounds(self, mask=None):
+        """
+        Get the first and last timestamp, optionally of the lines in a mask
+
+        Returns:
+            (first, last) in seconds since the epoch, or None without any
+        """
+        timestamps = self.timestamps[self.time_mask() if mask is None else mask & self.time_mask()]
+        if not len(timestamps):
+            return None
+        return int(timestamps.min()) / 1_000_000, int(timestamps.max()) / 1_000_000
+
+    def field_mask(self, fields):
+        """
+        Select the lines that pass LogQuery field filters
+
+        Gives the same answer as checking each line's LogRecord with
+        record_matches_field, without parsing the lines again.
+
+        Args:
+            fields: List of (field, lower-cased value), as in LogQuery.fields
+
+        Returns:
+            Boolean array over the lines
+        """
+        mask = self.formats >= 0
+        for field, value in fields:
+            if field == "level":
+                mask &= self.levels == (self.level_names.index(value) if value in self.level_names else -2)
+            elif field == "source":
+                mask &= self._code_mask(self.sources, self.source_names, lambda name: value in name.lower())
+            elif field == "event_id":
+                mask &= self._field_mask("event_id", lambda name: name == value)
+            elif field == "protocol":
+                # Lines without a protocol compare as empty text
+                mask &= self._field_mask("protocol", lambda name: name.lower() == value, missing=value == "")
+            elif field in ("ip", "port"):
+                mask &= (self._field_mask(f"src_{field}", lambda name: name == value)
+                         | self._field_mask(f"dst_{field}", lambda name: name == value))
+            else:
+                mask[:] = False
+        return mask
+
+    def _field_mask(self, field, test, missing=False):
+        return self._code_mask(self.fields[field], self.field_names[field], test, missing)
+
+    @staticmethod
+    def _code_mask(codes, names, test, missing=False):
+        """Select the lines whose coded value passes test, and those without one if missing"""
+        selected = [code for code, name in enumerate(names) if test(name)]
+        if missing:
+            selected.append(-1)
+        return np.isin(codes, selected)
+
+    def line_numbers(self, mask):
+        """Get the 1-based numbers of the lines in a mask"""
+        return np.flatnonzero(mask) + 1
+
+
+def load_record_columns(folder_path, file_name):
+    """
+    Get the record columns of a log file if they don't have to be parsed
+
+    Returns:
+        RecordColumns from memory or the file's sidecar, or None when the
+        file is new or changed since and get_record_columns has to build them
+    """
+    file_path = os.path.join(os.path.abspath(folder_path), file_name)
+    stat = log_file_stat(file_path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _cached_columns_lock:
+        cached = _cached_columns.get(file_path)
+        if cached and cached[0] == key:
+            _cached_columns.move_to_end(file_path)
+            return cached[1]
+
+    columns = RecordColumns.load(columns_path_for(folder_path, file_name), stat)
+    if columns is not None:
+        _cache_columns(file_path, key, columns)
+    return columns
+
+
+def get_record_columns(folder_path, file_name):
+    """
+    Get the record columns of a log file
+
+    They're read from the file's sidecar, or parsed and saved there when the
+    file is new or changed since.
+    """
+    columns = load_record_columns(folder_path, file_name)
+    if columns is not None:
+        return columns
+
+    file_path = os.path.join(os.path.abspath(folder_path), file_name)
+    stat = log_file_stat(file_path)
+    print(f"🧮 Building record columns for {file_path}")
+    columns = RecordColumns.build(file_path)
+    try:
+        columns.save(columns_path_for(folder_path, file_name), stat)
+    except OSError as e:
+        print(f"⚠️ Could not save record columns for {file_path}: {e}")
+    _cache_columns(file_path, (stat.st_size, stat.st_mtime_ns), columns)
+    return columns
+
+
+def _cache_columns(file_path, key, columns):
+    with _cached_columns_lock:
+        _cached_columns[file_path] = (key, columns)
+        _cached_columns.move_to_end(file_path)
+        while len(_cached_columns) > CACHED_COLUMNS:
+            _cached_columns.popitem(last=False)
@@ -0,0 +1,531 @@
+import os
+import re
+import bisect
+import pickle
+import threading
+from array import array
+from assets.py.log_io import iter_log_lines, iter_line_offsets, read_lines_at, scan_line_checkpoints, read_line_window
+from assets.py.log_patterns import required_literals
+from assets.py.log_query import LogQuery
+from assets.py.log_columns import get_record_columns
+from assets.py.log_storage import index_path_for, list_log_files, log_file_exists, log_file_stat
+
+# Bump when the on-disk layout changes so old indexes are rebuilt
+INDEX_VERSION = 2
+
+# Words as the index sees them, taken from the lower-cased line
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Lines per trigram block; trigram postings point at blocks, not lines
+TRIGRAM_BLOCK_LINES = 64
+
+# Below this share of a file's blocks, trigram candidates are narrow enough
+# to skip scanning the token vocabulary for partial words
+TRIGRAM_SELECTIVE_RATIO = 0.1
+
+# Above this share of a file's lines as candidates, reading the file from
+# start to end is faster than seeking to each line
+SEQUENTIAL_SCAN_RATIO = 0.5
+
+# Bump when the on-disk layout of the line index changes
+LINE_INDEX_VERSION = 1
+
+# Lines between the offsets kept by the line index; reading a window starts
+# at the offset before it and skips fewer than this many lines
+LINE_CHECKPOINT_INTERVAL = 256
+
+_folder_indexes = {}
+_folder_indexes_lock = threading.Lock()
+_line_indexes = {}
+
+
+def get_folder_index(folder_path):
+    """Get the shared FolderIndex of a log folder, loading it on first use"""
+    folder_path = os.path.abspath(folder_path)
+    with _folder_indexes_lock:
+        index = _folder_indexes.get(folder_path)
+        if index is None:
+            index = _folder_indexes[folder_path] = FolderIndex(folder_path, index_path_for(folder_path))
+        return index
+
+
+def get_line_index(folder_path):
+    """Get the shared LineIndex of a log folder, loading it on first use"""
+    folder_path = os.path.abspath(folder_path)
+    with _folder_indexes_lock:
+        index = _line_indexes.get(folder_path)
+        if index is None:
+            index = _line_indexes[folder_path] = LineIndex(folder_path, index_path_for(folder_path, '.lines.pickle'))
+        return index
+
+
+def update_folder_index(folder_path):
+    """Bring the search index of a folder up to date, logging failures"""
+    try:
+        get_folder_index(folder_path).refresh()
+    except Exception as e:
+        print(f"⚠️ Could not update search index for {folder_path}: {e}")
+
+
+def trigrams(text):
+    """Get the set of 3-character substrings of a string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def query_constraints(query):
+    """
+    Work out which indexed tokens a line must contain to contain a query
+
+    Every word of the lower-cased query bordered by non-word characters on
+    both sides must be a whole token of a matching line. A word at the start
+    of the query can be the end of a longer token, one at the end can be the
+    start of one, and a query that is a single word can be inside any token.
+
+    Args:
+        query: Lower-cased search text
+
+    Returns:
+        List of (kind, word) with kind 'exact', 'suffix', 'prefix' or
+        'infix', most selective first; empty if the query has no words
+    """
+    constraints = []
+    for match in TOKEN_PATTERN.finditer(query):
+        at_start = match.start() == 0
+        at_end = match.end() == len(query)
+        if at_start and at_end:
+            kind = 'infix'
+        elif at_start:
+            kind = 'suffix'
+        elif at_end:
+            kind = 'prefix'
+        else:
+            kind = 'exact'
+        constraints.append((kind, match.group()))
+
+    order = {'exact': 0, 'prefix': 1, 'suffix': 1, 'infix': 2}
+    constraints.sort(key=lambda constraint: (order[constraint[0]], -len(constraint[1])))
+    return constraints
+
+
+class FolderIndex:
+    """
+    Persistent inverted index of the log files in one upload folder
+
+    For every file it keeps the byte offset of each line and, for every
+    token, the numbers of the lines containing it. Files are re-indexed when
+    their size or modification time changes, so the index stays current
+    without rescanning unchanged files. A search only reads the lines whose
+    tokens can contain the query, seeking straight to them.
+    """
+
+    def __init__(self, folder_path, index_path):
+        self.folder_path = folder_path
+        self.index_path = index_path
+        self.lock = threading.RLock()
+        self.files = self.load()
+
+    def load(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get("version") == INDEX_VERSION:
+                return data["files"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Could not load search index {self.index_path}, rebuilding: {e}")
+        return {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump({"version": INDEX_VERSION, "files": self.files}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.index_path)
+
+    @staticmethod
+    def build_file_index(file_path, stat):
+        """Index one file: line offsets plus token postings"""
+        line_starts = array('Q')
+        postings = {}
+        trigram_blocks = {}
+        non_ascii_blocks = set()
+        block = []
+
+        def add_block():
+            block_number = (len(line_starts) - 1) // TRIGRAM_BLOCK_LINES
+            for trigram in trigrams("\n".join(block)):
+                blocks = trigram_blocks.get(trigram)
+                if blocks is None:
+                    blocks = trigram_blocks[trigram] = array('I')
+                blocks.append(block_number)
+            block.clear()
+
+        for line_number, offset, line in iter_line_offsets(file_path):
+            line_starts.append(offset)
+            lowered = line.lower()
+            for token in set(TOKEN_PATTERN.findall(lowered)):
+                lines = postings.get(token)
+                if lines is None:
+                    lines = postings[token] = array('I')
+                lines.append(line_number)
+
+            # Regex IGNORECASE matching can map non-ASCII characters onto
+            # ASCII literals, which lower-cased trigrams don't capture
+            if not line.isascii():
+                non_ascii_blocks.add((line_number - 1) // TRIGRAM_BLOCK_LINES)
+            block.append(lowered)
+            if len(block) == TRIGRAM_BLOCK_LINES:
+                add_block()
+        if block:
+            add_block()
+
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "line_starts": line_starts,
+            "postings": postings,
+            "trigram_blocks": trigram_blocks,
+            "non_ascii_blocks": non_ascii_blocks
+        }
+
+    def refresh(self):
+        """
+        Index new and changed files and forget deleted ones
+
+        Returns:
+            True if the index changed
+        """
+        with self.lock:
+            changed = False
+            current = set()
+            if os.path.isdir(self.folder_path):
+                for file_name in list_log_files(self.folder_path):
+                    file_path = os.path.join(self.folder_path, file_name)
+                    current.add(file_name)
+
+                    stat = log_file_stat(file_path)
+                    entry = self.files.get(file_name)
+                    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                        continue
+                    try:
+                        print(f"🗂️ Indexing {file_path}")
+                        self.files[file_name] = self.build_file_index(file_path, stat)
+                    except OSError as e:
+                        print(f"⚠️ Could not index {file_path}: {e}")
+                        self.files.pop(file_name, None)
+                    changed = True
+
+            for file_name in set(self.files) - current:
+                del self.files[file_name]
+                changed = True
+
+            if changed:
+                try:
+                    self.save()
+                except OSError as e:
+                    # Still usable in memory, it is just rebuilt next session
+                    print(f"⚠️ Could not save search index {self.index_path}: {e}")
+            return changed
+
+    def is_current(self, file_name):
+        """Check whether a file is indexed as it is on disk now"""
+        try:
+            stat = log_file_stat(os.path.join(self.folder_path, file_name))
+        except OSError:
+            return False
+        # No lock: this must not wait for a refresh that is indexing other
+        # files, and entries are only ever replaced whole
+        entry = self.files.get(file_name)
+        return entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    @staticmethod
+    def trigram_candidate_blocks(entry, grams):
+        """Get the blocks containing every one of the trigrams"""
+        trigram_blocks = entry["trigram_blocks"]
+        postings = sorted((trigram_blocks.get(gram, ()) for gram in grams), key=len)
+        if not postings:
+            return set()
+        # Intersect starting from the rarest trigram
+        blocks = set(postings[0])
+        for other in postings[1:]:
+            if not blocks:
+                break
+            blocks.intersection_update(other)
+        return blocks
+
+    @staticmethod
+    def block_lines(entry, blocks):
+        """Get the sorted line numbers in a set of trigram blocks"""
+        line_count = len(entry["line_starts"])
+        lines = []
+        for block_number in sorted(blocks):
+            first = block_number * TRIGRAM_BLOCK_LINES + 1
+            lines.extend(range(first, min(first + TRIGRAM_BLOCK_LINES, line_count + 1)))
+        return lines
+
+    def candidate_lines(self, file_name, query, constraints):
+        """
+        Get the sorted numbers of the lines that can contain the query
+
+        A query of three or more characters is first narrowed to the blocks
+        containing all of its trigrams, which also serves partial IPs, hex
+        fragments and paths. Whole-word constraints come straight from the
+        token postings; partial words scan the token vocabulary, which is
+        skipped when the trigrams already left only a few blocks.
+
+        Returns:
+            List of line numbers, or None if nothing narrows the search
+        """
+        entry = self.files[file_name]
+        postings = entry["postings"]
+        blocks = None
+        if len(query) >= 3:
+            blocks = self.trigram_candidate_blocks(entry, trigrams(query))
+            if not blocks:
+                return []
+            block_count = -(-len(entry["line_starts"]) // TRIGRAM_BLOCK_LINES)
+            if len(blocks) <= block_count * TRIGRAM_SELECTIVE_RATIO:
+                constraints = [(kind, word) for kind, word in constraints if kind == 'exact']
+
+        candidates = None
+        for kind, word in constraints:
+            if kind == 'exact':
+                lines = set(postings.get(word, ()))
+            else:
+                if kind == 'prefix':
+                    tokens = [token for token in postings if token.startswith(word)]
+                elif kind == 'suffix':
+                    tokens = [token for token in postings if token.endswith(word)]
+                else:
+                    tokens = [token for token in postings if word in token]
+                lines = set()
+                for token in tokens:
+                    lines.update(postings[token])
+
+            candidates = lines if candidates is None else candidates & lines
+            if not candidates:
+                return []
+
+        if blocks is not None:
+            if candidates is None:
+                return self.block_lines(entry, blocks)
+            candidates = {line_number for line_number in candidates
+                          if (line_number - 1) // TRIGRAM_BLOCK_LINES in blocks}
+
+        return None if candidates is None else sorted(candidates)
+
+    def regex_candidate_lines(self, file_name, pattern):
+        """
+        Get the sorted numbers of the lines that can match a regex
+
+        Uses the literals every match must contain (see required_literals):
+        a line can only match if it holds all trigrams of one of them.
+
+        Args:
+            file_name: Indexed file
+            pattern: Regex source, matched with re.IGNORECASE
+
+        Returns:
+            List of line numbers, or None if the regex has no usable literals
+        """
+        literals = required_literals(pattern)
+        if not literals or any(len(literal) < 3 for literal in literals):
+            return None
+
+        entry = self.files[file_name]
+        blocks = set(entry["non_ascii_blocks"])
+        for literal in literals:
+            blocks |= self.trigram_candidate_blocks(entry, trigrams(literal))
+        return self.block_lines(entry, blocks)
+
+    def read_candidates(self, file_name, line_numbers, after_line=0):
+        """
+        Read candidate lines, or the whole file when they are most of it
+
+        Args:
+            file_name: Indexed file
+            line_numbers: Sorted candidate line numbers, None for every line
+            after_line: Skip lines up to and including this one
+        """
+        file_path = os.path.join(self.folder_path, file_name)
+        entry = self.files.get(file_name)
+        if line_numbers is not None and after_line:
+            line_numbers = line_numbers[bisect.bisect_right(line_numbers, after_line):]
+
+        if line_numbers is None or entry is None or \
+                len(line_numbers) > len(entry["line_starts"]) * SEQUENTIAL_SCAN_RATIO:
+            wanted = None if line_numbers is None else set(line_numbers)
+            return ((line_number, line) for line_number, line in iter_log_lines(file_path)
+                    if line_number > after_line and (wanted is None or line_number in wanted))
+        return read_lines_at(file_path, entry["line_starts"], line_numbers)
+
+    def query_candidate_lines(self, file_name, query):
+        """
+        Get the sorted numbers of the lines of a file that can match a LogQuery
+
+        Text queries use the word and trigram postings. For the other modes
+        each alternative group is narrowed to the lines that can match all of
+        its terms, and the groups are combined.
+
+        Returns:
+            List of line numbers, or None if every line has to be checked
+        """
+        if file_name not in self.files:
+            return None
+
+        if query.mode == "text":
+            return self.candidate_lines(file_name, query.text, query_constraints(query.text))
+
+        groups = query.index_groups()
+        if not groups:
+            return None
+
+        line_numbers = set()
+        for group in groups:
+            group_lines = None
+            for pattern in group:
+                term_lines = self.regex_candidate_lines(file_name, pattern)
+                if term_lines is not None:
+                    term_lines = set(term_lines)
+                    group_lines = term_lines if group_lines is None else group_lines & term_lines
+            if group_lines is None:
+                # A group without usable literals can match anywhere
+                return None
+            line_numbers |= group_lines
+        return sorted(line_numbers)
+
+    def iter_file_query(self, file_name, query, after_line=0):
+        """
+        Stream the lines of an indexed file that match a LogQuery
+
+        Candidates are picked under the lock; the lines themselves are read
+        lazily, so callers can stop early and memory stays flat. Field
+        filters are answered by the file's record columns (see
+        log_columns), so only the query's text is checked on the lines.
+        Call refresh() first so the file's entry is current.
+
+        Args:
+            file_name: File in the folder
+            query: Compiled LogQuery
+            after_line: Resume after this line number (for paging)
+
+        Yields:
+            (line_number, line) tuples in line order
+        """
+        columns = get_record_columns(self.folder_path, file_name) if query.fields else None
+        with self.lock:
+            line_numbers = self.query_candidate_lines(file_name, query)
+            if columns is not None:
+                field_lines = columns.line_numbers(columns.field_mask(query.fields)).tolist()
+                line_numbers = field_lines if line_numbers is None else sorted(set(line_numbers).intersection(field_lines))
+            lines = self.read_candidates(file_name, line_numbers, after_line)
+        for line_number, line in lines:
+            if query.matches_text(line):
+                yield line_number, line
+
+    def search_file_query(self, file_name, query):
+        """
+        Find the lines of an indexed file that match a LogQuery
+
+        Returns:
+            List of (line_number, line) tuples
+        """
+        return list(self.iter_file_query(file_name, query))
+
+    def search_file(self, file_name, search_term):
+        """
+        Find the lines of an indexed file that contain a search term
+
+        Matches exactly like a case-insensitive substring test on every line.
+
+        Returns:
+            List of (line_number, line) tuples
+        """
+        return self.search_file_query(file_name, LogQuery(search_term))
+
+
+class LineIndex:
+    """
+    Persistent line-offset index of the log files in one upload folder
+
+    For every file it keeps the line count and the byte offset of every
+    LINE_CHECKPOINT_INTERVAL-th line, so the viewer can read any window of a
+    large file without reading everything before it. It is much cheaper to
+    build than the search index, so a newly opened file can be shown at once.
+    Files are rescanned when their size or modification time changes.
+    """
+
+    def __init__(self, folder_path, index_path):
+        self.folder_path = folder_path
+        self.index_path = index_path
+        self.lock = threading.RLock()
+        self.files = self.load()
+
+    def load(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get("version") == LINE_INDEX_VERSION and data.get("interval") == LINE_CHECKPOINT_INTERVAL:
+                return data["files"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Could not load line index {self.index_path}, rebuilding: {e}")
+        return {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump({"version": LINE_INDEX_VERSION, "interval": LINE_CHECKPOINT_INTERVAL, "files": self.files},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.index_path)
+
+    def file_entry(self, file_name):
+        """
+        Get the line index entry of a file, scanning it if new or changed
+
+        Raises:
+            OSError: if the file can't be read
+        """
+        file_path = os.path.join(self.folder_path, file_name)
+        stat = log_file_stat(file_path)
+        with self.lock:
+            entry = self.files.get(file_name)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                return entry
+
+            print(f"🗂️ Indexing lines of {file_path}")
+            checkpoints, line_count = scan_line_checkpoints(file_path, LINE_CHECKPOINT_INTERVAL)
+            entry = self.files[file_name] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "checkpoints": checkpoints,
+                "line_count": line_count
+            }
+            # Forget files that are gone while saving anyway
+            for other in [name for name in self.files if not log_file_exists(os.path.join(self.folder_path, name))]:
+                del self.files[other]
+            try:
+                self.save()
+            except OSError as e:
+                print(f"⚠️ Could not save line index {self.index_path}: {e}")
+            return entry
+
+    def read_lines(self, file_name, start_line, count):
+        """
+        Read a window of lines of a file
+
+        Args:
+            file_name: File in the folder
+            start_line: 1-based number of the first line
+            count: Maximum number of lines
+
+        Returns:
+            (lines, line_count) with line_count the file's total
+        """
+        entry = self.file_entry(file_name)
+        lines = read_line_window(os.path.join(self.folder_path, file_name), entry["checkpoints"],
+                                 LINE_CHECKPOINT_INTERVAL, start_line, count)
+        return lines, entry["line_count"]
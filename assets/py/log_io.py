@@ -0,0 +1,532 @@
+import io
+import os
+import re
+import mmap
+import numpy as np
+from array import array
+from contextlib import contextmanager
+from assets.py.log_storage import open_log_binary, log_file_size, is_plain_log, is_random_access_log
+
+# Size of each read from disk; peak memory per reader is about one chunk
+# plus the longest line
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Files at least this large are memory-mapped and sliced instead of read
+# through a buffer
+MMAP_MIN_BYTES = 32 * 1024 * 1024
+
+# Line terminators recognized by text mode's universal newlines. In UTF-8
+# these bytes never occur inside a multi-byte character, so splitting the raw
+# bytes gives the same lines as splitting the decoded text.
+NEWLINE_BYTES = re.compile(rb'\r\n|\r|\n')
+
+
+@contextmanager
+def open_mapped(file_path):
+    """
+    Open a log file for binary reading, memory-mapped if it is large
+
+    Yields:
+        (f, mapped) where mapped is a read-only mmap of the whole file, or
+        None below MMAP_MIN_BYTES and for compressed files and archive
+        members, which f decompresses as it is read (see open_log_binary)
+    """
+    with open_log_binary(file_path) as f:
+        if not is_plain_log(file_path):
+            yield f, None
+            return
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or size < MMAP_MIN_BYTES:
+            yield f, None
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield f, mapped
+
+
+class _ByteRangeReader(io.RawIOBase):
+    """Raw reader that stops at a byte offset of an already positioned file"""
+
+    def __init__(self, raw, end):
+        self.raw = raw
+        self.remaining = end - raw.tell()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:self.remaining]
+        count = self.raw.readinto(view)
+        self.remaining -= count
+        return count
+
+
+def iter_log_lines(file_path, start=0, end=None, chunk_size=READ_CHUNK_SIZE):
+    """
+    Stream a log file line by line without loading it into memory
+
+    Lines are split exactly like content.split('\\n') on the file read in text
+    mode (universal newlines, utf-8 with replacement), so line numbers match
+    what the log viewer shows, including a final empty line after a trailing
+    newline.
+
+    Args:
+        file_path: Path of the log file
+        start: Byte offset to start at, must be the start of a line
+        end: Byte offset to stop at (a line boundary), None for end of file
+        chunk_size: Number of characters read per chunk
+
+    Yields:
+        (line_number, line) tuples, line numbers starting at 1 for the first
+        line of the range
+    """
+    with open_log_binary(file_path) as raw:
+        raw.seek(start)
+        source = io.BufferedReader(_ByteRangeReader(raw, end)) if end is not None else raw
+        f = io.TextIOWrapper(source, encoding='utf-8', errors='replace')
+
+        line_number = 0
+        pending = ''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+
+            parts = (pending + chunk).split('\n')
+            # The last part may continue in the next chunk
+            pending = parts.pop()
+            for line in parts:
+                line_number += 1
+                yield line_number, line
+
+        # A range that stops on a line boundary has no partial last line;
+        # only the end of the file has the extra line split() produces
+        if pending or end is None:
+            yield line_number + 1, pending
+
+
+def split_file_ranges(file_path, chunk_bytes, start=0):
+    """
+    Split a file into byte ranges of about chunk_bytes that end on line boundaries
+
+    Args:
+        file_path: Path of the log file
+        chunk_bytes: Target size of each range
+        start: Byte offset of the first range, must be the start of a line
+
+    Returns:
+        List of (start, end) tuples for iter_log_lines; the last end is None.
+        Files that can only be read from the start (gzip streams and archive
+        members) are a single range.
+    """
+    if not is_random_access_log(file_path):
+        return [(start, None)]
+    size = log_file_size(file_path)
+    ranges = []
+
+    with open_log_binary(file_path) as f:
+        while start + chunk_bytes < size:
+            # Move the cut to just after the next newline
+            f.seek(start + chunk_bytes)
+            f.readline()
+            end = f.tell()
+            if end >= size:
+                break
+            ranges.append((start, end))
+            start = end
+
+    ranges.append((start, None))
+    return ranges
+
+
+def last_line_start(file_path, size):
+    """
+    Find where the last line of the first size bytes of a file starts
+
+    A \r at the very end may become half of a \r\n when the file grows, so
+    it doesn't end a line here: the line it ends counts as the last one.
+
+    Returns:
+        Byte offset of the last line, 0 if there is only one
+    """
+    with open_log_binary(file_path) as f:
+        position = size
+        if size:
+            f.seek(size - 1)
+            if f.read(1) == b'\r':
+                position -= 1
+
+        while position > 0:
+            start = max(position - 64 * 1024, 0)
+            f.seek(start)
+            data = f.read(position - start)
+            cut = max(data.rfind(b'\n'), data.rfind(b'\r'))
+            if cut != -1:
+                return start + cut + 1
+            position = start
+    return 0
+
+
+def iter_line_offsets(file_path, chunk_size=READ_CHUNK_SIZE):
+    """
+    Stream a log file like iter_log_lines, also reporting where each line starts
+
+    Yields:
+        (line_number, byte_offset, line) tuples with the same lines and
+        numbering as iter_log_lines
+    """
+    with open_log_binary(file_path) as f:
+        line_number = 0
+        offset = 0
+        pending = b''
+        while True:
+            chunk = f.read(chunk_size)
+            pending += chunk
+            position = 0
+            for match in NEWLINE_BYTES.finditer(pending):
+                # A trailing \r may be the first half of a \r\n
+                if chunk and match.end() == len(pending) and match.group() == b'\r':
+                    break
+                line_number += 1
+                yield line_number, offset + position, pending[position:match.start()].decode('utf-8', errors='replace')
+                position = match.end()
+            pending = pending[position:]
+            offset += position
+            if not chunk:
+                break
+
+        yield line_number + 1, offset, pending.decode('utf-8', errors='replace')
+
+
+def read_lines_at(file_path, line_starts, line_numbers):
+    """
+    Read selected lines of a file using their byte offsets
+
+    Args:
+        file_path: Path of the log file
+        line_starts: Byte offset of every line, as from iter_line_offsets
+        line_numbers: Sorted 1-based numbers of the lines to read
+
+    Yields:
+        (line_number, line) tuples
+    """
+    with open_mapped(file_path) as (f, mapped):
+        for line_number in line_numbers:
+            start = line_starts[line_number - 1]
+            end = line_starts[line_number] if line_number < len(line_starts) else None
+            if mapped is not None:
+                data = mapped[start:end]
+            else:
+                f.seek(start)
+                data = f.read() if end is None else f.read(end - start)
+            if end is not None:
+                # Drop the line terminator
+                data = data[:-2] if data.endswith(b'\r\n') else data[:-1]
+            yield line_number, data.decode('utf-8', errors='replace')
+
+
+# Bytes that only occur in non-ASCII UTF-8 (or invalid) text
+NON_ASCII_BYTE = re.compile(rb'[\x80-\xff]')
+
+# Size of the slices checked with bytes.isascii() before looking for the
+# non-ASCII bytes themselves, which is much slower
+ASCII_CHECK_SIZE = 4096
+
+
+def count_line_breaks(data, start=0, end=None):
+    """Count the line terminators in data[start:end], which must not split a \\r\\n"""
+    end = len(data) if end is None else end
+    count = data.count(b'\n', start, end)
+    carriage_returns = data.count(b'\r', start, end)
+    if carriage_returns:
+        count += carriage_returns - data.count(b'\r\n', start, end)
+    return count
+
+
+def _line_bounds(data, position, floor=0):
+    """
+    Get the start and end (before its terminator) of the line holding position
+
+    floor is where to stop looking back: 0 or the end of an earlier line.
+    """
+    start = max(data.rfind(b'\n', floor, position), data.rfind(b'\r', floor, position)) + 1
+    match = NEWLINE_BYTES.search(data, position)
+    return start, match.start() if match else len(data)
+
+
+def iter_line_blocks(file_path, start=0, end=None, chunk_size=READ_CHUNK_SIZE):
+    """
+    Stream a file, or a byte range of it, as blocks of whole lines
+
+    Every block ends with a line terminator except the last, which runs to
+    the end of the range. Large files are sliced out of a memory map (see
+    open_mapped); others are read in chunks, carrying each chunk's partial
+    last line over to the next.
+
+    Args:
+        file_path: Path of the log file
+        start: Byte offset to start at, must be the start of a line
+        end: Byte offset to stop at (a line boundary), None for end of file
+        chunk_size: Approximate size of each block
+
+    Yields:
+        Blocks as bytes
+    """
+    with open_mapped(file_path) as (f, mapped):
+        if mapped is not None:
+            end = len(mapped) if end is None else end
+            position = start
+            while True:
+                limit = position + chunk_size
+                if limit >= end:
+                    yield mapped[position:end]
+                    return
+                # A \r at the limit may be half of a \r\n
+                cut = max(mapped.rfind(b'\n', position, limit), mapped.rfind(b'\r', position, limit - 1)) + 1
+                if cut == 0:
+                    # A line longer than the chunk size
+                    match = NEWLINE_BYTES.search(mapped, limit - 1, end)
+                    cut = match.end() if match else end
+                yield mapped[position:cut]
+                position = cut
+
+        f.seek(start)
+        remaining = None if end is None else end - start
+        pending = b''
+        while True:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = f.read(size) if size else b''
+            if not chunk:
+                yield pending
+                return
+            if remaining is not None:
+                remaining -= len(chunk)
+
+            data = pending + chunk
+            # A trailing \r may be half of a \r\n
+            cut = max(data.rfind(b'\n'), data.rfind(b'\r', 0, len(data) - 1)) + 1
+            if cut:
+                yield data[:cut]
+            pending = data[cut:]
+
+
+def scan_candidate_lines(file_path, find, check, start=0, end=None, limit=0, chunk_size=READ_CHUNK_SIZE):
+    """
+    Check only the lines of a file that a byte-level search picks out
+
+    The search runs on lower-cased raw bytes, so only the lines it hits are
+    decoded. Lines with non-ASCII bytes are always checked as well, since
+    lower-casing them in Python can give ASCII text the byte search misses.
+    Lines are numbered like iter_log_lines.
+
+    Args:
+        file_path: Path of the log file
+        find: Called as find(folded, position) on a lower-cased block, returns
+            the offset of the next hit at or after position or -1; None to
+            check non-ASCII lines only
+        check: Called with each picked line; returns a result, or something
+            false for lines that don't count
+        start: Byte offset to start at, must be the start of a line
+        end: Byte offset to stop at (a line boundary), None for end of file
+        limit: Stop after this many results (no limit if not positive)
+        chunk_size: Approximate number of bytes handled at a time
+
+    Returns:
+        (line_count, results) where results is a list of (line_number,
+        result) with line numbers relative to the range start. line_count is
+        the number of lines in the range, or only of those read before the
+        limit was reached.
+    """
+    results = []
+    line_number = 0
+    data = b''
+    for data in iter_line_blocks(file_path, start, end, chunk_size):
+        candidates = set()
+        if find is not None:
+            folded = data.lower()
+            line_end = 0
+            position = find(folded, 0)
+            while position != -1:
+                line_start, line_end = _line_bounds(data, position, line_end)
+                candidates.add((line_start, line_end))
+                # A hit can only start on a terminator if it spans lines
+                position = find(folded, line_end + 1)
+        if not data.isascii():
+            line_end = 0
+            for offset in range(0, len(data), ASCII_CHECK_SIZE):
+                if data[offset:offset + ASCII_CHECK_SIZE].isascii():
+                    continue
+                for match in NON_ASCII_BYTE.finditer(data, max(offset, line_end), offset + ASCII_CHECK_SIZE):
+                    if match.start() >= line_end:
+                        line_start, line_end = _line_bounds(data, match.start(), line_end)
+                        candidates.add((line_start, line_end))
+
+        counted = 0
+        for line_start, line_end in sorted(candidates):
+            result = check(data[line_start:line_end].decode('utf-8', errors='replace'))
+            if result:
+                line_number += count_line_breaks(data, counted, line_start)
+                counted = line_start
+                results.append((line_number + 1, result))
+                if 0 < limit <= len(results):
+                    return line_number + 1, results
+        line_number += count_line_breaks(data, counted)
+
+    # Lines of a range end with their terminator; only the end of the file
+    # has a last line without one (empty after a trailing newline)
+    if end is None or data[-1:] not in (b'', b'\n', b'\r'):
+        line_number += 1
+    return line_number, results
+
+
+def find_text_lines(file_path, text, start=0, end=None, limit=0, chunk_size=READ_CHUNK_SIZE):
+    """
+    Find the lines of a file, or a byte range of it, that contain some text
+
+    Matches exactly like text.lower() in line.lower() on the lines of
+    iter_log_lines, but searches the lower-cased raw bytes with bytes.find
+    (see scan_candidate_lines).
+
+    Args:
+        file_path: Path of the log file
+        text: Text to look for, case-insensitively
+        start: Byte offset to start at, must be the start of a line
+        end: Byte offset to stop at (a line boundary), None for end of file
+        limit: Stop after this many matching lines (no limit if not positive)
+        chunk_size: Number of bytes read per chunk
+
+    Returns:
+        (line_count, matches) where matches is a list of (line_number, line)
+        with line numbers relative to the range start. line_count is the
+        number of lines in the range, or only of those read before the limit
+        was reached.
+    """
+    needle = text.lower()
+    if not needle:
+        matches = list(iter_log_lines(file_path, start, end))
+        if limit > 0:
+            del matches[limit:]
+        return (matches[-1][0] if matches else 0), matches
+
+    def check(line):
+        return line if needle in line.lower() else None
+
+    # The needle can only be found as bytes if it is ASCII; a needle with a
+    # line break never matches inside a line
+    find = None
+    if needle.isascii() and '\n' not in needle and '\r' not in needle:
+        needle_bytes = needle.encode('ascii')
+
+        def find(folded, position):
+            return folded.find(needle_bytes, position)
+
+    return scan_candidate_lines(file_path, find, check, start, end, limit, chunk_size)
+
+
+def scan_line_checkpoints(file_path, interval, chunk_size=READ_CHUNK_SIZE):
+    """
+    Record where every interval-th line of a file starts
+
+    Line terminators are located with NumPy rather than by decoding, so this
+    runs at close to disk speed even on very large files, which are scanned
+    in place through a memory map.
+
+    Args:
+        file_path: Path of the log file
+        interval: Number of lines between checkpoints
+        chunk_size: Number of bytes handled at a time
+
+    Returns:
+        (checkpoints, line_count) where checkpoints is an array('Q') of the
+        byte offsets of lines 1, interval + 1, 2 * interval + 1, ... and
+        line_count is the number of lines as iter_log_lines counts them
+    """
+    checkpoints = array('Q', [0])
+    line_count = 1
+    offset = 0
+    with open_mapped(file_path) as (f, mapped):
+        contents = np.frombuffer(mapped, dtype=np.uint8) if mapped is not None else None
+        while True:
+            if contents is not None:
+                stop = min(offset + chunk_size, len(contents))
+                # Tell a \r\n from a lone \r split across chunks
+                while stop < len(contents) and contents[stop - 1] == ord('\r'):
+                    stop += 1
+                data = contents[offset:stop]
+            else:
+                chunk = f.read(chunk_size)
+                while chunk.endswith(b'\r'):
+                    # Tell a \r\n from a lone \r split across chunks
+                    extra = f.read(1)
+                    if not extra:
+                        break
+                    chunk += extra
+                data = np.frombuffer(chunk, dtype=np.uint8)
+            if not len(data):
+                break
+
+            newlines = data == ord('\n')
+            followed_by_newline = np.append(newlines[1:], False)
+            line_ends = np.flatnonzero(newlines | ((data == ord('\r')) & ~followed_by_newline))
+
+            # Line line_count + 1 + i starts after the i-th terminator
+            first = -line_count % interval
+            checkpoints.extend((line_ends[first::interval] + offset + 1).tolist())
+            line_count += len(line_ends)
+            offset += len(data)
+        # The array views the map, which can't close while they exist
+        del contents, data
+
+    return checkpoints, line_count
+
+
+def read_line_window(file_path, checkpoints, interval, start_line, count):
+    """
+    Read a run of lines using the checkpoints from scan_line_checkpoints
+
+    Args:
+        file_path: Path of the log file
+        checkpoints: Byte offsets of every interval-th line
+        interval: Number of lines between checkpoints
+        start_line: 1-based number of the first line to read
+        count: Maximum number of lines to read
+
+    Returns:
+        List of lines; shorter than count at the end of the file
+    """
+    checkpoint = min((start_line - 1) // interval, len(checkpoints) - 1)
+    line_number = checkpoint * interval + 1
+    with open_mapped(file_path) as (f, mapped):
+        if mapped is not None:
+            # Split a slice of the map that holds the wanted lines; only
+            # those are decoded
+            position = checkpoints[checkpoint]
+            skip = start_line - line_number
+            size = max(64 * 1024, (skip + count) * 256)
+            while True:
+                at_end = position + size >= len(mapped)
+                block = mapped[position:position + size]
+                # Splitting on \n is much faster than on the regex; it is
+                # enough when every \r is part of a \r\n, except maybe one
+                # cut off at the end of the slice, in the part dropped below
+                cut_off = not at_end and block.endswith(b'\r')
+                crlf_only = block.count(b'\r') - cut_off == block.count(b'\r\n')
+                parts = block.split(b'\n') if crlf_only else NEWLINE_BYTES.split(block)
+                if not at_end:
+                    # The last part may continue past the slice
+                    parts.pop()
+                if at_end or len(parts) >= skip + count:
+                    break
+                size *= 2
+            return [(part[:-1] if crlf_only and part.endswith(b'\r') else part).decode('utf-8', errors='replace')
+                    for part in parts[skip:skip + count]]
+
+    # Small reads: only up to interval + count lines are needed
+    lines = []
+    for number, line in iter_log_lines(file_path, checkpoints[checkpoint], chunk_size=64 * 1024):
+        if line_number + number - 1 >= start_line:
+            lines.append(line)
+            if len(lines) >= count:
+                break
+    return lines
@@ -0,0 +1,354 @@
+import os
+import re
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import joblib
+import numpy as np
+from assets.py.log_io import iter_log_lines
+from assets.py.log_patterns import classify_risk_type
+
+# Number of non-empty lines classified per model call in deep analysis
+DEEP_ANALYSIS_BATCH_SIZE = 5000
+
+# How often the model cache checks the model file for changes, in seconds
+MODEL_WATCH_INTERVAL = 5
+
+# Number of distinct line templates whose predictions are kept between analyses
+PREDICTION_CACHE_SIZE = 100000
+
+# Number of features reported as indicators for a flagged line
+MAX_INDICATORS = 5
+
+
+def file_digest(file_path):
+    """Get the SHA-256 hex digest of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """
+    Keeps the trained pipeline loaded between analyses
+
+    The model is keyed on its file's path, modification time, size and
+    content hash. A stat change with the same hash (the file was touched or
+    rewritten unchanged) only refreshes the key; a real change loads the new
+    model. watch() reloads in the background, so an analysis normally finds
+    the current model ready; if it gets there first, get() loads it instead.
+    """
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.lock = threading.Lock()
+        self.model = None
+        self.stat_key = None
+        self.digest = None
+        self.watch_thread = None
+
+    def _stat_key(self):
+        try:
+            stat = os.stat(self.model_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self):
+        """Bring the cached model in line with the file; call with lock held"""
+        stat_key = self._stat_key()
+        if stat_key is None or stat_key == self.stat_key:
+            return
+
+        digest = file_digest(self.model_path)
+        if digest != self.digest:
+            print(f"📊 Loading model from {self.model_path}")
+            self.model = joblib.load(self.model_path)
+            self.digest = digest
+        self.stat_key = stat_key
+
+    def get(self):
+        """
+        Get the current model
+
+        Returns:
+            The loaded pipeline, or None if there is no model file
+
+        Raises:
+            Whatever joblib.load raises for an unreadable model file
+        """
+        with self.lock:
+            self._refresh()
+            return self.model
+
+    def store(self, model):
+        """Cache a model that was just saved to the model path"""
+        with self.lock:
+            self.model = model
+            self.stat_key = self._stat_key()
+            self.digest = file_digest(self.model_path) if self.stat_key else None
+
+    def watch(self, interval=MODEL_WATCH_INTERVAL):
+        """Start a daemon thread that loads the model now and on every change"""
+        if self.watch_thread is not None:
+            return
+        self.watch_thread = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        self.watch_thread.start()
+
+    def _watch(self, interval):
+        failed_key = None
+        while True:
+            stat_key = self._stat_key()
+            # Retry a file that failed to load only once it changes again
+            if stat_key != self.stat_key and stat_key != failed_key:
+                try:
+                    with self.lock:
+                        self._refresh()
+                except Exception as e:
+                    print(f"⚠️ Could not reload model in the background: {e}")
+                    failed_key = stat_key
+            time.sleep(interval)
+
+
+class PredictionCache:
+    """
+    LRU cache of model outputs keyed on a line's template
+
+    Logs repeat the same message templates with different numbers, IPs and
+    IDs. Those values are almost never in the vectorizer's vocabulary, so
+    such lines vectorize to the same sparse row and the model cannot tell
+    them apart: the row is the line's template as the model sees it. Keying
+    on the row instead of a regex-normalized string means sharing a cached
+    prediction never changes a result.
+    """
+
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.model = None
+        self.feature_names = None
+        self.feature_importances = None
+
+    def bind(self, model):
+        """Drop predictions that were made by a different model"""
+        if model is not self.model:
+            self.entries.clear()
+            self.model = model
+            # Both are recomputed on every access, so keep them per model
+            self.feature_names = model.named_steps['vectorizer'].get_feature_names_out()
+            self.feature_importances = model.named_steps['classifier'].feature_importances_
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+# Shared by every analysis in this process, so re-analysing similar files
+# only classifies templates that haven't been seen yet
+prediction_cache = PredictionCache()
+
+
+def new_file_results(filename):
+    """Create an empty per-file deep analysis result"""
+    return {
+        "file_name": filename,
+        "total_lines": 0,
+        "risk_prediction": {
+            "Critical": 0,
+            "High": 0,
+            "Medium": 0,
+            "Low": 0,
+            "Normal": 0
+        },
+        "line_analysis": []
+    }
+
+
+def drop_lines_after(file_results, kept_lines, dropped_lines):
+    """
+    Remove the results of a file's lines after kept_lines
+
+    Args:
+        file_results: Per-file result dict covering the whole file
+        kept_lines: Number of lines whose results are kept
+        dropped_lines: Text of the lines after kept_lines, needed to tell
+            empty lines (never counted) from Normal ones (counted only)
+    """
+    flagged = {}
+    kept = []
+    for line_result in file_results["line_analysis"]:
+        if line_result["line_number"] > kept_lines:
+            flagged[line_result["line_number"]] = line_result["risk_level"]
+        else:
+            kept.append(line_result)
+    file_results["line_analysis"] = kept
+
+    for line_number, line in enumerate(dropped_lines, kept_lines + 1):
+        if line_number in flagged:
+            file_results["risk_prediction"][flagged[line_number]] -= 1
+        elif line.strip():
+            file_results["risk_prediction"]["Normal"] -= 1
+    file_results["total_lines"] = kept_lines
+
+
+def analyze_line_range(model, file_path, filename, start=0, end=None):
+    """
+    Classify every non-empty line of a file, or of a byte range of it
+
+    Args:
+        model: Fitted vectorizer + classifier pipeline
+        file_path: Path of the log file
+        filename: Name reported in the results
+        start: Byte offset to start at (see split_file_ranges)
+        end: Byte offset to stop at, None for end of file
+
+    Returns:
+        Per-file result dict; line numbers and total_lines are relative to
+        the start of the range
+    """
+    file_results = new_file_results(filename)
+
+    # Stream the range and classify non-empty lines in fixed-size batches
+    # so memory stays bounded for very large files
+    batch = []
+    for line_number, line in iter_log_lines(file_path, start, end):
+        file_results["total_lines"] = line_number
+        if not line.strip():
+            continue
+
+        batch.append((line_number, line))
+        if len(batch) >= DEEP_ANALYSIS_BATCH_SIZE:
+            analyze_line_batch(model, batch, file_results, filename)
+            batch = []
+
+    if batch:
+        analyze_line_batch(model, batch, file_results, filename)
+
+    return file_results
+
+
+def top_indicators(matrix, importances, count=MAX_INDICATORS):
+    """
+    Pick the most important features present in each row of a CSR matrix
+
+    Args:
+        matrix: CSR matrix of vectorized lines
+        importances: Importance of every feature (column)
+        count: Maximum number of features per row
+
+    Returns:
+        List with an array of feature indices per row, most important first
+    """
+    matrix.sort_indices()
+    row_ids = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    # Order each row's entries by falling importance, ties by feature index
+    order = np.lexsort((matrix.indices, -importances[matrix.indices], row_ids))
+    rank = np.arange(len(order)) - matrix.indptr[row_ids[order]]
+    top = order[rank < count]
+    bounds = np.searchsorted(row_ids[top], np.arange(matrix.shape[0] + 1))
+    return np.split(matrix.indices[top], bounds[1:-1])
+
+
+def highlight_pattern(indicators):
+    """Compile one case-insensitive regex that finds any of the indicators"""
+    if not indicators:
+        return None
+    # Longest first, so a bigram wins over the words inside it
+    alternatives = sorted(indicators, key=len, reverse=True)
+    return re.compile("|".join(re.escape(feature) for feature in alternatives), re.IGNORECASE)
+
+
+def analyze_line_batch(model, batch, file_results, filename, cache=prediction_cache):
+    """
+    Classify a batch of non-empty lines and add the results to file_results
+    
+    Args:
+        batch: List of (line_number, line) tuples
+        file_results: Per-file result dict from new_file_results
+        filename: Name of the file, for logging
+        cache: PredictionCache shared between batches and analyses
+    """
+    vectorizer = model.named_steps['vectorizer']
+    classifier = model.named_steps['classifier']
+    cache.bind(model)
+    
+    # Identical lines vectorize identically, so only distinct ones are
+    # transformed; the matrix is then reused for the probabilities, the
+    # predictions and the indicators
+    unique_lines = list(dict.fromkeys(line for _, line in batch))
+    print(f"🔍 Vectorizing {len(unique_lines)} distinct lines of {len(batch)} in {filename}...")
+    vectorized_lines = vectorizer.transform(unique_lines)
+    vectorized_lines.sort_indices()
+    indptr, indices, data = vectorized_lines.indptr, vectorized_lines.indices, vectorized_lines.data
+    
+    # Look every line's template up in the cache, collecting the misses
+    line_keys = {}
+    missing = {}
+    for row, line in enumerate(unique_lines):
+        row_slice = slice(indptr[row], indptr[row + 1])
+        key = (indices[row_slice].tobytes(), data[row_slice].tobytes())
+        line_keys[line] = key
+        if key not in missing and cache.get(key) is None:
+            missing[key] = row
+    
+    if missing:
+        print(f"🧠 Making predictions for {len(missing)} new templates in {filename}...")
+        missing_lines = vectorized_lines[list(missing.values())]
+        # Get prediction probabilities to assess confidence; the predicted
+        # risk level is the most probable class, exactly as classifier.predict does
+        prediction_probs = classifier.predict_proba(missing_lines)
+        predicted_risks = classifier.classes_.take(np.argmax(prediction_probs, axis=1))
+        confidences = prediction_probs.max(axis=1)
+        # The features (words) behind each prediction, most important first
+        indicator_rows = top_indicators(missing_lines, cache.feature_importances)
+        
+        for key, risk_level, confidence, feature_indices in zip(
+                missing, predicted_risks, confidences, indicator_rows):
+            important_features = []
+            # Only flagged lines report indicators
+            if risk_level != "Normal":
+                important_features = [str(feature) for feature in cache.feature_names[feature_indices]]
+            cache.put(key, (risk_level, float(confidence), important_features,
+                            highlight_pattern(important_features)))
+    
+    # Fan the template results back out to every line
+    print(f"📝 Processing prediction results and extracting key features...")
+    for line_number, line in batch:
+        risk_level, confidence, important_features, highlighter = cache.get(line_keys[line])
+        
+        # Update risk count in file results
+        file_results["risk_prediction"][risk_level] += 1
+        
+        # Normal lines are only counted
+        if risk_level == "Normal":
+            continue
+        
+        risk_type = classify_risk_type(line, important_features)
+
+        # Highlight all indicators in one pass over the line
+        highlighted_log = line
+        if highlighter is not None:
+            highlighted_log = highlighter.sub(
+                lambda m: f"<span class='highlight'>{m.group(0)}</span>", line)
+        
+        # Add line analysis
+        line_result = {
+            "line_number": line_number,
+            "risk_level": risk_level,
+            "risk_type": risk_type,
+            "confidence": confidence,
+            "log_content": highlighted_log,
+            "raw_content": line,
+            "indicators": list(important_features)
+        }
+        file_results["line_analysis"].append(line_result)
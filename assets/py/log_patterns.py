@@ -0,0 +1,359 @@
+import re
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+try:
+    import ahocorasick  # optional: pyahocorasick
+except ImportError:
+    ahocorasick = None
+
+# A pattern can only be lower-cased safely when that doesn't change an escape
+# (\S, \D, \W, \x41, \101 ...), a character class range or a group
+# extension such as (?P<name>...)
+UNSAFE_TO_FOLD = re.compile(r'\\[A-Zxu0-7]|\[[^\]]*[A-Z]|\(\?[a-zA-Z]*[A-Z]')
+
+
+def can_fold(pattern):
+    """Check whether lower-casing a pattern keeps it equivalent for fold_pattern"""
+    # Non-ASCII characters can case-fold onto ASCII ones (the long s matches
+    # 's' under IGNORECASE), which lower-cased text no longer shows
+    return pattern.isascii() and not UNSAFE_TO_FOLD.search(pattern)
+
+
+def fold_pattern(pattern):
+    """
+    Compile a pattern for matching against text that was already lower-cased
+
+    Case-sensitive matching of a lower-cased pattern against lower-cased ASCII
+    text gives the same matches as re.IGNORECASE, but lets the regex engine use
+    its literal and charset fast paths, which IGNORECASE disables.
+    """
+    if not can_fold(pattern):
+        return re.compile(pattern, re.IGNORECASE)
+    return re.compile(pattern.lower())
+
+
+def _sequence_literals(items):
+    """
+    Pick the most selective set of literals one of which must appear in any
+    match of a parsed regex sequence, or None if no such set can be derived
+    """
+    candidates = []
+    run = []
+
+    def flush():
+        if run:
+            candidates.append({"".join(run)})
+            run.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av).lower())
+            continue
+
+        flush()
+        if op is sre_constants.SUBPATTERN:
+            candidates.append(_sequence_literals(av[-1]))
+        elif op is sre_constants.BRANCH:
+            branches = [_sequence_literals(branch) for branch in av[1]]
+            if all(branches):
+                candidates.append(set().union(*branches))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+                    getattr(sre_constants, "POSSESSIVE_REPEAT", None)):
+            min_count, _, body = av
+            if min_count >= 1:
+                candidates.append(_sequence_literals(body))
+        elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+            candidates.append(_sequence_literals(av))
+        # Character classes, anchors, lookarounds etc. don't require a literal
+    flush()
+
+    candidates = [literals for literals in candidates if literals]
+    if not candidates:
+        return None
+    # The set whose shortest member is longest rejects the most lines
+    return max(candidates, key=lambda literals: min(len(literal) for literal in literals))
+
+
+def required_literals(pattern):
+    """
+    Get lower-cased literals one of which must appear in every match of a pattern
+
+    Args:
+        pattern: Regex source, matched with re.IGNORECASE
+
+    Returns:
+        Set of literals, or None if the pattern can match without any of them
+    """
+    try:
+        literals = _sequence_literals(sre_parse.parse(pattern, re.IGNORECASE))
+    except Exception:
+        return None
+    # Non-ASCII literals may case-fold onto ASCII text (e.g. the long s)
+    if not literals or not all(literal.isascii() for literal in literals):
+        return None
+    return literals
+
+
+def literal_trie_regex(literals):
+    """
+    Compile a regex matching any of the literals, arranged as a prefix trie
+
+    The regex engine tries every branch of a flat alternation at each
+    position; with a trie it only follows the branch for the current
+    character, which keeps hundreds of literals down to one cheap scan.
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        # A literal ending here already matches, longer ones add nothing
+        if "" in node:
+            return ""
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items())]
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return re.compile(build(trie))
+
+
+class LiteralPrefilter:
+    """
+    Cheap first stage that finds which anomaly categories a line could match
+
+    Every category gets the union of its patterns' required literals. A
+    lower-cased line that contains none of a category's literals cannot match
+    any of its patterns, so the regexes for that category are never run.
+    Uses an Aho-Corasick automaton when pyahocorasick is installed, otherwise
+    a single trie-shaped regex as the gate.
+    """
+
+    def __init__(self, category_literals):
+        self.always = []
+        self.category_literals = []
+        literal_categories = {}
+
+        for category_idx, literals in enumerate(category_literals):
+            if literals is None:
+                self.always.append(category_idx)
+                continue
+            self.category_literals.append((category_idx, tuple(literals)))
+            for literal in literals:
+                literal_categories.setdefault(literal, set()).add(category_idx)
+
+        self.automaton = None
+        self.gate = None
+        if literal_categories and ahocorasick is not None:
+            self.automaton = ahocorasick.Automaton()
+            for literal, categories in literal_categories.items():
+                self.automaton.add_word(literal, frozenset(categories))
+            self.automaton.make_automaton()
+        elif literal_categories:
+            self.gate = literal_trie_regex(literal_categories)
+
+    def candidates(self, text):
+        """
+        Get the indices of categories that could match a lower-cased line
+
+        Args:
+            text: Lower-cased ASCII line
+
+        Returns:
+            Sorted list of category indices, empty if the line can be skipped
+        """
+        if self.automaton is not None:
+            found = set(self.always)
+            for _, categories in self.automaton.iter(text):
+                found.update(categories)
+            return sorted(found)
+
+        if self.gate is None or self.gate.search(text) is None:
+            return self.always
+
+        found = set(self.always)
+        for category_idx, literals in self.category_literals:
+            for literal in literals:
+                if literal in text:
+                    found.add(category_idx)
+                    break
+        return sorted(found)
+
+
+class AnomalyPatternEngine:
+    """
+    Compiled matcher for the anomaly pattern table built by setup_anomaly_patterns
+
+    All patterns are compiled once. Each line is case-folded once and passed
+    through a LiteralPrefilter; only the categories whose required literals
+    occur in the line have their pre-folded patterns run, so most lines cost
+    a single scan.
+    """
+
+    def __init__(self, anomaly_patterns):
+        self.categories = []
+        category_literals = []
+
+        for anomaly_name, anomaly_data in anomaly_patterns.items():
+            patterns = anomaly_data["patterns"]
+            self.categories.append((
+                anomaly_name,
+                anomaly_data["danger_level"],
+                [fold_pattern(pattern) for pattern in patterns],
+                [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+            ))
+
+            pattern_literals = [required_literals(pattern) for pattern in patterns]
+            if pattern_literals and all(pattern_literals):
+                category_literals.append(set().union(*pattern_literals))
+            else:
+                category_literals.append(None)
+
+        self.prefilter = LiteralPrefilter(category_literals)
+        self.all_categories = list(range(len(self.categories)))
+
+        # The prefilter's literals as one bytes regex, for picking the lines
+        # of a raw file worth decoding; None when some category has no
+        # required literals and every line has to be scanned
+        self.byte_gate = None
+        if category_literals and all(category_literals):
+            self.byte_gate = re.compile(literal_trie_regex(set().union(*category_literals)).pattern.encode('ascii'))
+
+    def scan(self, line):
+        """
+        Find the anomaly categories matching a line
+
+        Args:
+            line: The log line to check
+
+        Returns:
+            List of (anomaly_name, danger_level, matched_text) tuples, one per
+            matching category in table order. Within a category the first
+            pattern that matches wins, as in the original per-pattern loop.
+        """
+        # Unicode case folding can change string length or map non-ASCII
+        # characters onto ASCII ones (e.g. the long s), so only ASCII lines
+        # take the folded path
+        folded = line.isascii()
+        if folded:
+            text = line.lower()
+            candidates = self.prefilter.candidates(text)
+        else:
+            text = line
+            candidates = self.all_categories
+
+        hits = []
+        for category_idx in candidates:
+            anomaly_name, danger_level, folded_patterns, exact_patterns = self.categories[category_idx]
+            for pattern in (folded_patterns if folded else exact_patterns):
+                match = pattern.search(text)
+                if match:
+                    hits.append((anomaly_name, danger_level, line[match.start():match.end()]))
+                    break
+        return hits
+
+
+# Risk type patterns checked by classify_risk_type, in priority order
+RISK_TYPE_PATTERNS = {
+    "Authentication & Security": r'authentication failed|unauthorized|access denied|invalid credentials|brute force|login attempt|intrusion detected|malware|root access|privilege escalation|SSH failure|port scan|firewall block|DDoS|SQL injection|XSS detected|CVE-',
+    "Network & Connectivity": r'network unreachable|connection refused|host down|packet loss|latency|DNS failure|IP conflict|ARP spoofing|proxy error|SSL handshake failure|TLS error|certificate expired',
+    "System Resources": r'CPU high|memory leak|disk I/O error|swap full|temp high|fan failure|power failure|battery low|process killed|service restart|unexpected shutdown|hardware failure',
+    "Unusual TCP Activity": r'(?:SYN-?){3,}|(?:FIN|RST).*(?:(?!SYN|ACK).)+$|FLAGS:\s*$|FLAGS:\s*SYN.*DST:\s*255\.255\.255\.255',
+    "Broadcast & Multicast": r'DST:\s*(?:\d+\.){3}255|DST:\s*255\.255\.255\.255|DST:\s*224\.0\.0\.251:5353|_tcp\.local\.|_udp\.local\.',
+    "DNS Anomalies": r'(?:QUERY|RESPONSE).*(?:\.local\.|\.local$)|DNS\s+Query.*(?:_tcp|_udp)\.|(?:QUERY|DNS).*[0-9a-f]{16,}|QUERY.*(?:\.){5,}',
+    "External Traffic": r'SRC:\s*(?!10\.|192\.168\.|172\.(?:1[6-9]|2[0-9]|3[01])\.)(?:\d+\.){3}\d+.*DST:\s*(?:10\.|192\.168\.|172\.(?:1[6-9]|2[0-9]|3[01])\.)(?:\d+\.){3}\d+',
+    "System Errors": r'error|failed|failure|exception|crash|segfault|panic|abort|core dump|unreachable|timeout|corrupt|invalid|not found|permission denied|disk full|out of memory|OOM killer|assertion failed|segmentation fault',
+    "Warning Events": r'warning|critical|alert|degraded|slow response|retrying|high latency|threshold exceeded|deprecated|unavailable|locked|overload|unresponsive',
+    "Linux System": r'kernel panic|dmesg|syslog|journald|auditd|systemd failed|segfault|fsck error|mount failure|Xorg error|module failed|driver crash|SELinux denial|coredump',
+    "Database Issues": r'query timeout|deadlock|transaction aborted|disk quota exceeded|index corruption|read-only mode|backup failed|config error'
+}
+
+
+class RiskTypeClassifier:
+    """
+    Compiled form of the risk type table used by classify_risk_type
+
+    All patterns are joined into one named-group regex, so a line that
+    matches no risk type costs a single search. A hit names the matching
+    type; only the higher-priority types before it are then tried on their
+    own, because the first type in table order wins, not the leftmost match.
+    The indicator fallback uses key terms extracted from the patterns once.
+    """
+
+    def __init__(self, risk_type_patterns):
+        self.risk_types = list(risk_type_patterns)
+        patterns = list(risk_type_patterns.values())
+        combined = "|".join(f"(?P<t{idx}>{pattern})" for idx, pattern in enumerate(patterns))
+        self.exact_combined = re.compile(combined, re.IGNORECASE)
+        if not all(can_fold(pattern) for pattern in patterns):
+            self.folded_combined = self.exact_combined
+        else:
+            # Fold the patterns only, the group names are case-sensitive
+            self.folded_combined = re.compile("|".join(
+                f"(?P<t{idx}>{pattern.lower()})" for idx, pattern in enumerate(patterns)))
+        self.folded_patterns = [fold_pattern(pattern) for pattern in patterns]
+        self.exact_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+        # Key terms of each pattern for matching NLP indicators
+        self.key_terms = []
+        for risk_type, pattern in risk_type_patterns.items():
+            terms = []
+            for term in pattern.split('|'):
+                # Clean up the term
+                clean_term = re.sub(r'[\(\)\[\]\{\}\.\*\+\?\|\^\$\\]', '', term).strip()
+                if clean_term and len(clean_term) > 3:
+                    terms.append(clean_term.lower())
+            self.key_terms.append((risk_type, terms))
+
+    def classify(self, content, indicators=None):
+        # Check content against patterns
+        if content:
+            # Same folding rule as AnomalyPatternEngine.scan
+            if content.isascii():
+                text, combined, patterns = content.lower(), self.folded_combined, self.folded_patterns
+            else:
+                text, combined, patterns = content, self.exact_combined, self.exact_patterns
+
+            match = combined.search(text)
+            if match:
+                hit = int(match.lastgroup[1:])
+                for idx in range(hit):
+                    if patterns[idx].search(text):
+                        return self.risk_types[idx]
+                return self.risk_types[hit]
+
+        # Check indicators for matches if no match found in content
+        if indicators and len(indicators) > 0:
+            indicators_text = " ".join(indicators).lower()
+            for risk_type, terms in self.key_terms:
+                for term in terms:
+                    if term in indicators_text:
+                        return risk_type
+
+        # Default if no specific type is identified
+        return "Unclassified"
+
+
+_risk_type_classifier = RiskTypeClassifier(RISK_TYPE_PATTERNS)
+
+
+def classify_risk_type(content, indicators=None):
+    """
+    Classify the type of risk based on content and indicators
+    
+    Args:
+        content: The log line content
+        indicators: List of indicator words from NLP analysis
+    
+    Returns:
+        String representing the risk type
+    """
+    return _risk_type_classifier.classify(content, indicators)
@@ -0,0 +1,190 @@
+import re
+from assets.py.log_patterns import fold_pattern
+from assets.py.log_records import parse_line
+
+# Query modes accepted by search_logs
+QUERY_MODES = ("text", "regex", "terms")
+
+# Fields that can be filtered on in terms mode, e.g. level:error source:sshd
+QUERY_FIELDS = ("level", "source", "event_id", "protocol", "ip", "port")
+
+# Fields whose values are written in the line as they are, so the search
+# index can narrow candidates with them; a syslog level can come from the
+# line's priority number instead
+LITERAL_FIELDS = ("source", "event_id", "protocol", "ip", "port")
+
+# Pieces of a terms query: field filters, quoted phrases and bare words
+QUERY_TOKEN = re.compile(
+    r'(?P<field>(?i:' + '|'.join(QUERY_FIELDS) + r')):(?:"(?P<quoted_value>[^"]*)"|(?P<value>\S+))'
+    r'|"(?P<phrase>[^"]*)"|(?P<word>\S+)'
+)
+
+
+def record_matches_field(record, field, value):
+    """
+    Check a LogRecord against a level:, source:, ... filter
+
+    level, event_id, protocol, ip and port must equal the value; source must
+    contain it. The value is lower-cased, as is what it's compared with.
+    """
+    if record is None:
+        return False
+    if field == "level":
+        return record.level == value
+    if field == "source":
+        return record.source is not None and value in record.source.lower()
+
+    fields = record.fields or {}
+    if field == "event_id":
+        return str(fields.get("event_id")) == value
+    if field == "protocol":
+        return (fields.get("protocol") or "").lower() == value
+    if field == "ip":
+        return value in (fields.get("src_ip"), fields.get("dst_ip"))
+    if field == "port":
+        return value in (str(fields.get("src_port")), str(fields.get("dst_port")))
+    return False
+
+
+class CompiledTerm:
+    """
+    A regex compiled for case-insensitive matching in two forms
+
+    ASCII lines are lower-cased once by the query and searched with the
+    folded form, which keeps the regex engine's literal fast paths; other
+    lines use the IGNORECASE form (see fold_pattern).
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.exact = re.compile(pattern, re.IGNORECASE)
+        try:
+            self.folded = fold_pattern(pattern)
+        except re.error:
+            # Lower-casing broke the pattern; lower-cased text still matches
+            self.folded = self.exact
+
+    def search(self, line, folded_line):
+        if folded_line is not None:
+            return self.folded.search(folded_line)
+        return self.exact.search(line)
+
+
+class LogQuery:
+    """
+    A search query compiled once and then tested against every line
+
+    Modes:
+        text: case-insensitive substring, like the plain search box
+        regex: a regular expression, matched case-insensitively
+        terms: words and "quoted phrases", all of which must occur (AND);
+            OR between them starts an alternative group, so
+            'failed login OR denied' is (failed AND login) OR denied.
+            level:<level> and source:<text> filter on the line's fields,
+            as do event_id:, protocol:, ip: and port: (see log_records).
+
+    Raises:
+        ValueError: for an unknown mode or an invalid regex
+    """
+
+    def __init__(self, query, mode="text"):
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        self.query = query
+        self.mode = mode
+        # Alternative groups of terms; a line matches if every term of one
+        # group does
+        self.groups = []
+        self.fields = []
+        self.field_literals = []
+
+        if mode == "text":
+            self.text = query.lower()
+        elif mode == "regex":
+            try:
+                self.groups = [[CompiledTerm(query)]]
+            except re.error as e:
+                raise ValueError(f"Invalid regular expression: {e}")
+        else:
+            self.parse_terms(query)
+
+    def parse_terms(self, query):
+        group = []
+        for match in QUERY_TOKEN.finditer(query):
+            if match.group("field"):
+                field = match.group("field").lower()
+                value = match.group("quoted_value")
+                if value is None:
+                    value = match.group("value")
+                self.fields.append((field, value.lower()))
+                if field in LITERAL_FIELDS:
+                    self.field_literals.append(value.lower())
+                continue
+
+            word = match.group("word")
+            if word == "OR":
+                if group:
+                    self.groups.append(group)
+                group = []
+                continue
+            if word == "AND":
+                continue
+
+            term = match.group("phrase") if word is None else word
+            if term:
+                group.append(CompiledTerm(re.escape(term)))
+        if group:
+            self.groups.append(group)
+
+    def index_groups(self):
+        """
+        Get the regex sources the search index can narrow candidates with
+
+        Returns:
+            List of groups of regex sources (OR of ANDs), or None when the
+            query can't be narrowed and every line has to be checked
+        """
+        if self.mode == "text":
+            return None
+        literals = [re.escape(value) for field, value in self.fields if field in LITERAL_FIELDS and value]
+        groups = self.groups or ([[]] if literals else [])
+        if not groups:
+            return None
+        return [[term.pattern for term in group] + literals for group in groups]
+
+    def fields_match(self, record):
+        """Check whether a line's LogRecord passes the query's field filters"""
+        return all(record_matches_field(record, field, value) for field, value in self.fields)
+
+    def matches(self, line):
+        """Check whether a log line matches the query, parsing it for the field filters"""
+        if self.fields:
+            # Parsing is the slow part, so first rule out lines missing a
+            # value the filters need written in them
+            if line.isascii():
+                folded_line = line.lower()
+                if not all(value in folded_line for value in self.field_literals):
+                    return False
+            if not self.fields_match(parse_line(line)):
+                return False
+        return self.matches_text(line)
+
+    def matches_text(self, line):
+        """
+        Check whether a log line matches the query's text, leaving out the field filters
+
+        For lines whose fields were already checked, e.g. with
+        RecordColumns.field_mask.
+        """
+        if self.mode == "text":
+            return self.text in line.lower()
+
+        if not self.groups:
+            return True
+
+        # Lower-case the line once for all folded terms
+        folded_line = line.lower() if line.isascii() else None
+        for group in self.groups:
+            if all(term.search(line, folded_line) for term in group):
+                return True
+        return False
@@ -0,0 +1,211 @@
+import re
+import sys
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# Network capture lines written by Home's process_packet:
+# [timestamp] [PROTOCOL] [src_ip:port] -> [dst_ip:port] [flags] [payload size] [details]
+NETWORK_LINE = re.compile(
+    r'^\[(?P<timestamp>[^\]]*)\]\s+\[(?P<protocol>[A-Z0-9]+)\]\s+\[(?P<src>[^\]]*)\]\s+->\s+\[(?P<dst>[^\]]*)\]'
+    r'\s+\[(?P<flags>[^\]]*)\]\s+\[(?P<size>[^\]]*)\]\s+\[(?P<details>.*)\]\s*$'
+)
+
+# Windows events written by collect_windows_event_logs:
+# [timestamp] [LEVEL] [Source] EventID=<id> Message="..."
+WINDOWS_EVENT_LINE = re.compile(
+    r'^\[(?P<timestamp>[^\]]*)\]\s+\[(?P<level>[A-Za-z_]+)\]\s+\[(?P<source>[^\]]+)\]'
+    r'\s*(?:EventID=(?P<event_id>\d+)\s*)?(?P<message>.*)$'
+)
+
+# RFC 5424 syslog: <PRI>VERSION timestamp host app procid msgid structured-data message
+SYSLOG_5424_LINE = re.compile(
+    r'^<(?P<priority>\d{1,3})>\d{1,2}\s+(?P<timestamp>\S+)\s+(?P<host>\S+)\s+(?P<source>\S+)\s+(?P<pid>\S+)'
+    r'\s+\S+\s+(?:-|(?:\[(?:[^\]\\]|\\.)*\])+)\s?(?P<message>.*)$'
+)
+
+# BSD syslog: [<PRI>]Mon DD HH:MM:SS host program[pid]: message
+SYSLOG_3164_LINE = re.compile(
+    r'^(?:<(?P<priority>\d{1,3})>)?(?P<timestamp>[A-Z][a-z]{2}\s+\d+\s+\d\d:\d\d:\d\d)\s+(?P<host>\S+)'
+    r'\s+(?P<source>[^\s:\[]+)(?:\[(?P<pid>\d+)\])?:\s?(?P<message>.*)$'
+)
+
+# Levels of the syslog severities 0-7
+SYSLOG_LEVELS = ("emergency", "alert", "critical", "error", "warning", "notice", "info", "debug")
+
+# Fallback for lines that only mention their level somewhere
+LEVEL_WORD = re.compile(r'\b(?P<level>critical|fatal|error|warn(?:ing)?|notice|info|debug|trace)\b', re.IGNORECASE)
+
+# Words LEVEL_WORD needs, checked first as substrings since most lines have none
+LEVEL_WORD_LITERALS = ("critical", "fatal", "error", "warn", "notice", "info", "debug", "trace")
+
+# Timestamp layouts besides ISO 8601, e.g. pywin32's TimeGenerated.Format()
+TIMESTAMP_FORMATS = (
+    "%a %b %d %H:%M:%S %Y",
+    "%m/%d/%y %H:%M:%S",
+    "%m/%d/%Y %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+)
+
+
+class LogRecord(namedtuple("LogRecord", ["format", "timestamp", "level", "source", "message", "fields"])):
+    """
+    A parsed log line
+
+    Attributes:
+        format: 'network', 'windows_event', 'syslog' or 'text' for a line
+            that only mentions its level
+        timestamp: Seconds since the epoch as a float, None if unknown;
+            timestamps without a zone are taken as local time
+        level: Lower-cased level, e.g. 'error', or None
+        source: Program, event source or sending IP address, or None
+        message: The line's free text
+        fields: Dict of format-specific values, or None (network: protocol,
+            src_ip, src_port, dst_ip, dst_port, flags, payload_size;
+            windows_event: event_id; syslog: host, pid)
+    """
+    __slots__ = ()
+
+
+def parse_timestamp(text):
+    """
+    Convert a log timestamp to seconds since the epoch
+
+    Returns:
+        Float timestamp, or None if the layout isn't known
+    """
+    try:
+        if text.endswith('Z'):
+            text = text[:-1] + '+00:00'
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return _parse_formatted_timestamp(text)
+
+
+@lru_cache(maxsize=4096)
+def _parse_formatted_timestamp(text):
+    for timestamp_format in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(text, timestamp_format).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=4096)
+def parse_syslog_timestamp(text):
+    """
+    Convert a BSD syslog timestamp, which has no year, to seconds since the epoch
+
+    The year is the current one, or the previous one for dates that would
+    otherwise be in the future.
+    """
+    now = datetime.now()
+    try:
+        timestamp = datetime.strptime(f"{now.year} {text}", "%Y %b %d %H:%M:%S")
+        if timestamp > now + timedelta(days=1):
+            timestamp = timestamp.replace(year=now.year - 1)
+        return timestamp.timestamp()
+    except ValueError:
+        return None
+
+
+def find_level_word(text):
+    """Get the lower-cased first LEVEL_WORD in a text, or None"""
+    # Non-ASCII text can case-fold differently from lower()
+    if text.isascii():
+        folded = text.lower()
+        if not any(word in folded for word in LEVEL_WORD_LITERALS):
+            return None
+    match = LEVEL_WORD.search(text)
+    return sys.intern(match.group("level").lower()) if match else None
+
+
+def _value(text, missing=("", "N/A", "None")):
+    """Get a field written by process_packet, None for its placeholders"""
+    return None if text in missing else text
+
+
+def _int_value(text):
+    text = _value(text)
+    return int(text) if text is not None and text.isdigit() else None
+
+
+def parse_network_line(line):
+    match = NETWORK_LINE.match(line)
+    if not match:
+        return None
+    src_ip, _, src_port = match.group("src").rpartition(':')
+    dst_ip, _, dst_port = match.group("dst").rpartition(':')
+    src_ip = _value(src_ip)
+    fields = {
+        "protocol": sys.intern(match.group("protocol")),
+        "src_ip": src_ip and sys.intern(src_ip),
+        "src_port": _int_value(src_port),
+        "dst_ip": _value(dst_ip) and sys.intern(dst_ip),
+        "dst_port": _int_value(dst_port),
+        "flags": _value(match.group("flags")),
+        "payload_size": _int_value(match.group("size"))
+    }
+    return LogRecord("network", parse_timestamp(match.group("timestamp")), None, fields["src_ip"],
+                     match.group("details"), fields)
+
+
+def parse_windows_event_line(line):
+    match = WINDOWS_EVENT_LINE.match(line)
+    if not match:
+        return None
+    message = match.group("message")
+    if message.startswith('Message="') and message.endswith('"'):
+        message = message[9:-1]
+    event_id = match.group("event_id")
+    return LogRecord("windows_event", parse_timestamp(match.group("timestamp")),
+                     sys.intern(match.group("level").lower()), sys.intern(match.group("source")),
+                     message, {"event_id": int(event_id)} if event_id else None)
+
+
+def parse_syslog_line(line):
+    match = SYSLOG_5424_LINE.match(line)
+    if match:
+        timestamp = parse_timestamp(match.group("timestamp")) if match.group("timestamp") != "-" else None
+    else:
+        match = SYSLOG_3164_LINE.match(line)
+        if not match:
+            return None
+        timestamp = parse_syslog_timestamp(match.group("timestamp"))
+
+    message = match.group("message")
+    priority = match.group("priority")
+    if priority is not None and int(priority) < 192:
+        level = SYSLOG_LEVELS[int(priority) % 8]
+    else:
+        level = find_level_word(message)
+    # RFC 5424 writes '-' for unknown values
+    host, source, pid = (None if value == "-" else value for value in match.group("host", "source", "pid"))
+    fields = {"host": host and sys.intern(host), "pid": int(pid) if pid and pid.isdigit() else None}
+    return LogRecord("syslog", timestamp, level, source and sys.intern(source), message, fields)
+
+
+# Parsers to try by a line's first character, in order; network lines would
+# also pass as Windows events
+LINE_PARSERS = {'[': (parse_network_line, parse_windows_event_line), '<': (parse_syslog_line,)}
+LINE_PARSERS.update((letter, (parse_syslog_line,)) for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+
+def parse_line(line):
+    """
+    Parse a log line of any known format
+
+    Returns:
+        LogRecord, or None for a line without a timestamp, level or source
+    """
+    for parser in LINE_PARSERS.get(line[:1], ()):
+        record = parser(line)
+        if record is not None:
+            return record
+
+    level = find_level_word(line)
+    if level is not None:
+        return LogRecord("text", None, level, None, line, None)
+    return None
+
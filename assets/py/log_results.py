@@ -0,0 +1,271 @@
+import os
+import csv
+import gzip
+import json
+import uuid
+import itertools
+import threading
+from collections import OrderedDict
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Analysis results kept for export; older ones are dropped first
+MAX_STORED_RESULTS = 10
+
+# Columns of the exported tables, in order: CSV headers and the matching
+# field names used by the other formats
+ANOMALY_COLUMNS = ["Anomaly Type", "Danger Level", "File Name", "Line Number", "Log Content"]
+ANOMALY_FIELDS = ["anomaly_name", "danger_level", "file_name", "line_number", "raw_content"]
+DEEP_ANALYSIS_COLUMNS = ["File Name", "Overall File Risk", "Line Number", "Risk Level", "Indicators", "Log Content"]
+DEEP_ANALYSIS_FIELDS = ["file_name", "overall_risk", "line_number", "risk_level", "indicators", "raw_content"]
+
+# Fields with few distinct values, stored dictionary-encoded in Arrow and Parquet
+DICTIONARY_FIELDS = {"anomaly_name", "danger_level", "file_name", "overall_risk", "risk_level"}
+INTEGER_FIELDS = {"line_number"}
+
+# Rows converted and written at a time, which bounds the memory an export uses
+EXPORT_BATCH_ROWS = 64 * 1024
+
+# File extension of each export format
+EXPORT_FORMATS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+    "ndjson": ".ndjson.gz"
+}
+
+
+def anomaly_rows(result):
+    """Yield the export rows of an anomaly detection result, one per anomaly"""
+    for item in result.get("results", []):
+        yield [
+            item.get("anomaly_name", "Unknown"),
+            item.get("danger_level", "Unknown"),
+            item.get("file_name", "Unknown"),
+            item.get("line_number", 0),
+            item.get("raw_content", "")
+        ]
+
+
+def deep_analysis_rows(result):
+    """Yield the export rows of a deep analysis result, one per flagged line"""
+    for file_result in result.get("file_results", []):
+        file_name = file_result.get("file_name", "Unknown")
+        overall_risk = file_result.get("overall_risk", "Unknown")
+        for line_analysis in file_result.get("line_analysis", []):
+            yield [
+                file_name,
+                overall_risk,
+                line_analysis.get("line_number", 0),
+                line_analysis.get("risk_level", "Unknown"),
+                ", ".join(line_analysis.get("indicators", [])),
+                line_analysis.get("raw_content", "")
+            ]
+
+
+# Columns, fields and row generator of each analysis type
+EXPORT_TABLES = {
+    "anomaly": (ANOMALY_COLUMNS, ANOMALY_FIELDS, anomaly_rows),
+    "deep_analysis": (DEEP_ANALYSIS_COLUMNS, DEEP_ANALYSIS_FIELDS, deep_analysis_rows)
+}
+
+
+def row_batches(rows, batch_size=EXPORT_BATCH_ROWS):
+    """Yield lists of up to batch_size rows"""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def write_csv(file_path, columns, rows):
+    """
+    Write rows to a CSV file as they are produced
+
+    Args:
+        file_path: Path of the CSV file
+        columns: Header row
+        rows: Iterable of rows
+
+    Returns:
+        Number of rows written, not counting the header
+    """
+    count = 0
+    with open(file_path, 'w', encoding='utf-8', newline='') as f:
+        # Same line endings as the pandas export this replaces
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_ndjson(file_path, fields, rows):
+    """
+    Write rows to a gzip-compressed file of JSON objects, one per line
+
+    Returns:
+        Number of rows written
+    """
+    count = 0
+    with gzip.open(file_path, 'wt', encoding='utf-8', newline='\n', compresslevel=6) as f:
+        for batch in row_batches(rows):
+            f.write("".join(json.dumps(dict(zip(fields, row)), ensure_ascii=False) + "\n" for row in batch))
+            count += len(batch)
+    return count
+
+
+def arrow_schema(fields):
+    """Get the Arrow schema of a table with the given fields"""
+    types = []
+    for name in fields:
+        if name in DICTIONARY_FIELDS:
+            types.append((name, pyarrow.dictionary(pyarrow.int32(), pyarrow.string())))
+        elif name in INTEGER_FIELDS:
+            types.append((name, pyarrow.int64()))
+        else:
+            types.append((name, pyarrow.string()))
+    return pyarrow.schema(types)
+
+
+def arrow_batches(schema, rows):
+    """
+    Convert rows to Arrow record batches
+
+    Dictionary-encoded fields share one dictionary across all batches,
+    which only ever grows, so IPC writers can send it as deltas.
+    """
+    dictionaries = {name: {} for name in schema.names if name in DICTIONARY_FIELDS}
+    for batch in row_batches(rows):
+        arrays = []
+        for field, values in zip(schema, zip(*batch)):
+            codes = dictionaries.get(field.name)
+            if codes is None:
+                arrays.append(pyarrow.array(values, type=field.type))
+            else:
+                indices = pyarrow.array([codes.setdefault(value, len(codes)) for value in values], type=pyarrow.int32())
+                arrays.append(pyarrow.DictionaryArray.from_arrays(indices, pyarrow.array(list(codes), type=pyarrow.string())))
+        yield pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_arrow(file_path, fields, rows):
+    """
+    Write rows to an Arrow IPC file
+
+    Returns:
+        Number of rows written
+    """
+    count = 0
+    schema = arrow_schema(fields)
+    options = pyarrow.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+    with pyarrow.ipc.new_file(file_path, schema, options=options) as writer:
+        for batch in arrow_batches(schema, rows):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
+
+
+def write_parquet(file_path, fields, rows):
+    """
+    Write rows to a Parquet file, one row group per batch
+
+    Returns:
+        Number of rows written
+    """
+    count = 0
+    schema = arrow_schema(fields)
+    dictionary_fields = [name for name in fields if name in DICTIONARY_FIELDS]
+    with pyarrow.parquet.ParquetWriter(file_path, schema, compression='snappy', use_dictionary=dictionary_fields) as writer:
+        for batch in arrow_batches(schema, rows):
+            writer.write_table(pyarrow.Table.from_batches([batch]))
+            count += batch.num_rows
+    return count
+
+
+def check_export_format(export_format):
+    """
+    Raises:
+        ValueError: if the format is unknown or needs a missing package
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    if export_format in ("parquet", "arrow") and pyarrow is None:
+        raise ValueError(f"{export_format.capitalize()} export needs the pyarrow package")
+
+
+def write_export(file_path, analysis_type, export_format, rows):
+    """
+    Write the rows of an analysis result in one of EXPORT_FORMATS
+
+    A file that can't be written completely is removed.
+
+    Args:
+        file_path: Path of the export file
+        analysis_type: Key of EXPORT_TABLES
+        export_format: Key of EXPORT_FORMATS
+        rows: Iterable of rows from the analysis type's row generator
+
+    Returns:
+        Number of rows written
+    """
+    check_export_format(export_format)
+    columns, fields, _ = EXPORT_TABLES[analysis_type]
+    try:
+        if export_format == "csv":
+            return write_csv(file_path, columns, rows)
+        writer = {"parquet": write_parquet, "arrow": write_arrow, "ndjson": write_ndjson}[export_format]
+        return writer(file_path, fields, rows)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+
+class ResultStore:
+    """
+    Keeps the latest analysis results in this process under an id
+
+    The frontend gets the id with each result and can then ask for an
+    export by id, instead of sending the whole result back.
+    """
+
+    def __init__(self, max_results=MAX_STORED_RESULTS):
+        self.max_results = max_results
+        self.lock = threading.Lock()
+        self.results = OrderedDict()
+
+    def put(self, analysis_type, folder, result):
+        """
+        Store a result
+
+        Returns:
+            The new result id
+        """
+        result_id = uuid.uuid4().hex
+        with self.lock:
+            self.results[result_id] = {"type": analysis_type, "folder": folder, "result": result}
+            while len(self.results) > self.max_results:
+                self.results.popitem(last=False)
+        return result_id
+
+    def get(self, result_id):
+        """
+        Get a stored result
+
+        Returns:
+            Dict with the analysis 'type', 'folder' and 'result'
+
+        Raises:
+            KeyError: if the result is unknown or was dropped
+        """
+        with self.lock:
+            entry = self.results[result_id]
+            self.results.move_to_end(result_id)
+            return entry
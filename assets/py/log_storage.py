@@ -0,0 +1,552 @@
+import io
+import os
+import gzip
+import zlib
+import tarfile
+import zipfile
+import struct
+import bisect
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Codecs finished log files can be stored with
+STORAGE_CODECS = ("gzip", "zstd")
+
+# File name suffix of each codec
+CODEC_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+# Uncompressed bytes per gzip block. Blocks follow the BGZF layout (as
+# written by bgzip): every block is a complete gzip member whose header
+# records its compressed size, so the file stays a valid .gz while its
+# blocks can be found without decompressing anything. 0xff00 keeps even
+# incompressible blocks within the format's 64 KB limit.
+GZIP_BLOCK_SIZE = 0xff00
+
+# Uncompressed bytes per zstd frame, see the zstd seekable format
+ZSTD_FRAME_SIZE = 1024 * 1024
+
+# Compression levels; logs compress well even at fast settings
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Header of a BGZF block: gzip magic, deflate, FEXTRA, mtime, xfl, os,
+# XLEN=6 and the 'BC' subfield holding the block size minus one
+BGZF_HEADER = struct.Struct('<4sIBBHBBHH')
+BGZF_MAGIC = b'\x1f\x8b\x08\x04'
+
+# Empty block bgzip ends its files with
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+# Seek table footer of the zstd seekable format: frame count, descriptor
+# and magic number
+ZSTD_SEEK_FOOTER = struct.Struct('<IBI')
+ZSTD_FRAME_MAGIC = b'\x28\xb5\x2f\xfd'
+ZSTD_SEEKABLE_MAGIC = 0x8F92EAB1
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A5E
+
+# Buffer size for reading gzip streams and archive members
+READ_BUFFER_SIZE = 256 * 1024
+
+# Decompressed blocks kept per open file, so lines that cross a block
+# boundary and nearby re-reads don't decompress again
+CACHED_BLOCKS = 4
+
+# Archives whose members are listed as virtual log files, by name suffix
+ZIP_SUFFIXES = ('.zip',)
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# Joins an archive's file name and a member's name into the member's
+# virtual file name, e.g. bundle.zip!/var/log/syslog. A real file name can't
+# contain a slash, so virtual names never clash with real files.
+ARCHIVE_MEMBER_SEPARATOR = '!/'
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Files whose storage_info is kept, least recently used dropped first
+CACHED_STORAGE_INFOS = 256
+
+# How each file is stored (see storage_info), keyed by path
+_storage_infos = OrderedDict()
+_storage_infos_lock = threading.Lock()
+
+
+class BlockIndex:
+    """
+    Where every block of a compressed log starts, compressed and not
+
+    Attributes:
+        codec: 'gzip' or 'zstd'
+        offsets: Compressed offset of every block, then the end of the last
+        starts: Uncompressed offset of every block, then the total size
+    """
+
+    def __init__(self, codec, offsets, starts):
+        self.codec = codec
+        self.offsets = offsets
+        self.starts = starts
+
+    @property
+    def size(self):
+        return self.starts[-1]
+
+    def decompress(self, data):
+        if self.codec == "gzip":
+            # Skip the 18-byte header; the 8-byte trailer is left unused
+            return zlib.decompressobj(-zlib.MAX_WBITS).decompress(data[BGZF_HEADER.size:])
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed, can't read .zst logs")
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _read_gzip_index(f, file_size):
+    """Walk the headers of a BGZF file, or return None if it isn't one"""
+    offsets = []
+    starts = []
+    offset = 0
+    start = 0
+    while offset < file_size:
+        f.seek(offset)
+        header = f.read(BGZF_HEADER.size)
+        if len(header) < BGZF_HEADER.size:
+            return None
+        magic, _, _, _, xlen, si1, si2, slen, bsize = BGZF_HEADER.unpack(header)
+        if magic != BGZF_MAGIC or xlen != 6 or (si1, si2, slen) != (66, 67, 2):
+            return None
+        block_size = bsize + 1
+        # ISIZE, the block's uncompressed size, ends the block
+        f.seek(offset + block_size - 4)
+        isize = struct.unpack('<I', f.read(4))[0]
+        if isize:
+            offsets.append(offset)
+            starts.append(start)
+        offset += block_size
+        start += isize
+    offsets.append(offset)
+    starts.append(start)
+    return BlockIndex("gzip", offsets, starts)
+
+
+def _read_zstd_index(f, file_size):
+    """Read the seek table of a seekable zstd file, or return None if it has none"""
+    if file_size < ZSTD_SEEK_FOOTER.size:
+        return None
+    f.seek(file_size - ZSTD_SEEK_FOOTER.size)
+    frame_count, descriptor, magic = ZSTD_SEEK_FOOTER.unpack(f.read(ZSTD_SEEK_FOOTER.size))
+    if magic != ZSTD_SEEKABLE_MAGIC:
+        return None
+    # Entries hold the compressed and decompressed size, and maybe a checksum
+    entry_size = 12 if descriptor & 0x80 else 8
+    table_size = frame_count * entry_size
+    f.seek(file_size - ZSTD_SEEK_FOOTER.size - table_size)
+    table = f.read(table_size)
+
+    offsets = [0]
+    starts = [0]
+    for i in range(frame_count):
+        compressed, decompressed = struct.unpack_from('<II', table, i * entry_size)
+        offsets.append(offsets[-1] + compressed)
+        starts.append(starts[-1] + decompressed)
+    return BlockIndex("zstd", offsets, starts)
+
+
+def _archive_members(file_path):
+    """List the regular files of a zip or tar archive as {name: size}"""
+    name = file_path.lower()
+    if name.endswith(ZIP_SUFFIXES):
+        with zipfile.ZipFile(file_path) as archive:
+            return {info.filename: info.file_size for info in archive.infolist() if not info.is_dir()}
+    with tarfile.open(file_path) as archive:
+        return {info.name: info.size for info in archive if info.isfile()}
+
+
+def storage_info(file_path):
+    """
+    Find out how a real file on disk is stored
+
+    Results are cached until the file's size or modification time changes,
+    for the CACHED_STORAGE_INFOS most recently used files.
+
+    Returns:
+        (kind, detail) where kind is 'blocks' (seekable compressed, detail
+        is its BlockIndex), 'gzip' (an ordinary gzip stream), 'archive'
+        (zip or tar, detail maps member names to sizes) or 'plain'
+    """
+    stat = os.stat(file_path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _storage_infos_lock:
+        cached = _storage_infos.get(file_path)
+        if cached and cached[0] == key:
+            _storage_infos.move_to_end(file_path)
+            return cached[1]
+
+    info = ("plain", None)
+    if file_path.lower().endswith(ZIP_SUFFIXES + TAR_SUFFIXES):
+        try:
+            info = ("archive", _archive_members(file_path))
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+            # Shown as it is rather than hidden
+            print(f"⚠️ Could not read archive {file_path}: {e}")
+    if info[0] == "plain":
+        with open(file_path, 'rb') as f:
+            magic = f.read(4)
+            index = None
+            if magic == BGZF_MAGIC:
+                index = _read_gzip_index(f, stat.st_size)
+            elif magic in (ZSTD_FRAME_MAGIC, struct.pack('<I', ZSTD_SKIPPABLE_MAGIC)):
+                # An empty file is only the seek table's skippable frame
+                index = _read_zstd_index(f, stat.st_size)
+        if index is not None:
+            info = ("blocks", index)
+        elif magic.startswith(GZIP_MAGIC):
+            info = ("gzip", None)
+
+    with _storage_infos_lock:
+        _storage_infos[file_path] = (key, info)
+        _storage_infos.move_to_end(file_path)
+        while len(_storage_infos) > CACHED_STORAGE_INFOS:
+            _storage_infos.popitem(last=False)
+    return info
+
+
+def get_block_index(file_path):
+    """Get the block index of a seekable compressed log, or None for any other file"""
+    kind, detail = storage_info(file_path)
+    return detail if kind == "blocks" else None
+
+
+def index_path_for(folder_path, suffix='.pickle'):
+    """Get where an index of a log folder is stored"""
+    folder_path = os.path.abspath(folder_path)
+    base_folder, folder_name = os.path.split(folder_path)
+    return os.path.join(os.path.dirname(base_folder), 'search_index', folder_name + suffix)
+
+
+def split_member_path(file_path):
+    """
+    Split a path into an archive's path and a member name
+
+    Returns:
+        (archive_path, member), or (file_path, None) for a path that isn't
+        inside an archive
+    """
+    archive_path, separator, member = file_path.partition(ARCHIVE_MEMBER_SEPARATOR)
+    if not separator:
+        return file_path, None
+    return archive_path, member
+
+
+def list_log_files(folder_path):
+    """
+    List the log files of a folder, with archives replaced by their members
+
+    Returns:
+        Sorted file names; members of a zip or tar archive are listed under
+        virtual names (see ARCHIVE_MEMBER_SEPARATOR)
+    """
+    file_names = []
+    for file_name in os.listdir(folder_path):
+        file_path = os.path.join(folder_path, file_name)
+        if not os.path.isfile(file_path):
+            continue
+        kind, members = storage_info(file_path)
+        if kind == "archive":
+            file_names.extend(file_name + ARCHIVE_MEMBER_SEPARATOR + member for member in members)
+        else:
+            file_names.append(file_name)
+    return sorted(file_names)
+
+
+def log_file_stat(file_path):
+    """
+    Stat a log file; a member of an archive gets the archive's stat
+
+    Raises:
+        FileNotFoundError: if the file, or the archive member, doesn't exist
+    """
+    archive_path, member = split_member_path(file_path)
+    stat = os.stat(archive_path)
+    if member is not None:
+        kind, members = storage_info(archive_path)
+        if kind != "archive" or member not in members:
+            raise FileNotFoundError(f"No such file in archive: {file_path}")
+    return stat
+
+
+def log_file_exists(file_path):
+    """Check whether a log file, or archive member, exists"""
+    try:
+        log_file_stat(file_path)
+    except OSError:
+        return False
+    return os.path.isfile(split_member_path(file_path)[0])
+
+
+class CompressedLogReader(io.RawIOBase):
+    """
+    Seekable raw reader of the uncompressed contents of a compressed log
+
+    Only the blocks holding the bytes asked for are read and decompressed.
+    """
+
+    def __init__(self, file_path, index):
+        self.raw = open(file_path, 'rb')
+        self.index = index
+        self.position = 0
+        self.blocks = OrderedDict()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.index.size
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self.position = offset
+        return offset
+
+    def block(self, block_number):
+        data = self.blocks.get(block_number)
+        if data is None:
+            offsets = self.index.offsets
+            self.raw.seek(offsets[block_number])
+            data = self.index.decompress(self.raw.read(offsets[block_number + 1] - offsets[block_number]))
+            self.blocks[block_number] = data
+            if len(self.blocks) > CACHED_BLOCKS:
+                self.blocks.popitem(last=False)
+        else:
+            self.blocks.move_to_end(block_number)
+        return data
+
+    def readinto(self, buffer):
+        starts = self.index.starts
+        if self.position >= starts[-1]:
+            return 0
+        block_number = bisect.bisect_right(starts, self.position) - 1
+        data = self.block(block_number)
+        offset = self.position - starts[block_number]
+        count = min(len(buffer), len(data) - offset)
+        memoryview(buffer)[:count] = data[offset:offset + count]
+        self.position += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+
+class ArchiveMemberReader(io.RawIOBase):
+    """Raw reader of an archive member that closes the archive along with it"""
+
+    def __init__(self, member, archive):
+        self.member = member
+        self.archive = archive
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.member.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.member.seek(offset, whence)
+
+    def readinto(self, buffer):
+        data = self.member.read(len(buffer))
+        memoryview(buffer)[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.member.close()
+            self.archive.close()
+        super().close()
+
+
+def _open_member(archive_path, member):
+    if archive_path.lower().endswith(ZIP_SUFFIXES):
+        archive = zipfile.ZipFile(archive_path)
+        try:
+            return ArchiveMemberReader(archive.open(member), archive)
+        except Exception:
+            archive.close()
+            raise
+
+    archive = tarfile.open(archive_path)
+    try:
+        # Iterating reads no further than the member, unlike getmember()
+        for info in archive:
+            if info.name == member and info.isfile():
+                return ArchiveMemberReader(archive.extractfile(info), archive)
+        raise FileNotFoundError(f"No such file in archive: {archive_path}{ARCHIVE_MEMBER_SEPARATOR}{member}")
+    except Exception:
+        archive.close()
+        raise
+
+
+def open_log_binary(file_path):
+    """
+    Open a log file for binary reading, decompressing it if it is compressed
+
+    Seekable compressed files only decompress the blocks that are read.
+    gzip streams and archive members are decompressed as they are read;
+    they can seek too, but only by decompressing up to the new position.
+
+    Returns:
+        A seekable binary file object over the uncompressed contents
+    """
+    archive_path, member = split_member_path(file_path)
+    if member is not None:
+        return io.BufferedReader(_open_member(archive_path, member), buffer_size=READ_BUFFER_SIZE)
+
+    kind, detail = storage_info(file_path)
+    if kind == "blocks":
+        return io.BufferedReader(CompressedLogReader(file_path, detail), buffer_size=GZIP_BLOCK_SIZE)
+    if kind == "gzip":
+        return gzip.open(file_path, 'rb')
+    return open(file_path, 'rb')
+
+
+def log_file_size(file_path):
+    """
+    Get the uncompressed size of a log file
+
+    For a gzip stream this is the size its trailer records, which is only
+    exact for single-member files under 4 GB; it is meant for estimates.
+    """
+    archive_path, member = split_member_path(file_path)
+    if member is not None:
+        kind, members = storage_info(archive_path)
+        return members[member]
+
+    kind, detail = storage_info(file_path)
+    if kind == "blocks":
+        return detail.size
+    if kind == "gzip":
+        with open(file_path, 'rb') as f:
+            f.seek(max(os.fstat(f.fileno()).st_size - 4, 0))
+            trailer = f.read(4)
+            return struct.unpack('<I', trailer)[0] if len(trailer) == 4 else 0
+    return os.path.getsize(file_path)
+
+
+def is_plain_log(file_path):
+    """Check whether a log file is stored as it is, uncompressed"""
+    return split_member_path(file_path)[1] is None and storage_info(file_path)[0] == "plain"
+
+
+def is_random_access_log(file_path):
+    """Check whether any position of a log file can be read without reading what comes before"""
+    return split_member_path(file_path)[1] is None and storage_info(file_path)[0] in ("plain", "blocks")
+
+
+def _gzip_block(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    block_size = BGZF_HEADER.size + len(deflated) + 8
+    header = BGZF_HEADER.pack(BGZF_MAGIC, 0, 0, 0xff, 6, 66, 67, 2, block_size - 1)
+    return header + deflated + struct.pack('<II', zlib.crc32(data), len(data))
+
+
+def _write_compressed(source, target, codec):
+    """Compress source into target block by block, returning the SHA-256 of the input"""
+    digest = hashlib.sha256()
+    if codec == "gzip":
+        while True:
+            data = source.read(GZIP_BLOCK_SIZE)
+            if not data:
+                break
+            digest.update(data)
+            target.write(_gzip_block(data, GZIP_LEVEL))
+        target.write(BGZF_EOF)
+        return digest
+
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    frames = []
+    while True:
+        data = source.read(ZSTD_FRAME_SIZE)
+        if not data:
+            break
+        digest.update(data)
+        frame = compressor.compress(data)
+        target.write(frame)
+        frames.append((len(frame), len(data)))
+    # The seek table is a skippable frame, which plain zstd readers ignore
+    table = b''.join(struct.pack('<II', *frame) for frame in frames)
+    table += ZSTD_SEEK_FOOTER.pack(len(frames), 0, ZSTD_SEEKABLE_MAGIC)
+    target.write(struct.pack('<II', ZSTD_SKIPPABLE_MAGIC, len(table)) + table)
+    return digest
+
+
+def compress_log_file(file_path, codec="gzip", temp_path=None):
+    """
+    Replace a finished log file with a seekable compressed copy
+
+    The copy is written next to temp_path (or the file), read back and
+    compared with the original before the original is removed. It keeps
+    the original's modification time.
+
+    Args:
+        file_path: Plain log file to compress
+        codec: 'gzip' or 'zstd'
+        temp_path: Where to write the copy before moving it into place;
+            must be on the same file system
+
+    Returns:
+        Path of the compressed file
+
+    Raises:
+        ValueError: for an unknown or unavailable codec, a file that is
+            already compressed or a compressed name that is taken
+    """
+    if codec not in STORAGE_CODECS:
+        raise ValueError(f"Unknown storage codec: {codec}")
+    if codec == "zstd" and zstandard is None:
+        raise ValueError("zstd storage needs the zstandard package")
+    if not is_plain_log(file_path):
+        raise ValueError(f"Already compressed or an archive: {file_path}")
+    compressed_path = file_path + CODEC_SUFFIXES[codec]
+    if os.path.exists(compressed_path):
+        raise ValueError(f"File already exists: {compressed_path}")
+    temp_path = temp_path or compressed_path + '.tmp'
+
+    stat = os.stat(file_path)
+    # temp_path can be in a folder that doesn't exist yet, like the search index's
+    os.makedirs(os.path.dirname(os.path.abspath(temp_path)), exist_ok=True)
+    try:
+        with open(file_path, 'rb') as source, open(temp_path, 'wb') as target:
+            digest = _write_compressed(source, target, codec)
+
+        # Check the copy before giving up the original
+        check = hashlib.sha256()
+        with open_log_binary(temp_path) as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                check.update(block)
+        if check.digest() != digest.digest() or os.stat(file_path).st_mtime_ns != stat.st_mtime_ns:
+            raise ValueError(f"File changed or didn't compress cleanly: {file_path}")
+
+        os.utime(temp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(temp_path, compressed_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    os.remove(file_path)
+    return compressed_path
@@ -0,0 +1,208 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+
+# Partial uploads not touched for this long are deleted
+UPLOAD_EXPIRY_SECONDS = 7 * 24 * 60 * 60
+
+# Upload ids are hex digests, which also keeps them safe to use in paths
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def chunk_digests_checksum(digests):
+    """
+    Combine the SHA-256 digests of an upload's chunks into its checksum
+
+    The checksum of a file is the SHA-256 of the concatenated raw digests of
+    its chunks, so a browser can compute it chunk by chunk without holding
+    the whole file in memory.
+    """
+    combined = hashlib.sha256()
+    for digest in digests:
+        combined.update(digest)
+    return combined.hexdigest()
+
+
+def file_checksum(file_path, chunk_size):
+    """Compute chunk_digests_checksum for a file split into chunk_size pieces"""
+    digests = []
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digests.append(hashlib.sha256(chunk).digest())
+    return chunk_digests_checksum(digests)
+
+
+class UploadStore:
+    """
+    Chunked, resumable uploads written straight to disk
+
+    An upload is begun with the file's name, size, chunk size and a
+    fingerprint of the file (e.g. its modification time), which together give
+    its id. Chunks are appended in order, each checked against its own
+    SHA-256, and the upload is committed once complete, which checks the whole
+    file and moves it into place. Beginning the same upload again after an
+    interruption reports how much the store already has, so the sender can
+    carry on from there.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.lock = threading.Lock()
+
+    def paths(self, upload_id):
+        """Get the data and metadata paths of an upload"""
+        if not UPLOAD_ID_PATTERN.match(upload_id or ""):
+            raise ValueError(f"Invalid upload id: {upload_id}")
+        return (os.path.join(self.folder, upload_id + '.part'),
+                os.path.join(self.folder, upload_id + '.json'))
+
+    def load(self, upload_id):
+        """
+        Get an upload's metadata
+
+        Raises:
+            ValueError: for an unknown upload
+        """
+        _, meta_path = self.paths(upload_id)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"Unknown or expired upload: {upload_id}")
+
+    def begin(self, filename, total_size, chunk_size, fingerprint):
+        """
+        Start an upload, or resume one begun with the same arguments
+
+        Args:
+            filename: Name the file is stored under
+            total_size: Size of the whole file in bytes
+            chunk_size: Size of every chunk but the last
+            fingerprint: Anything identifying this version of the file
+
+        Returns:
+            (upload_id, received) where received is the number of bytes
+            already stored, always a whole number of chunks
+        """
+        filename = os.path.basename(filename)
+        if not filename or total_size < 0 or chunk_size <= 0:
+            raise ValueError("Invalid upload parameters")
+
+        key = json.dumps([filename, total_size, chunk_size, fingerprint])
+        upload_id = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        part_path, meta_path = self.paths(upload_id)
+
+        with self.lock:
+            os.makedirs(self.folder, exist_ok=True)
+            self.remove_expired()
+            if not os.path.exists(meta_path):
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    json.dump({
+                        "filename": filename,
+                        "total_size": total_size,
+                        "chunk_size": chunk_size,
+                        "fingerprint": fingerprint
+                    }, f)
+
+            # A chunk cut short by an interruption is sent again
+            with open(part_path, 'ab') as f:
+                received = f.tell()
+                if received > total_size:
+                    received = 0
+                elif received < total_size:
+                    received -= received % chunk_size
+                f.truncate(received)
+        return upload_id, received
+
+    def append(self, upload_id, offset, data, chunk_sha256=""):
+        """
+        Write the next chunk of an upload
+
+        Args:
+            upload_id: Id from begin()
+            offset: Byte offset of the chunk, must be the amount received so far
+            data: The chunk's bytes
+            chunk_sha256: Hex SHA-256 of the chunk, checked if given
+
+        Returns:
+            Number of bytes received so far
+
+        Raises:
+            ValueError: for an unknown upload, an unexpected offset or size,
+                or a chunk that doesn't match its checksum
+        """
+        with self.lock:
+            meta = self.load(upload_id)
+            part_path, meta_path = self.paths(upload_id)
+            received = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if offset != received:
+                raise ValueError(f"Expected the chunk at offset {received}, got {offset}")
+            if received + len(data) > meta["total_size"] or \
+                    (len(data) != meta["chunk_size"] and received + len(data) != meta["total_size"]):
+                raise ValueError(f"Chunk of {len(data)} bytes doesn't fit the upload")
+            if chunk_sha256 and hashlib.sha256(data).hexdigest() != chunk_sha256.lower():
+                raise ValueError(f"Checksum mismatch for the chunk at offset {offset}")
+
+            with open(part_path, 'ab') as f:
+                f.write(data)
+            # Keep an active upload from expiring
+            os.utime(meta_path)
+            return received + len(data)
+
+    def commit(self, upload_id, checksum, destination_folder):
+        """
+        Check a complete upload and move it into a folder
+
+        Args:
+            upload_id: Id from begin()
+            checksum: chunk_digests_checksum of the file, checked if given
+            destination_folder: Folder to store the file in
+
+        Returns:
+            Path of the stored file
+
+        Raises:
+            ValueError: for an unknown or incomplete upload, or a checksum
+                mismatch, in which case the upload is discarded
+        """
+        with self.lock:
+            meta = self.load(upload_id)
+            part_path, meta_path = self.paths(upload_id)
+            received = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if received != meta["total_size"]:
+                raise ValueError(f"Upload incomplete: {received} of {meta['total_size']} bytes received")
+            if checksum and file_checksum(part_path, meta["chunk_size"]) != checksum.lower():
+                self.abort(upload_id)
+                raise ValueError("Checksum mismatch, the upload was discarded")
+
+            os.makedirs(destination_folder, exist_ok=True)
+            file_path = os.path.join(destination_folder, meta["filename"])
+            os.replace(part_path, file_path)
+            os.remove(meta_path)
+            return file_path
+
+    def abort(self, upload_id):
+        """Discard an upload and whatever was received of it"""
+        for path in self.paths(upload_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def remove_expired(self):
+        """Delete partial uploads that haven't been touched in a while"""
+        cutoff = time.time() - UPLOAD_EXPIRY_SECONDS
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    print(f"🧹 Removing expired partial upload {path}")
+                    os.remove(path)
+            except OSError:
+                pass
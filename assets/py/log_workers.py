@@ -0,0 +1,77 @@
+# Entry points for the analysis process pool. These run in worker processes,
+# so they only depend on the Qt-free helper modules and keep their heavy state
+# (compiled patterns, loaded model) in per-process globals between tasks.
+import os
+from assets.py.log_io import iter_log_lines, scan_candidate_lines
+from assets.py.log_patterns import AnomalyPatternEngine
+from assets.py.log_model import ModelCache, analyze_line_range
+
+_anomaly_engine = None
+_model_caches = {}
+
+
+def init_worker(anomaly_patterns):
+    """Process pool initializer: compile the anomaly patterns once per process"""
+    global _anomaly_engine
+    _anomaly_engine = AnomalyPatternEngine(anomaly_patterns)
+
+
+def scan_anomaly_range(file_path, start=0, end=None, engine=None):
+    """
+    Scan a file, or a byte range of it, for anomalies
+
+    Args:
+        file_path: Path of the log file
+        start: Byte offset to start at (see split_file_ranges)
+        end: Byte offset to stop at, None for end of file
+        engine: AnomalyPatternEngine to use, defaults to the worker's own
+
+    Returns:
+        (line_count, hits) where hits is a list of
+        (line_number, anomaly_name, danger_level, matched_text, line) with
+        line numbers relative to the start of the range
+    """
+    engine = engine or _anomaly_engine
+    hits = []
+
+    if engine.byte_gate is not None:
+        # Only decode the lines holding one of the patterns' literals
+        gate = engine.byte_gate
+
+        def find(folded, position):
+            match = gate.search(folded, position)
+            return match.start() if match else -1
+
+        def check(line):
+            return [(line, hit) for hit in engine.scan(line)]
+
+        line_count, results = scan_candidate_lines(file_path, find, check, start, end)
+        for line_number, line_hits in results:
+            for line, (anomaly_name, danger_level, matched_text) in line_hits:
+                hits.append((line_number, anomaly_name, danger_level, matched_text, line))
+        return line_count, hits
+
+    line_number = 0
+    for line_number, line in iter_log_lines(file_path, start, end):
+        for anomaly_name, danger_level, matched_text in engine.scan(line):
+            hits.append((line_number, anomaly_name, danger_level, matched_text, line))
+    return line_number, hits
+
+
+def load_worker_model(model_path):
+    """Load the model once per process, reloading only if the file changed"""
+    cache = _model_caches.get(model_path)
+    if cache is None:
+        cache = _model_caches[model_path] = ModelCache(model_path)
+    return cache.get()
+
+
+def deep_analysis_range(model_path, file_path, start=0, end=None):
+    """
+    Run deep analysis on a file, or a byte range of it, in a worker process
+
+    Returns:
+        Per-file result dict with line numbers relative to the range start
+    """
+    model = load_worker_model(model_path)
+    return analyze_line_range(model, file_path, os.path.basename(file_path), start, end)
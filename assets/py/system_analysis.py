@@ -9,6 +9,7 @@ import psutil
 from datetime import datetime
 import threading
 import json
+from assets.py.log_index import update_folder_index
 
 # Define a function to get the correct path for resources in both dev and PyInstaller environments
 def resource_path(relative_path):
@@ -61,6 +62,8 @@ class SystemLogCollector(QObject):
             
             # Return result
             if success:
+                # Index the collected files so searches over them stay fast
+                update_folder_index(WINDOWS_LOG_DIR if os_type == "Windows" else LINUX_LOG_DIR)
                 result = {
                     "success": True,
                     "message": f"Successfully collected {len(self.collected_files)} system log files",
@@ -1,5 +1,6 @@
 import os
 import sys
+import multiprocessing
 
 from PySide6.QtCore import QUrl, QTimer, Qt, QPropertyAnimation, QEasingCurve, QRect
 from PySide6.QtWebEngineWidgets import QWebEngineView
@@ -605,6 +606,8 @@ class MainWindow(QMainWindow):
 
 
 if __name__ == "__main__":
+    # Required for the analysis process pool in the frozen Windows build
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
 
     # Enable console output for debugging